@@ -0,0 +1,8 @@
+"""
+Offline benchmarks for the Sentinela frame processing pipeline.
+
+The modules in this package drive the real inference engines against a local
+OpenAI-compatible stand-in server (see `mock_server`) so the hot path can be
+measured without API keys, network access or model downloads. Run them from
+the repository root, e.g. `python -m benchmarks.pipeline --help`.
+"""
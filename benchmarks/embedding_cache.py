@@ -0,0 +1,148 @@
+"""
+Check and measure the vision embedding cache on a stub model.
+
+The stub stands in for Gemma3nModel: `forward` encodes the images with
+`get_image_features`, a random projection that also sleeps `--encode-ms` per
+image like a vision tower would, and hands the embeddings to its language
+model. The sliding windows of FRAMES_PER_INFERENCE frames over `--frames`
+frames run once on a plain stub and once on a stub with the cache installed.
+Every cached output must match the uncached one, otherwise the run fails.
+Matrix products round differently for different batch sizes, so outputs are
+compared with a relative tolerance rather than bit for bit. The report holds
+the latency of both runs and how many images each one encoded.
+
+`--backend torch` builds the stub from torch tensors, and `--compile` compiles
+its language model the way the Gemma engine does when the cache is on.
+
+Usage:
+    python -m benchmarks.embedding_cache --frames 60 --encode-ms 20
+    python -m benchmarks.embedding_cache --backend torch --compile
+"""
+
+from .pipeline import FRAMES_PER_INFERENCE
+from .report import StageRecorder, write_report
+from src.embedding_cache import EmbeddingCache, frame_key
+import argparse
+import logging
+import numpy as np
+import sys
+import time
+
+IMAGE_SIZE = 32
+IMAGE_VALUES = 3 * IMAGE_SIZE * IMAGE_SIZE
+EMBEDDING_DIM = 64
+
+logger = logging.getLogger(__name__)
+
+
+class StubModel:
+    def __init__(self, backend: str, encode_ms: float):
+        rng = np.random.default_rng(0)
+        # scaled like an initialized layer, so activations stay around 1
+        vision_weights = rng.standard_normal((IMAGE_VALUES, EMBEDDING_DIM), dtype=np.float32) / IMAGE_VALUES ** 0.5
+        language_weights = rng.standard_normal((EMBEDDING_DIM, EMBEDDING_DIM), dtype=np.float32) / EMBEDDING_DIM ** 0.5
+        self.encode_ms = encode_ms
+        self.images_encoded = 0
+        if backend == "torch":
+            import torch
+            self.tanh = torch.tanh
+            self.vision_weights = torch.from_numpy(vision_weights)
+            self.language_model = torch.nn.Linear(EMBEDDING_DIM, EMBEDDING_DIM, bias=False).eval()
+            with torch.no_grad():
+                self.language_model.weight.copy_(torch.from_numpy(language_weights.T))
+        else:
+            self.tanh = np.tanh
+            self.vision_weights = vision_weights
+            self.language_model = lambda features: features @ language_weights
+
+    def get_image_features(self, pixel_values):
+        self.images_encoded += len(pixel_values)
+        time.sleep(self.encode_ms / 1000 * len(pixel_values))
+        return self.tanh(pixel_values.reshape(len(pixel_values), -1) @ self.vision_weights)
+
+    def forward(self, pixel_values):
+        return self.language_model(self.get_image_features(pixel_values))
+
+
+def make_frames(count: int, backend: str):
+    rng = np.random.default_rng(1)
+    frames = [rng.random((3, IMAGE_SIZE, IMAGE_SIZE), dtype=np.float32) for _ in range(count)]
+    keys = [frame_key(frame.tobytes()) for frame in frames]
+    if backend == "torch":
+        import torch
+        frames = [torch.from_numpy(frame) for frame in frames]
+    return frames, keys
+
+
+def run_windows(model: StubModel, frames: list, keys: list, cache, recorder: StageRecorder, stage: str) -> list:
+    stack = np.stack
+    if not isinstance(frames[0], np.ndarray):
+        import torch
+        stack = torch.stack
+
+    outputs = []
+    for start in range(max(1, len(frames) - FRAMES_PER_INFERENCE + 1)):
+        window = slice(start, start + FRAMES_PER_INFERENCE)
+        pixel_values = stack(frames[window])
+        with recorder.measure(stage):
+            if cache:
+                with cache.frames(keys[window]):
+                    output = model.forward(pixel_values)
+            else:
+                output = model.forward(pixel_values)
+        outputs.append(np.asarray(output.detach() if hasattr(output, "detach") else output))
+    return outputs
+
+
+def main(args: argparse.Namespace):
+    frames, keys = make_frames(args.frames, args.backend)
+    uncached = StubModel(args.backend, args.encode_ms)
+    cached = StubModel(args.backend, args.encode_ms)
+    cache = EmbeddingCache(args.cache_size)
+    cache.install(cached)
+    if args.compile:
+        import torch
+        for model in (uncached, cached):
+            model.language_model = torch.compile(model.language_model, mode=args.compile_mode)
+
+    recorder = StageRecorder()
+    # the first windows pay for compilation, so both runs start warm
+    run_windows(uncached, frames[:FRAMES_PER_INFERENCE], keys[:FRAMES_PER_INFERENCE], None, StageRecorder(), "warmup")
+    run_windows(cached, frames[:FRAMES_PER_INFERENCE], keys[:FRAMES_PER_INFERENCE], cache, StageRecorder(), "warmup")
+    uncached.images_encoded = cached.images_encoded = 0
+    expected = run_windows(uncached, frames, keys, None, recorder, "uncached")
+    actual = run_windows(cached, frames, keys, cache, recorder, "cached")
+
+    max_delta = max(float((np.abs(a - b) / np.maximum(np.abs(a), 1)).max()) for a, b in zip(expected, actual))
+    matches = max_delta <= args.tolerance
+    write_report({
+        "benchmark": "embedding_cache",
+        "config": {
+            "backend": args.backend, "compile": args.compile, "frames": args.frames,
+            "frames_per_inference": FRAMES_PER_INFERENCE, "encode_ms": args.encode_ms, "cache_size": args.cache_size,
+        },
+        "outputs_match": matches,
+        "max_relative_delta": max_delta,
+        "images_encoded": {"uncached": uncached.images_encoded, "cached": cached.images_encoded},
+        "stages": recorder.summary(),
+    }, args.output)
+    if not matches:
+        logger.error(f"Cached outputs differ from uncached ones by up to {max_delta}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("numpy", "torch"), default="numpy", help="tensor library of the stub")
+    parser.add_argument("--compile", action="store_true", help="torch.compile the stub's language model")
+    parser.add_argument("--compile-mode", default="max-autotune", help="torch.compile mode")
+    parser.add_argument("--frames", type=int, default=60, help="frames the windows slide over")
+    parser.add_argument("--encode-ms", type=float, default=20, help="simulated vision tower time per image")
+    parser.add_argument("--cache-size", type=int, default=64, help="cache entries")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="largest accepted relative output difference")
+    parser.add_argument("--output", default="-", help="report path, '-' for stdout")
+    logging.basicConfig(level=logging.WARNING)
+    args = parser.parse_args()
+    if args.compile and args.backend != "torch":
+        parser.error("--compile needs --backend torch")
+    main(args)
@@ -0,0 +1,90 @@
+"""
+Benchmark frame sources.
+
+Frames are extracted from the demo videos listed in `static/demos/demos.json`
+with ffmpeg, at the same 1.5 FPS the browser captures by default. When ffmpeg
+or the video files are not available, deterministic synthetic 1280x720 JPEG
+frames are generated instead so benchmarks still run anywhere.
+"""
+
+from dataclasses import dataclass
+from PIL import Image, ImageDraw
+from src.ingest import split_jpeg_stream
+from typing import List
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+
+DEMOS_DIR = os.path.join("static", "demos")
+CAPTURE_FPS = 1.5
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DemoClip:
+    name: str
+    prompt: str
+    frames: List[bytes]
+
+
+def load_demo_clips(max_frames: int = 30, synthetic_frames: int = 30) -> List[DemoClip]:
+    with open(os.path.join(DEMOS_DIR, "demos.json"), "r", encoding="utf-8") as f:
+        demos = json.load(f)
+
+    clips = []
+    for demo in demos:
+        video_path = os.path.join(DEMOS_DIR, demo["file"])
+        frames = extract_frames(video_path, max_frames) if os.path.exists(video_path) else []
+        if frames:
+            clips.append(DemoClip(demo["file"], demo["prompt"], frames))
+
+    if not clips:
+        logger.warning("demo videos not available, using synthetic frames")
+        prompt = demos[0]["prompt"] if demos else "white dog on bed"
+        clips.append(DemoClip("synthetic", prompt, synthetic_jpeg_frames(synthetic_frames)))
+    return clips
+
+
+def extract_frames(video_path: str, max_frames: int, fps: float = CAPTURE_FPS) -> List[bytes]:
+    """Decode a video into full-resolution JPEG frames, like the browser canvas capture."""
+    if not shutil.which("ffmpeg"):
+        return []
+
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-i", video_path,
+        "-vf", f"fps={fps}", "-frames:v", str(max_frames),
+        "-q:v", "3", "-f", "image2pipe", "-vcodec", "mjpeg", "-",
+    ]
+    try:
+        output = subprocess.run(cmd, check=True, capture_output=True).stdout
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"ffmpeg failed for {video_path}: {e.stderr.decode(errors='replace')}")
+        return []
+    frames, _ = split_jpeg_stream(output)
+    return frames
+
+
+def synthetic_jpeg_frames(count: int, width: int = 1280, height: int = 720, seed: int = 7) -> List[bytes]:
+    rng = random.Random(seed)
+    frames = []
+    x, y = width // 4, height // 2
+    for i in range(count):
+        image = Image.new("RGB", (width, height), (40 + i % 30, 60, 80))
+        draw = ImageDraw.Draw(image)
+        for _ in range(40):
+            x0, y0 = rng.randrange(width), rng.randrange(height)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            draw.rectangle((x0, y0, x0 + rng.randrange(20, 200), y0 + rng.randrange(20, 200)), fill=color)
+        x = (x + rng.randrange(-30, 31)) % width
+        y = (y + rng.randrange(-20, 21)) % height
+        draw.ellipse((x - 60, y - 40, x + 60, y + 40), fill=(250, 250, 250))
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        frames.append(buffer.getvalue())
+    return frames
@@ -0,0 +1,148 @@
+"""
+Deterministic OpenAI-compatible stand-in server for benchmarks and load tests.
+
+It implements just enough of `POST /v1/chat/completions` for the OpenRouter and
+Together engines: vision requests get a `|score|reason|` answer derived from a
+hash of the request, so the same frames and prompt always produce the same
+result; multi-prompt requests get one `|number|score|reason|` line per
+description. Latency, jitter, server errors and timeouts can be injected with a
+seeded random generator to reproduce slow or flaky providers.
+
+Run standalone with `python -m benchmarks.mock_server --port 8100`, then point
+the server at it with `OPENROUTER_API_KEY=mock OPENROUTER_BASE_URL=http://127.0.0.1:8100/v1`.
+"""
+
+from dataclasses import dataclass
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uvicorn
+
+
+@dataclass
+class MockServerConfig:
+    latency_ms: float = 200.0
+    jitter_ms: float = 50.0
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_ms: float = 10000.0
+    seed: int = 42
+
+
+def create_app(config: MockServerConfig) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(config.seed)
+    app.state.requests = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+
+        roll = rng.random()
+        delay = max(0.0, rng.gauss(config.latency_ms, config.jitter_ms)) / 1000
+        if roll < config.timeout_rate:
+            await asyncio.sleep(config.timeout_ms / 1000)
+        else:
+            await asyncio.sleep(delay)
+
+        if roll < config.timeout_rate + config.error_rate:
+            return JSONResponse(status_code=500, content={"error": {"message": "injected error"}})
+
+        return _completion(body, _answer(body))
+
+    return app
+
+
+def _answer(body: dict) -> str:
+    messages = body.get("messages", [])
+    content = messages[-1].get("content", "") if messages else ""
+    if isinstance(content, str):
+        return f"Summary of {len(content)} characters"
+
+    images = [part for part in content if part.get("type") == "image_url"]
+    digest = hashlib.sha256(json.dumps(content, sort_keys=True).encode()).digest()
+    text = "".join(part.get("text", "") for part in content if part.get("type") == "text")
+    if "User Descriptions:" in text:
+        descriptions = re.findall(r"^\d+\. ", text.split("User Descriptions:", 1)[1], re.MULTILINE)
+        return "\n".join(
+            f"|{number}|{digest[number % len(digest)] * 100 // 255}|Mock analysis of {len(images)} frames|"
+            for number in range(1, len(descriptions) + 1)
+        )
+    score = digest[0] * 100 // 255
+    return f"|{score}|Mock analysis of {len(images)} frames|"
+
+
+def _completion(body: dict, answer: str) -> dict:
+    return {
+        "id": f"mock-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": answer},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+class MockServer:
+    """Runs the stand-in server on a background thread for in-process benchmarks."""
+
+    def __init__(self, config: MockServerConfig, host: str = "127.0.0.1", port: int = 8100):
+        self.app = create_app(config)
+        self.base_url = f"http://{host}:{port}/v1"
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join()
+
+    @property
+    def request_count(self) -> int:
+        return self.app.state.requests
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="mean injected latency")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="fraction of requests that hang for --timeout-ms")
+    parser.add_argument("--timeout-ms", type=float, default=10000.0)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def config_from_args(args: argparse.Namespace) -> MockServerConfig:
+    return MockServerConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_ms=args.timeout_ms,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port)
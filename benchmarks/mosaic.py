@@ -0,0 +1,144 @@
+"""
+Compare per-frame inference against mosaic mode on the demo clips.
+
+For every sliding window of FRAMES_PER_INFERENCE frames the same engine is
+called twice: once with the separate frames and once with a single mosaic
+built by `util.create_mosaic`, its prompt prefixed with the tile layout
+sentence of `util.mosaic_layout_text` exactly as the server sends it. The report compares latency, images and payload
+bytes per request, estimated vision tokens (the cost driver for every engine)
+and agreement of the scores. Mosaic build time is reported as its own stage.
+The demos have no ground truth labels, so the per-frame result is the
+reference for accuracy.
+
+By default the engine is OpenRouter against the local stand-in server, which
+only exercises the pipeline. To measure real accuracy and latency, pass
+`--engine openrouter|together|gemma|onnx` with the matching API key, HF token or ONNX_MODEL_DIR set.
+
+Usage:
+    python -m benchmarks.mosaic --engine openrouter --windows 20 --grid auto
+"""
+
+from .frames import load_demo_clips
+from .mock_server import MockServer, add_arguments, config_from_args
+from .pipeline import FRAMES_PER_INFERENCE, create_engine
+from .report import StageRecorder, write_report
+from src import util
+import argparse
+import asyncio
+import base64
+import logging
+import time
+
+# Gemma 3n encodes every image into a fixed number of soft tokens, whatever its size
+VISION_TOKENS_PER_IMAGE = 256
+DETECTION_THRESHOLD = 90
+
+logger = logging.getLogger(__name__)
+
+
+def load_engine(name: str, base_url: str):
+    if name == "mock":
+        return create_engine("openrouter", base_url)
+    if name == "openrouter":
+        from src.openrouter_inference import OpenRouterInference
+        return OpenRouterInference()
+    if name == "together":
+        from src.together_inference import TogetherInference
+        return TogetherInference()
+    if name == "gemma":
+        from src.gemma_local_inference import GemmaLocalInference
+        return GemmaLocalInference()
+    if name == "onnx":
+        from src.onnx_local_inference import OnnxLocalInference
+        return OnnxLocalInference()
+    raise ValueError(f"Unknown engine: {name}")
+
+
+async def compare(engine, clips, windows: int, grid: str) -> dict:
+    recorder = StageRecorder()
+    totals = {mode: {"requests": 0, "images": 0, "payload_bytes": 0} for mode in ("frames", "mosaic")}
+    score_deltas = []
+    agreements = 0
+    compared = 0
+
+    for clip in clips:
+        timestamps = [i / 1.5 + time.time() for i in range(len(clip.frames))]
+        for start in range(min(windows, max(1, len(clip.frames) - FRAMES_PER_INFERENCE + 1))):
+            window = clip.frames[start:start + FRAMES_PER_INFERENCE]
+            resized = [util.resize_frame(frame, engine.max_frame_size, engine.jpeg_quality) for frame in window]
+            with recorder.measure("mosaic_build"):
+                mosaic = util.create_mosaic(window, timestamps[start:start + FRAMES_PER_INFERENCE], grid, engine.max_frame_size, engine.jpeg_quality)
+
+            mosaic_prompt = f"{util.mosaic_layout_text(grid, len(window))} {clip.prompt}"
+
+            results = {}
+            for mode, images in (("frames", resized), ("mosaic", [mosaic])):
+                begin = time.perf_counter()
+                if mode == "frames":
+                    result = await engine.process_frames(window, clip.prompt, "en")
+                else:
+                    result = await engine.process_frames([mosaic], mosaic_prompt, "en")
+                recorder.record(mode, time.perf_counter() - begin)
+                totals[mode]["requests"] += 1
+                totals[mode]["images"] += len(images)
+                totals[mode]["payload_bytes"] += sum(len(base64.b64encode(image)) for image in images)
+                if result.should_process:
+                    results[mode] = result.score
+                else:
+                    recorder.error(mode)
+
+            if len(results) == 2:
+                compared += 1
+                score_deltas.append(abs(results["frames"] - results["mosaic"]))
+                agreements += (results["frames"] >= DETECTION_THRESHOLD) == (results["mosaic"] >= DETECTION_THRESHOLD)
+
+    cost = {}
+    for mode, total in totals.items():
+        requests = max(1, total["requests"])
+        cost[mode] = {
+            "images_per_request": round(total["images"] / requests, 2),
+            "payload_kb_per_request": round(total["payload_bytes"] / requests / 1024, 1),
+            "est_vision_tokens_per_request": round(total["images"] / requests * VISION_TOKENS_PER_IMAGE),
+        }
+
+    return {
+        "latency": recorder.summary(),
+        "cost": cost,
+        "vision_token_reduction": round(cost["frames"]["images_per_request"] / max(cost["mosaic"]["images_per_request"], 1), 2),
+        "accuracy_vs_frames": {
+            "windows_compared": compared,
+            "mean_abs_score_delta": round(sum(score_deltas) / compared, 2) if compared else None,
+            "detection_agreement": round(agreements / compared, 3) if compared else None,
+        },
+    }
+
+
+async def main(args: argparse.Namespace):
+    clips = load_demo_clips(max_frames=args.frames)
+    with MockServer(config_from_args(args), port=args.port) as server:
+        engine = load_engine(args.engine, server.base_url)
+        result = await compare(engine, clips, args.windows, args.grid)
+
+    write_report({
+        "benchmark": "mosaic",
+        "config": {
+            "engine": args.engine,
+            "grid": args.grid,
+            "frames_per_inference": FRAMES_PER_INFERENCE,
+            "clips": [{"name": clip.name, "frames": len(clip.frames)} for clip in clips],
+        },
+        **result,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=("mock", "openrouter", "together", "gemma", "onnx"), default="mock")
+    parser.add_argument("--grid", default="auto", help="mosaic grid, 'auto' or COLSxROWS")
+    parser.add_argument("--windows", type=int, default=20, help="max windows compared per clip")
+    parser.add_argument("--frames", type=int, default=30, help="max frames extracted per demo video")
+    parser.add_argument("--port", type=int, default=8100, help="port for the stand-in server")
+    parser.add_argument("--output", default="-", help="report path, '-' for stdout")
+    add_arguments(parser)
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,129 @@
+"""
+Side-by-side comparison of the local engines: ONNX Runtime against transformers.
+
+Each engine runs in its own process so their imports and memory do not mix.
+Every process reports its import and model load time, the resident memory
+after loading and the peak after running the sliding windows of the demo
+clips, the inference latency percentiles and the score of every window. The
+report holds both runs and the agreement of their scores, with the Gemma
+engine as the reference.
+
+Needs HF_TOKEN (or a cached model with HF_HUB_OFFLINE=1) for Gemma and
+ONNX_MODEL_DIR for the ONNX engine; an engine whose dependencies are missing
+is reported as skipped.
+
+Usage:
+    python -m benchmarks.onnx_compare --windows 10 --output onnx_compare.json
+"""
+
+from .frames import load_demo_clips
+from .mosaic import DETECTION_THRESHOLD, load_engine
+from .pipeline import FRAMES_PER_INFERENCE
+from .report import StageRecorder, write_report
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import subprocess
+import sys
+import time
+
+ENGINES = ("gemma", "onnx")
+
+logger = logging.getLogger(__name__)
+
+
+def resident_mb() -> float:
+    """Current resident memory of this process."""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return round(pages * resource.getpagesize() / 2**20, 1)
+
+
+def peak_resident_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+async def run_engine(name: str, windows: int, frames: int) -> dict:
+    clips = load_demo_clips(max_frames=frames)
+    baseline_mb = resident_mb()
+    start = time.perf_counter()
+    engine = load_engine(name, base_url="")
+    load_s = time.perf_counter() - start
+    loaded_mb = resident_mb()
+
+    recorder = StageRecorder()
+    scores = []
+    for clip in clips:
+        for index in range(min(windows, max(1, len(clip.frames) - FRAMES_PER_INFERENCE + 1))):
+            window = clip.frames[index:index + FRAMES_PER_INFERENCE]
+            with recorder.measure("inference"):
+                result = await engine.process_frames(window, clip.prompt, "en")
+            if not result.should_process:
+                recorder.error("inference")
+            scores.append(result.score if result.should_process else None)
+
+    return {
+        "engine": engine.yourName(),
+        "load_s": round(load_s, 2),
+        "memory_mb": {
+            "baseline": baseline_mb,
+            "after_load": loaded_mb,
+            "peak": peak_resident_mb(),
+        },
+        "stages": recorder.summary(),
+        "scores": scores,
+    }
+
+
+def run_in_subprocess(name: str, args: argparse.Namespace) -> dict:
+    command = [sys.executable, "-m", "benchmarks.onnx_compare", "--worker", name,
+               "--windows", str(args.windows), "--frames", str(args.frames)]
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        error = process.stderr.strip().splitlines()
+        logger.warning(f"{name} engine failed: {error[-1] if error else process.returncode}")
+        return {"skipped": error[-1] if error else f"exit code {process.returncode}"}
+    # the report is the last line, libraries may print before it
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def agreement(reference: list, other: list) -> dict:
+    pairs = [(a, b) for a, b in zip(reference, other) if a is not None and b is not None]
+    if not pairs:
+        return {"compared": 0}
+    return {
+        "compared": len(pairs),
+        "mean_abs_score_delta": round(sum(abs(a - b) for a, b in pairs) / len(pairs), 2),
+        "detection_agreement": round(
+            sum((a >= DETECTION_THRESHOLD) == (b >= DETECTION_THRESHOLD) for a, b in pairs) / len(pairs), 3
+        ),
+    }
+
+
+def main(args: argparse.Namespace):
+    if args.worker:
+        print(json.dumps(asyncio.run(run_engine(args.worker, args.windows, args.frames))))
+        return
+
+    runs = {name: run_in_subprocess(name, args) for name in ENGINES}
+    report = {
+        "benchmark": "onnx_compare",
+        "config": {"windows": args.windows, "frames_per_inference": FRAMES_PER_INFERENCE},
+        "engines": runs,
+    }
+    if all("scores" in run for run in runs.values()):
+        report["agreement"] = agreement(runs["gemma"]["scores"], runs["onnx"]["scores"])
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, default=10, help="max windows run per clip")
+    parser.add_argument("--frames", type=int, default=30, help="max frames extracted per demo video")
+    parser.add_argument("--output", default="-", help="report path, '-' for stdout")
+    parser.add_argument("--worker", choices=ENGINES, help=argparse.SUPPRESS)
+    logging.basicConfig(level=logging.WARNING)
+    main(parser.parse_args())
@@ -0,0 +1,124 @@
+"""
+Offline benchmark of the frame processing hot path.
+
+Measures the CPU stages (`util.resize_frame`, prompt building, base64 encoding
+and `util.extract_score_and_reason`) on demo frames, then drives the real
+OpenRouter and Together engines against the local stand-in server with the
+configured latency and error injection. The report contains throughput and
+p50/p95/p99 latency per stage.
+
+Usage:
+    python -m benchmarks.pipeline --iterations 100 --output bench_output.json
+"""
+
+from .frames import load_demo_clips
+from .mock_server import MockServer, add_arguments, config_from_args
+from .report import StageRecorder, write_report
+from src import util
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import time
+
+FRAMES_PER_INFERENCE = int(os.getenv("FRAMES_PER_INFERENCE", 3))
+
+SAMPLE_RESPONSES = [
+    "|100|Clear orange cat sitting on the couch|",
+    "|0|No people visible in the frame|",
+    "Sure! |75|Person appears to be smiling but partially obscured|",
+    "I cannot determine that from these frames.",
+]
+
+logger = logging.getLogger(__name__)
+
+
+def bench_cpu_stages(recorder: StageRecorder, clips, iterations: int):
+    for clip in clips:
+        for i in range(iterations):
+            frame = clip.frames[i % len(clip.frames)]
+            with recorder.measure("resize"):
+                resized = util.resize_frame(frame)
+            with recorder.measure("base64"):
+                base64.b64encode(resized).decode("utf-8")
+            with recorder.measure("prompt"):
+                util.create_analysis_prompt(clip.prompt, "en")
+            with recorder.measure("parse"):
+                util.extract_score_and_reason(SAMPLE_RESPONSES[i % len(SAMPLE_RESPONSES)])
+
+
+def create_engine(name: str, base_url: str):
+    if name == "openrouter":
+        os.environ.setdefault("OPENROUTER_API_KEY", "mock")
+        os.environ["OPENROUTER_BASE_URL"] = base_url
+        from src.openrouter_inference import OpenRouterInference
+        return OpenRouterInference()
+    if name == "together":
+        os.environ.setdefault("TOGETHER_API_KEY", "mock")
+        os.environ["TOGETHER_BASE_URL"] = base_url
+        from src.together_inference import TogetherInference
+        return TogetherInference()
+    raise ValueError(f"Unknown engine: {name}")
+
+
+async def bench_engine(recorder: StageRecorder, stage: str, engine, clips, iterations: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(i: int):
+        clip = clips[i % len(clips)]
+        start_index = i % max(1, len(clip.frames) - FRAMES_PER_INFERENCE + 1)
+        window = clip.frames[start_index:start_index + FRAMES_PER_INFERENCE]
+        async with semaphore:
+            start = time.perf_counter()
+            result = await engine.process_frames(window, clip.prompt, "en")
+            recorder.record(stage, time.perf_counter() - start)
+            if not result.should_process:
+                recorder.error(stage)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one(i) for i in range(iterations)))
+    recorder.set_wall_time(stage, time.perf_counter() - start)
+
+
+async def main(args: argparse.Namespace):
+    clips = load_demo_clips(max_frames=args.frames)
+    recorder = StageRecorder()
+    bench_cpu_stages(recorder, clips, args.iterations)
+
+    config = config_from_args(args)
+    with MockServer(config, port=args.port) as server:
+        for name in args.engines.split(","):
+            try:
+                engine = create_engine(name, server.base_url)
+            except ImportError as e:
+                logger.warning(f"Skipping {name}: {e}")
+                continue
+            await bench_engine(recorder, f"engine:{name}", engine, clips, args.iterations, args.concurrency)
+        requests_served = server.request_count
+
+    write_report({
+        "benchmark": "pipeline",
+        "config": {
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "frames_per_inference": FRAMES_PER_INFERENCE,
+            "clips": [{"name": clip.name, "frames": len(clip.frames)} for clip in clips],
+            "mock_server": vars(config),
+            "mock_requests_served": requests_served,
+        },
+        "stages": recorder.summary(),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", default="openrouter,together", help="comma separated engines to drive")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--frames", type=int, default=30, help="max frames extracted per demo video")
+    parser.add_argument("--port", type=int, default=8100, help="port for the stand-in server")
+    parser.add_argument("--output", default="-", help="report path, '-' for stdout")
+    add_arguments(parser)
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,245 @@
+"""
+Replay a recorded session to benchmark and regression-test the pipeline.
+
+Feeds a recording written by the session recorder (RECORDING_DIR) back, with
+its original timing divided by `--speed`:
+
+- `--mode ws` streams it through `/ws/frames` of a running server, like a
+  browser would. Start the server with REPLAY_RECORDING pointing at the same
+  recording (and REPLAY_SPEED matching `--speed`) to answer with the recorded
+  responses instead of a real engine.
+- `--mode pipeline` runs the server's inference worker in-process, without
+  HTTP, with the recorded responses as the engine (`--engine recorded`) or the
+  engine configured in the environment (`--engine configured`). Inference
+  intervals are divided by the speed unless INFERENCE_INTERVAL is set.
+
+Alert addresses in the recorded params are dropped, and a pipeline replay
+also clears the server-wide ALERT_EMAIL and ALERT_WEBHOOK_URL, so a replay
+never emails or posts to anyone. The replay ends once the results still in flight when the recording
+ends are in. The report holds the frame-to-result latency and the agreement of
+every score with the latest response recorded up to the result's newest frame.
+
+Usage:
+    RECORDING_DIR=recordings python main.py  # then use the app
+    python -m benchmarks.replay recordings/<session>-<time> --mode pipeline --speed 4
+"""
+
+from .mosaic import DETECTION_THRESHOLD
+from .report import StageRecorder, write_report
+from bisect import bisect_right
+from datetime import datetime
+from src.session_recorder import read_recording
+from typing import Callable, Dict, Optional
+import argparse
+import asyncio
+import base64
+import httpx
+import logging
+import msgpack
+import os
+import re
+import time
+import websockets
+
+# time for a last inference to be scheduled after the recording ends, on top of the longest engine latency
+DRAIN_MARGIN_SECONDS = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayStats:
+    def __init__(self):
+        self.recorder = StageRecorder()
+        self.frames_sent = 0
+        self.results = 0
+        self.state_changes = 0
+        self.detections = 0
+        self.sent_at: Dict[int, float] = {}
+        self.recorded_scores: Dict[int, float] = {}
+        self.replayed_scores: Dict[int, float] = {}
+        self.recorded_duration = 0.0
+        self.max_latency = 0.0
+
+    def drain_seconds(self, speed: float) -> float:
+        return self.max_latency / speed + DRAIN_MARGIN_SECONDS
+
+    def on_message(self, message: dict):
+        if message.get("type") == "state":
+            self.state_changes += 1
+            self.detections += message.get("state") == "detected"
+            return
+        self.results += 1
+        seq_to = message.get("seq_to")
+        sent_at = self.sent_at.get(seq_to)
+        if sent_at is not None:
+            self.recorder.record("frame_to_result", time.perf_counter() - sent_at)
+        if seq_to is not None:
+            self.replayed_scores[seq_to] = message.get("confidence")
+
+
+def control_message(record: dict) -> dict:
+    params = {key: value for key, value in (record.get("params") or {}).items() if key != "alert_email"}
+    return {
+        "v": 2, "type": "control", "prompt": record["prompt"], "language": record["language"], "params": params,
+        "prompts": record["prompts"], "regions": record["regions"],
+    }
+
+
+async def play(recording: str, speed: float, stats: ReplayStats, send_control: Callable, send_frame: Callable):
+    """Send the records at their recorded pace; frames get new capture times on the same timeline."""
+    start, first_t, clock_offset = time.perf_counter(), None, None
+    wall_start = time.time()
+    for record in read_recording(recording):
+        first_t = record["t"] if first_t is None else first_t
+        stats.recorded_duration = record["t"] - first_t
+        await asyncio.sleep(max(0.0, start + stats.recorded_duration / speed - time.perf_counter()))
+
+        if record["type"] == "control":
+            await send_control(control_message(record))
+        elif record["type"] == "frame":
+            stats.sent_at[record["seq"]] = time.perf_counter()
+            stats.frames_sent += 1
+            # capture times come from the client's clock, record times from the server's
+            if clock_offset is None:
+                clock_offset = record["t"] - record["ts"]
+            captured_at = wall_start + (record["ts"] + clock_offset - first_t) / speed
+            await send_frame(record["seq"], captured_at, record["frame"])
+        elif record["type"] == "response":
+            stats.max_latency = max(stats.max_latency, record["latency"])
+            if record["should_process"] and record["seq_to"] is not None:
+                stats.recorded_scores[record["seq_to"]] = record["score"]
+
+
+async def replay_ws(args: argparse.Namespace, stats: ReplayStats):
+    auth = (args.username, args.password) if args.username else None
+    async with httpx.AsyncClient(base_url=args.url, auth=auth) as client:
+        response = await client.get("/init")
+        response.raise_for_status()
+        session_id = response.cookies["session_id"]
+
+    ws_url = re.sub(r"^http", "ws", args.url) + "/ws/frames"
+    headers = {"Cookie": f"session_id={session_id}"}
+    if auth:
+        credentials = base64.b64encode(f"{args.username}:{args.password}".encode()).decode()
+        headers["Authorization"] = f"Basic {credentials}"
+
+    async with websockets.connect(ws_url, extra_headers=headers, max_size=None) as websocket:
+        async def receive():
+            async for message in websocket:
+                stats.on_message(msgpack.unpackb(message, raw=False))
+
+        async def send_frame(seq: int, captured_at: float, frame: bytes):
+            await websocket.send(msgpack.packb({"v": 2, "type": "frame", "seq": seq, "ts": captured_at * 1000, "frame": frame}))
+
+        receiver = asyncio.create_task(receive())
+        try:
+            await play(args.recording, args.speed, stats, lambda message: websocket.send(msgpack.packb(message)), send_frame)
+            await asyncio.sleep(stats.drain_seconds(args.speed))
+        finally:
+            receiver.cancel()
+
+
+async def replay_pipeline(args: argparse.Namespace, stats: ReplayStats) -> Optional[dict]:
+    os.environ["REPLAY_SPEED"] = str(args.speed)
+    if args.engine == "recorded":
+        os.environ["REPLAY_RECORDING"] = args.recording
+    os.environ.setdefault("INFERENCE_INTERVAL", str(1 / args.speed))
+    os.environ.setdefault("INFERENCE_SLOW_INTERVAL", str(5 / args.speed))
+    # main reads its configuration on import
+    import main
+    from src import frame_protocol
+    from src.model.session import Session
+
+    main.validate_environment()
+    # replayed detections must not reach the alert channels of the environment
+    main.alert_dispatcher.to_email = None
+    main.alert_dispatcher.webhook_url = None
+    session = Session(username="replay", created_at=datetime.now(), protocol_version=frame_protocol.PROTOCOL_V2)
+    running = True
+    worker = asyncio.create_task(main.inference_worker("replay", session, lambda: running, stats.on_message))
+
+    async def send_control(message: dict):
+        main.apply_control_message(session, frame_protocol.decode(msgpack.packb(message))[0])
+
+    async def send_frame(seq: int, captured_at: float, frame: bytes):
+        main.append_frame(session, frame_protocol.FrameMessage(frame_protocol.PROTOCOL_V2, data=frame, seq=seq,
+                                                               captured_at=captured_at))
+
+    try:
+        await play(args.recording, args.speed, stats, send_control, send_frame)
+        await asyncio.sleep(stats.drain_seconds(args.speed))
+    finally:
+        running = False
+        worker.cancel()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+
+    engine = main.inference_engine
+    while engine is not None and not hasattr(engine, "matched"):
+        engine = vars(engine).get("engine")
+    return {"matched": engine.matched, "unmatched": engine.unmatched} if engine else None
+
+
+def agreement(stats: ReplayStats) -> dict:
+    # replayed windows rarely end on the same frame as the recorded ones
+    recorded_seqs = sorted(stats.recorded_scores)
+    pairs = []
+    for seq, score in stats.replayed_scores.items():
+        index = bisect_right(recorded_seqs, seq) - 1
+        if index >= 0 and score is not None:
+            pairs.append((stats.recorded_scores[recorded_seqs[index]], score))
+    if not pairs:
+        return {"compared": 0}
+    return {
+        "compared": len(pairs),
+        "mean_abs_score_delta": round(sum(abs(a - b) for a, b in pairs) / len(pairs), 2),
+        "detection_agreement": round(
+            sum((a >= DETECTION_THRESHOLD) == (b >= DETECTION_THRESHOLD) for a, b in pairs) / len(pairs), 3
+        ),
+    }
+
+
+async def main(args: argparse.Namespace):
+    stats = ReplayStats()
+    replay_engine = None
+    if args.mode == "ws":
+        await replay_ws(args, stats)
+    else:
+        replay_engine = await replay_pipeline(args, stats)
+
+    report = {
+        "benchmark": "replay",
+        "config": {"recording": args.recording, "mode": args.mode, "speed": args.speed, "engine": args.engine},
+        "recorded": {
+            "duration_s": round(stats.recorded_duration, 2),
+            "frames": stats.frames_sent,
+            "responses": len(stats.recorded_scores),
+        },
+        "replayed": {
+            "results": stats.results,
+            "state_changes": stats.state_changes,
+            "detections": stats.detections,
+        },
+        "stages": stats.recorder.summary(),
+        "agreement": agreement(stats),
+    }
+    if replay_engine:
+        report["replay_engine"] = replay_engine
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help="recording directory written by the session recorder")
+    parser.add_argument("--mode", choices=("ws", "pipeline"), default="pipeline", help="replay target")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 1 for the original pace")
+    parser.add_argument("--engine", choices=("recorded", "configured"), default="recorded",
+                        help="pipeline mode engine: recorded responses or the one configured in the environment")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server base URL including any path prefix")
+    parser.add_argument("--username", help="basic auth username for server mode")
+    parser.add_argument("--password", help="basic auth password for server mode")
+    parser.add_argument("--output", default="-", help="report path, '-' for stdout")
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,74 @@
+"""
+Latency collection and machine-readable report helpers shared by the benchmarks.
+"""
+
+from contextlib import contextmanager
+from typing import Dict, List
+import json
+import math
+import platform
+import time
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+class StageRecorder:
+    """Collects per-stage latency samples and summarizes them."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.wall_time: Dict[str, float] = {}
+
+    def record(self, stage: str, seconds: float):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def error(self, stage: str):
+        self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        yield
+        self.record(stage, time.perf_counter() - start)
+
+    def set_wall_time(self, stage: str, seconds: float):
+        """Wall-clock time of a stage run, used for throughput of concurrent stages."""
+        self.wall_time[stage] = seconds
+
+    def summary(self) -> Dict[str, dict]:
+        result = {}
+        for stage, samples in self.samples.items():
+            elapsed = self.wall_time.get(stage, sum(samples))
+            result[stage] = {
+                "count": len(samples),
+                "errors": self.errors.get(stage, 0),
+                "throughput_per_s": round(len(samples) / elapsed, 3) if elapsed else 0.0,
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+                "p50_ms": round(percentile(samples, 50) * 1000, 3),
+                "p95_ms": round(percentile(samples, 95) * 1000, 3),
+                "p99_ms": round(percentile(samples, 99) * 1000, 3),
+                "max_ms": round(max(samples) * 1000, 3),
+            }
+        return result
+
+
+def write_report(report: dict, output: str):
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        **report,
+    }
+    text = json.dumps(report, indent=2)
+    if output == "-":
+        print(text)
+    else:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
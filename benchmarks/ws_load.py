@@ -0,0 +1,209 @@
+"""
+End-to-end WebSocket load generator simulating N concurrent cameras.
+
+Each simulated camera calls `/init` to get a session cookie, opens `/ws/frames`
+and streams msgpack-encoded frames at the configured FPS, exactly like
+`useVideoDetection.js` (protocol v2 by default, `--protocol 1` for the legacy
+format). The run steps through increasing session counts and,
+for each step, reports the per-session result rate, frame-to-result latency,
+the inferences the server dropped and its event loop lag scraped from `/metrics`.
+The server slows idle sessions down (INFERENCE_INTERVAL up to
+INFERENCE_SLOW_INTERVAL), so a lower result rate alone is not a sign of overload.
+
+Start the server against the stand-in engine first, for example:
+    python -m benchmarks.mock_server --port 8100 &
+    OPENROUTER_API_KEY=mock OPENROUTER_BASE_URL=http://127.0.0.1:8100/v1 \\
+        SENTINELA_SERVER_MODE=1 DISABLE_AUTHENTICATION=1 python main.py
+
+Then:
+    python -m benchmarks.ws_load --sessions 1,10,50 --fps 1.5 --duration 30
+"""
+
+from .frames import load_demo_clips
+from .report import StageRecorder, percentile, write_report
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import base64
+import httpx
+import logging
+import msgpack
+import re
+import time
+import websockets
+
+logger = logging.getLogger(__name__)
+
+
+class CameraStats:
+    def __init__(self):
+        self.frames_sent = 0
+        self.results = 0
+        self.state_changes = 0
+        self.latencies: List[float] = []
+        self.last_frame_sent_at: Optional[float] = None
+        self.sent_at: Dict[int, float] = {}
+        self.error: Optional[str] = None
+
+
+async def run_camera(args: argparse.Namespace, clip, stats: CameraStats, deadline: float):
+    auth = (args.username, args.password) if args.username else None
+    async with httpx.AsyncClient(base_url=args.url, auth=auth) as client:
+        response = await client.get("/init")
+        response.raise_for_status()
+        session_id = response.cookies["session_id"]
+
+    ws_url = re.sub(r"^http", "ws", args.url) + "/ws/frames"
+    headers = {"Cookie": f"session_id={session_id}"}
+    if auth:
+        credentials = base64.b64encode(f"{args.username}:{args.password}".encode()).decode()
+        headers["Authorization"] = f"Basic {credentials}"
+
+    async with websockets.connect(ws_url, extra_headers=headers, max_size=None) as websocket:
+        async def receive_results():
+            async for message in websocket:
+                received_at = time.perf_counter()
+                result = msgpack.unpackb(message, raw=False)
+                if result.get("type") == "state":
+                    # detection state changes are not inference results and carry no sequence number
+                    stats.state_changes += 1
+                    continue
+                stats.results += 1
+                seq_to = result.get("seq_to")
+                if seq_to is not None:
+                    sent_at = stats.sent_at.get(seq_to)
+                    if sent_at is not None:
+                        stats.latencies.append(received_at - sent_at)
+                    # later results never refer to older frames, so forget them
+                    while stats.sent_at and next(iter(stats.sent_at)) <= seq_to:
+                        del stats.sent_at[next(iter(stats.sent_at))]
+                elif stats.last_frame_sent_at is not None:
+                    # v1 results carry no sequence number: measure against the newest frame sent
+                    stats.latencies.append(received_at - stats.last_frame_sent_at)
+
+        receiver = asyncio.create_task(receive_results())
+        if args.protocol == 2:
+            await websocket.send(msgpack.packb({"v": 2, "type": "control", "prompt": clip.prompt, "language": "en"}))
+        interval = 1 / args.fps
+        next_send = time.perf_counter()
+        try:
+            while time.perf_counter() < deadline:
+                seq = stats.frames_sent
+                frame = clip.frames[seq % len(clip.frames)]
+                if args.protocol == 2:
+                    packed = msgpack.packb({"v": 2, "type": "frame", "seq": seq, "ts": time.time() * 1000, "frame": frame})
+                else:
+                    packed = msgpack.packb({"prompt": clip.prompt, "frame": frame, "language": "en"})
+                await websocket.send(packed)
+                stats.last_frame_sent_at = time.perf_counter()
+                if args.protocol == 2:
+                    stats.sent_at[seq] = stats.last_frame_sent_at
+                stats.frames_sent += 1
+                next_send += interval
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+        finally:
+            receiver.cancel()
+
+
+async def scrape_metrics(args: argparse.Namespace) -> Dict[str, float]:
+    auth = (args.username, args.password) if args.username else None
+    try:
+        async with httpx.AsyncClient(base_url=args.url, auth=auth) as client:
+            response = await client.get("/metrics")
+            response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.warning(f"Unable to scrape /metrics: {e}")
+        return {}
+
+    values = {}
+    for line in response.text.splitlines():
+        if line.startswith("#") or not line.strip():
+            continue
+        name, value = line.rsplit(" ", 1)
+        values[name] = float(value)
+    return values
+
+
+def metric_delta(before: Dict[str, float], after: Dict[str, float], name: str) -> float:
+    return after.get(name, 0.0) - before.get(name, 0.0)
+
+
+async def client_loop_lag(recorder: StageRecorder, deadline: float):
+    """Lag of the generator's own event loop, to tell client saturation apart from server saturation."""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await asyncio.sleep(0.1)
+        recorder.record("client_loop_lag", time.perf_counter() - start - 0.1)
+
+
+async def run_step(args: argparse.Namespace, clips, sessions: int) -> dict:
+    before = await scrape_metrics(args)
+    deadline = time.perf_counter() + args.duration
+    cameras = [CameraStats() for _ in range(sessions)]
+    recorder = StageRecorder()
+
+    async def guarded(i: int):
+        try:
+            await run_camera(args, clips[i % len(clips)], cameras[i], deadline)
+        except Exception as e:
+            cameras[i].error = str(e)
+
+    await asyncio.gather(client_loop_lag(recorder, deadline), *(guarded(i) for i in range(sessions)))
+    after = await scrape_metrics(args)
+
+    latencies = [latency for camera in cameras for latency in camera.latencies]
+    rates = [camera.results / args.duration for camera in cameras]
+    received = sum(camera.results for camera in cameras)
+    lag_count = metric_delta(before, after, "sentinela_event_loop_lag_seconds_count")
+    lag_sum = metric_delta(before, after, "sentinela_event_loop_lag_seconds_sum")
+
+    return {
+        "sessions": sessions,
+        "failed_sessions": sum(1 for camera in cameras if camera.error),
+        "errors": sorted({camera.error for camera in cameras if camera.error})[:5],
+        "frames_sent": sum(camera.frames_sent for camera in cameras),
+        "results_received": received,
+        "state_changes": sum(camera.state_changes for camera in cameras),
+        "server_dropped_inferences": metric_delta(before, after, "sentinela_inferences_dropped_total"),
+        "result_rate_per_session": {
+            "mean": round(sum(rates) / len(rates), 3),
+            "min": round(min(rates), 3),
+            "max": round(max(rates), 3),
+        },
+        "frame_to_result_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+        },
+        "server_event_loop_lag_ms_mean": round(lag_sum / lag_count * 1000, 3) if lag_count else None,
+        "client_event_loop_lag_ms": recorder.summary().get("client_loop_lag", {}),
+    }
+
+
+async def main(args: argparse.Namespace):
+    clips = load_demo_clips(max_frames=args.frames)
+    steps = []
+    for sessions in [int(n) for n in args.sessions.split(",")]:
+        logger.warning(f"running {sessions} sessions for {args.duration}s")
+        steps.append(await run_step(args, clips, sessions))
+
+    write_report({
+        "benchmark": "ws_load",
+        "config": {"url": args.url, "fps": args.fps, "duration_s": args.duration, "protocol": args.protocol},
+        "steps": steps,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server base URL including any path prefix")
+    parser.add_argument("--sessions", default="1,5,10", help="comma separated session counts to step through")
+    parser.add_argument("--fps", type=float, default=1.5, help="frames per second per camera")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per step")
+    parser.add_argument("--protocol", type=int, choices=(1, 2), default=2, help="/ws/frames protocol version")
+    parser.add_argument("--frames", type=int, default=30, help="max frames extracted per demo video")
+    parser.add_argument("--username", help="basic auth username for server mode")
+    parser.add_argument("--password", help="basic auth password for server mode")
+    parser.add_argument("--output", default="-", help="report path, '-' for stdout")
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
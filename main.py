@@ -9,27 +9,57 @@ the following endpoints for the frontend:
 - WebSocket /ws/frames - Real-time frame processing and inference
 - POST /send-email - Send email notifications with attachments
 - POST /summarize-watch-logs - Generate summaries of watching events
+- GET /metrics - Pipeline metrics in the Prometheus text format
+- GET /prescreen/stats - Pre-screen escalation and agreement statistics
+- GET/POST /sources, DELETE /sources/{source_id} - Headless stream and video file ingestion (changes admin only)
+- GET /events - Stored inference results of a session, by time range and page
+- GET /governor - Latency governor operating level and decisions
+- GET /scheduler - Engine rate limit, fair share and queue delay of every session
+- GET /admin/profile - CPU sampling profile or torch trace of the live server (admin only)
 """
 
 from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, WebSocket, Depends, HTTPException, Cookie, Response
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, WebSocket, Depends, HTTPException, Cookie, Query, Request, Response
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.routing import APIRouter
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from fastapi.staticfiles import StaticFiles
+from src import frame_protocol, metrics, util
+from src.alert_dispatcher import AlertDispatcher
+from src.attachment_transcoder import AttachmentTranscoder, decode_data_url
 from src.browser_launcher import launch_browser
+from src.clip_builder import assemble_clip
+from src.coalescing import CoalescingInference
+from src.detection_state import DETECTED, DetectionTracker
+from src.email_digest import EmailDigest
 from src.email_service import EmailService
+from src.event_store import EventStore
+from src.frame_history import FrameHistoryStore
 from src.inference_engine import InferenceEngine
+from src.inference_scheduler import AdaptiveRate, FairScheduler, InferenceBudget
+from src.ingest import IngestSource, redact_url, resolve_source
+from src.latency_governor import LatencyGovernor, build_levels
 from src.model.email_request import EmailRequest
+from src.model.frame import Frame
+from src.model.inference_response import InferenceResponse
+from src.model.ingest_source_request import IngestSourceRequest
+from src.model.region import Region
 from src.model.session import Session
 from src.model.watch_log_request import WatchLogSummaryRequest, WatchLogSummaryResponse
+from src.model.watch_prompt import WatchPrompt
+from src.prescreen import PreScreenedInference, detection_thresholds
+from src.profiler import Profiler, ProfilerBusy
+from src.session_recorder import SessionRecorder
+from src.static_assets import REVALIDATE_CACHE_CONTROL, StaticAssets, asset_response
+from typing import Callable, List, Optional
 import asyncio
 import json
 import logging
-import msgpack
 import os
+import secrets
 import sys
+import tempfile
+import time
 import uuid
 
 HTTP_SERVER_PORT = 8000
@@ -38,19 +68,92 @@ frame_buffer_size = max(9, frames_per_inference + 3)
 is_server_mode = os.getenv("SENTINELA_SERVER_MODE") == '1'
 disable_authentication = os.getenv("DISABLE_AUTHENTICATION") == '1'
 server_path_prefix = os.getenv("SERVER_PATH_PREFIX", "")
+mosaic_grid = os.getenv("MOSAIC_GRID")
+inference_interval = float(os.getenv("INFERENCE_INTERVAL", 1))
+inference_slow_interval = float(os.getenv("INFERENCE_SLOW_INTERVAL", 5))
+scene_change_threshold = float(os.getenv("SCENE_CHANGE_THRESHOLD", 12))
+coalesce_inferences = os.getenv("COALESCE_INFERENCES", "1") == '1'
+event_store_path = os.getenv("EVENT_STORE_PATH", "sentinela_events.db")
+detection_threshold = float(os.getenv("DETECTION_THRESHOLD", 90))
+consecutive_detections = int(os.getenv("CONSECUTIVE_DETECTIONS", 2))
+alert_cooldown = float(os.getenv("ALERT_COOLDOWN", 60))
+frame_history_mb = float(os.getenv("FRAME_HISTORY_MB", 16))
+frame_history_dir = os.getenv("FRAME_HISTORY_DIR", os.path.join(tempfile.gettempdir(), "sentinela-frames"))
+clip_pre_roll = float(os.getenv("CLIP_PRE_ROLL", 6))
+clip_post_roll = float(os.getenv("CLIP_POST_ROLL", 4))
+clip_max_size = int(os.getenv("CLIP_MAX_SIZE", 480))
+clip_fps = float(os.getenv("CLIP_FPS", 2))
+recording_dir = os.getenv("RECORDING_DIR")
+ingest_file_dir = os.getenv("INGEST_FILE_DIR")
+max_ingest_sources = int(os.getenv("MAX_INGEST_SOURCES", 8))
+metrics_public = os.getenv("METRICS_PUBLIC") == '1'
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     if not is_server_mode:
         asyncio.create_task(launch_browser(HTTP_SERVER_PORT, server_path_prefix))
+    global event_store
+    loop_monitor_task = asyncio.create_task(metrics.monitor_event_loop_lag())
+    if session_recorder:
+        recorder_task = asyncio.create_task(session_recorder.run())
+    if event_store_path:
+        event_store = EventStore(event_store_path, retention_days=float(os.getenv("EVENT_RETENTION_DAYS", 7)))
+        event_store_task = asyncio.create_task(event_store.run())
+    for source in json.loads(os.getenv("INGEST_SOURCES", "[]")):
+        try:
+            start_ingest_source(IngestSourceRequest(**source))
+        except ValueError as e:
+            logger.error(f"Ingest source {redact_url(str(source.get('url')))} not started: {str(e)}")
     yield
+    for source in ingest_sources.values():
+        await source.stop()
+    loop_monitor_task.cancel()
+    if session_recorder:
+        recorder_task.cancel()
+    await email_digest.close()
+    if frame_histories:
+        frame_histories.close_all()
+    if event_store:
+        event_store_task.cancel()
+        event_store.close()
 
 logger = logging.getLogger(__name__)
 app = FastAPI(lifespan=lifespan)
 router = APIRouter(prefix=server_path_prefix)
 sessions: dict[str, Session] = {}
+ingest_sources: dict[str, IngestSource] = {}
 inference_engine: InferenceEngine = None
+engine_label = None
+prescreen_stage: Optional[PreScreenedInference] = None
+event_store: Optional[EventStore] = None
+latency_governor: LatencyGovernor = None
+inference_budget = InferenceBudget(float(os.getenv("ENGINE_RATE_LIMIT", 0)))
+fair_scheduler = FairScheduler(inference_budget)
 email_service = EmailService()
+email_digest = EmailDigest(
+    email_service,
+    window=float(os.getenv("EMAIL_DIGEST_WINDOW", 60)),
+    max_attachments=int(os.getenv("EMAIL_DIGEST_CLIPS", 3)),
+    transcoder=AttachmentTranscoder(
+        budget_bytes=int(float(os.getenv("EMAIL_ATTACHMENT_MB", 5)) * 2**20),
+        cache_size=int(os.getenv("EMAIL_TRANSCODE_CACHE", 16)),
+    ),
+)
+profiler = Profiler()
+session_recorder = SessionRecorder(
+    recording_dir,
+    segment_bytes=int(float(os.getenv("RECORDING_SEGMENT_MB", 16)) * 2**20),
+    max_bytes=int(float(os.getenv("RECORDING_MAX_MB", 256)) * 2**20),
+) if recording_dir else None
+frame_histories = FrameHistoryStore(frame_history_dir, int(frame_history_mb * 2**20)) if frame_history_mb > 0 else None
+alert_dispatcher = AlertDispatcher(
+    email_digest,
+    to_email=os.getenv("ALERT_EMAIL"),
+    webhook_url=os.getenv("ALERT_WEBHOOK_URL"),
+)
+metrics.BUFFERED_FRAME_BYTES.set_function(
+    lambda: sum(len(frame.data) for session in list(sessions.values()) for frame in session.frame_buffer)
+)
 
 if is_server_mode and not disable_authentication:
     security = HTTPBasic()
@@ -63,15 +166,30 @@ if is_server_mode and not disable_authentication:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         return credentials.username
+
+    def authenticate_admin(credentials: HTTPBasicCredentials = Depends(security)):
+        admin_password = os.getenv("ADMIN_PASSWORD")
+        if not admin_password:
+            raise HTTPException(status_code=403, detail="Admin access not configured")
+
+        if credentials.username != "admin" or not secrets.compare_digest(credentials.password, admin_password):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+
+        return credentials.username
 else:
     def authenticate():
         return "local_user"
 
-app.mount(f"{server_path_prefix}/static", StaticFiles(directory="static"), name="static")
+    def authenticate_admin():
+        return "local_user"
+
+static_assets = StaticAssets(directory="static")
+index_asset = static_assets.render_index()
+app.mount(f"{server_path_prefix}/static", static_assets, name="static")
     
 @router.get("/")
-async def read_root(username: str = Depends(authenticate)):
-    return FileResponse("static/index.html")
+async def read_root(request: Request, username: str = Depends(authenticate)):
+    return asset_response(index_asset, request.scope, REVALIDATE_CACHE_CONTROL)
 
 @app.get("/favicon.ico")
 async def read_icon():
@@ -81,6 +199,11 @@ async def read_icon():
 async def health_check():
     return {"status": "healthy"}
 
+# scrapers can send the guest credentials, METRICS_PUBLIC=1 serves the metrics without them
+@router.get("/metrics", dependencies=[] if metrics_public else [Depends(authenticate)])
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @router.get("/init")
 async def init_endpoint(username: str = Depends(authenticate), session_id: str = Cookie(None)):
     if not session_id or session_id not in sessions:
@@ -93,7 +216,16 @@ async def init_endpoint(username: str = Depends(authenticate), session_id: str =
     
     smtp_from_email = os.getenv("SMTP_FROM_EMAIL")
     engine_name = inference_engine.yourName()
-    response_data = {"email_address": smtp_from_email, "engine_name": engine_name}
+    response_data = {
+        "email_address": smtp_from_email,
+        "engine_name": engine_name,
+        "capture": {
+            # the governor may lower these at any time, clients capture for its best level
+            "max_dimension": latency_governor.levels[0].max_frame_size,
+            "jpeg_quality": latency_governor.levels[0].jpeg_quality,
+            "frames_per_inference": latency_governor.levels[0].frames_per_inference,
+        },
+    }
 
     response = Response(content=json.dumps(response_data), media_type="application/json")
     response.set_cookie(
@@ -156,34 +288,55 @@ async def websocket_frames(websocket: WebSocket):
     logger.info(f"WebSocket connection established at {datetime.now()} for session: {session_id}, user: {session_info.username}")
 
     session_info.current_prompt = None
+    session_info.prompts = []
+    session_info.regions = []
     session_info.frame_buffer.clear()
-    inference_task = asyncio.create_task(inference_worker(websocket, session_info))
+    session_info.last_seq = -1
+    session_info.trackers.clear()
+    if frame_histories:
+        session_info.history = frame_histories.open(session_id)
+    if session_recorder:
+        session_info.recording = session_recorder.open(session_id)
+    def publish_result(message: dict):
+        if websocket.client_state.value == 1:
+            asyncio.create_task(websocket.send_bytes(frame_protocol.pack(message)))
+
+    inference_task = asyncio.create_task(
+        inference_worker(session_id, session_info, lambda: websocket.client_state.value == 1, publish_result)
+    )
+    metrics.ACTIVE_SESSIONS.inc()
 
     try:
         while True:
             packed_data = await websocket.receive_bytes()
+            ingest_start = time.perf_counter()
             
-            data = msgpack.unpackb(packed_data, raw=False)
-            prompt = data.get("prompt", "")
-            frame_data = bytes(data.get("frame", []))
-            language = data.get("language", "en")
-            
-            if not prompt or not frame_data:
+            try:
+                with metrics.STAGE_LATENCY.time(stage="decode"):
+                    messages = frame_protocol.decode(packed_data)
+            except frame_protocol.ProtocolError as e:
+                logger.warning(f"Invalid frame message: {e}")
                 continue
 
-            if session_info.current_prompt != prompt:
-                session_info.frame_buffer.clear()
-                session_info.current_prompt = prompt
-            
-            session_info.language = language
-            session_info.frame_buffer.append(frame_data)
-            
-            if len(session_info.frame_buffer) > frame_buffer_size:
-                del session_info.frame_buffer[:-frame_buffer_size]
+            for message in messages:
+                if isinstance(message, frame_protocol.ControlMessage):
+                    apply_control_message(session_info, message)
+                else:
+                    append_frame(session_info, message)
+
+            metrics.STAGE_LATENCY.observe(time.perf_counter() - ingest_start, stage="ingest")
             
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
+        metrics.ACTIVE_SESSIONS.dec()
+        session_info.frame_buffer.clear()
+        if frame_histories:
+            frame_histories.close(session_id)
+            session_info.history = None
+        if session_recorder:
+            session_recorder.close(session_id)
+            session_info.recording = None
         try:
             inference_task.cancel()
             await inference_task
@@ -192,52 +345,379 @@ async def websocket_frames(websocket: WebSocket):
     
     logger.info(f"WebSocket connection closed at {datetime.now()}")
 
-async def inference_worker(websocket: WebSocket, session_info: Session):
-    while websocket.client_state.value == 1:
+def apply_control_message(session_info: Session, message: frame_protocol.ControlMessage):
+    session_info.protocol_version = message.version
+    if message.prompts is not None and session_info.prompts != message.prompts:
+        session_info.frame_buffer.clear()
+        session_info.prompts = message.prompts
+    elif message.prompt and (session_info.current_prompt != message.prompt or session_info.prompts):
+        session_info.frame_buffer.clear()
+        session_info.prompts = []
+    if message.prompt:
+        session_info.current_prompt = message.prompt
+    if message.regions is not None and session_info.regions != message.regions:
+        session_info.frame_buffer.clear()
+        session_info.regions = message.regions
+    if message.language:
+        session_info.language = message.language
+    session_info.params.update(message.params)
+    if session_info.recording:
+        record_control(session_info)
+
+def record_control(session_info: Session):
+    session_info.recording.control(session_info.current_prompt, session_info.prompts, session_info.regions,
+                                   session_info.language, session_info.params)
+
+def append_frame(session_info: Session, message: frame_protocol.FrameMessage):
+    seq = message.seq if message.seq is not None else session_info.last_seq + 1
+    if seq <= session_info.last_seq:
+        logger.debug(f"Dropping out of order frame seq={seq}, last_seq={session_info.last_seq}")
+        return
+
+    session_info.last_seq = seq
+    frame = Frame(data=message.data, seq=seq, captured_at=message.captured_at)
+    session_info.frame_buffer.append(frame)
+    if len(session_info.frame_buffer) > frame_buffer_size:
+        del session_info.frame_buffer[:-frame_buffer_size]
+    if session_info.history:
+        session_info.history.append(message.captured_at, message.data)
+    if session_info.recording:
+        session_info.recording.frame(frame)
+
+async def inference_worker(session_id: str, session_info: Session, is_open: Callable[[], bool], publish: Callable[[dict], None]):
+    fair_scheduler.register(session_id, session_info.username)
+    try:
+        await inference_loop(session_id, session_info, is_open, publish)
+    finally:
+        fair_scheduler.unregister(session_id)
+
+async def inference_loop(session_id: str, session_info: Session, is_open: Callable[[], bool], publish: Callable[[dict], None]):
+    rate = AdaptiveRate(fast_interval=inference_interval, slow_interval=inference_slow_interval)
+    tick = min(0.5, inference_interval)
+    last_signature = None
+    last_checked_seq = None
+
+    while is_open():
         try:
-            await asyncio.sleep(1)
+            await asyncio.sleep(tick)
                 
-            frames_to_process = session_info.frame_buffer[-frames_per_inference:]
+            frames = session_info.frame_buffer[-latency_governor.current.frames_per_inference:]
+            newest = frames[-1] if frames else None
+            if newest and last_signature and rate.is_backed_off and newest.seq != last_checked_seq:
+                last_checked_seq = newest.seq
+                if util.signature_distance(util.frame_signature(newest.data), last_signature) > scene_change_threshold:
+                    metrics.SCENE_CHANGES.inc()
+                    rate.on_scene_change()
+
+            if not rate.is_due():
+                continue
+            await fair_scheduler.acquire(session_id, priority=is_detecting(session_info))
+            if not is_open():
+                break
+            rate.mark_run()
+            # frames kept arriving while the session waited for its turn
+            frames = session_info.frame_buffer[-latency_governor.current.frames_per_inference:]
+            newest = frames[-1] if frames else None
+            scheduled_at = time.perf_counter()
+            last_signature = util.frame_signature(newest.data) if newest else None
+
+            protocol_version = session_info.protocol_version
             current_prompt = session_info.current_prompt
+            watch_prompts = session_info.prompts
             current_language = session_info.language
+            regions = session_info.regions
+            prompt_texts = [prompt.text for prompt in watch_prompts]
+            whole_frame_prompts = []
+            if any(region.prompt for region in regions):
+                regions = [region for region in regions if region.prompt or current_prompt]
+                # the session's own prompts are scored on the uncropped frames, sent after the crops
+                whole_frame_prompts = watch_prompts
+                watch_prompts = [WatchPrompt(region.prompt or current_prompt, region.threshold) for region in regions]
+                groups = list(range(len(regions))) + [len(regions)] * len(whole_frame_prompts)
+                watch_prompts = watch_prompts + whole_frame_prompts
+                prompt_texts = region_prompt_texts(watch_prompts, groups, len(frames), tiles=bool(mosaic_grid))
             
-            if not current_prompt:
+            if not current_prompt and not watch_prompts:
                 logger.warning("weird: no prompt")
                 continue
 
-            def handle_frame_result(task):
+            frames_to_process = [frame.data for frame in frames]
+            timestamps = [frame.captured_at for frame in frames]
+            loop = asyncio.get_running_loop()
+            if regions and frames:
+                frames_to_process = await loop.run_in_executor(
+                    None, crop_to_regions, frames_to_process, regions,
+                    inference_engine.max_frame_size, inference_engine.jpeg_quality,
+                ) + (frames_to_process if whole_frame_prompts else [])
+                timestamps = timestamps * (len(regions) + bool(whole_frame_prompts))
+            engine_prompt = current_prompt
+            if mosaic_grid and frames:
+                layout = util.mosaic_layout_text(mosaic_grid, len(frames_to_process), len(frames_to_process) // len(frames))
+                engine_prompt = f"{layout} {current_prompt}" if current_prompt else None
+                prompt_texts = [f"{layout} {text}" for text in prompt_texts]
+                mosaic = await loop.run_in_executor(
+                    None, util.create_mosaic, frames_to_process, timestamps,
+                    mosaic_grid, inference_engine.max_frame_size, inference_engine.jpeg_quality,
+                )
+                frames_to_process = [mosaic]
+
+            engine_started_at = time.perf_counter()
+            def handle_frame_result(task, frames=frames, protocol_version=protocol_version, watch_prompts=watch_prompts,
+                                    current_prompt=current_prompt, scheduled_at=scheduled_at, engine_started_at=engine_started_at):
+                metrics.INFLIGHT_REQUESTS.dec(engine=engine_label)
                 try:
                     result = task.result()
-                    if not result.should_process or websocket.client_state.value != 1:
+                    if session_info.recording:
+                        session_info.recording.response(result, frames, time.perf_counter() - engine_started_at)
+                    # timeouts and errors are the overload the governor reacts to, windows dropped while busy are not
+                    latency = time.perf_counter() - scheduled_at
+                    if result.should_process:
+                        level_changed = latency_governor.observe(latency)
+                    else:
+                        level_changed = not result.busy and latency_governor.observe_failure(latency)
+                    if level_changed:
+                        apply_operating_level()
+                    if not result.should_process:
+                        metrics.INFERENCES_DROPPED.inc()
+                        return
+                    rate.on_result(result.score)
+                    if event_store:
+                        event_store.append(
+                            session_id, result, current_prompt,
+                            seq_from=frames[0].seq if frames else None,
+                            seq_to=frames[-1].seq if frames else None,
+                            watch_prompts=watch_prompts,
+                        )
+                    state_messages = update_detection_state(session_id, session_info, result, watch_prompts, current_prompt, frames)
+                    if not is_open():
                         return
                         
                     elapsed_time = (datetime.now().timestamp() - result.start_time)
                     logger.info(f"processing_time={elapsed_time:.2f}s, confidence={result.score}, reason={result.reason}")
 
-                    response_data = {
-                        "confidence": result.score,
-                        "reason": result.reason
-                    }
-                    packed_response = msgpack.packb(response_data)
-                    if websocket.client_state.value == 1:
-                        asyncio.create_task(websocket.send_bytes(packed_response))
+                    publish(frame_protocol.result_message(result, frames, protocol_version, watch_prompts))
+                    if protocol_version >= frame_protocol.PROTOCOL_V2:
+                        for message in state_messages:
+                            publish(message)
                 except Exception as e:
                     logger.error(f"Error processing frame: {e}")
 
-            task = asyncio.create_task(inference_engine.process_frames(frames_to_process, current_prompt, current_language))
+            metrics.INFLIGHT_REQUESTS.inc(engine=engine_label)
+            if watch_prompts:
+                thresholds = {text: prompt.threshold for text, prompt in zip(prompt_texts, watch_prompts)}
+                with detection_thresholds(thresholds):
+                    task = asyncio.create_task(inference_engine.process_frames_multi(frames_to_process, prompt_texts, current_language))
+            else:
+                with detection_thresholds({engine_prompt: detection_threshold}):
+                    task = asyncio.create_task(inference_engine.process_frames(frames_to_process, engine_prompt, current_language))
             task.add_done_callback(handle_frame_result)
             
         except Exception as e:
             logger.error(f"Inference worker error: {e}")
 
+def update_detection_state(session_id: str, session_info: Session, result: InferenceResponse, watch_prompts: List[WatchPrompt],
+                           current_prompt: Optional[str], frames: List[Frame]) -> List[dict]:
+    """Feed a result to the session's detection trackers, alert on new detections and return the state messages"""
+    if watch_prompts and result.prompt_scores:
+        scored = [
+            ((index, prompt.text), prompt.threshold, prompt_score)
+            for index, (prompt, prompt_score) in enumerate(zip(watch_prompts, result.prompt_scores))
+        ]
+    else:
+        scored = [((0, current_prompt), detection_threshold, result)]
+
+    trackers = session_info.trackers
+    for key in set(trackers) - {key for key, _, _ in scored}:
+        del trackers[key]
+
+    messages = []
+    for key, threshold, score in scored:
+        tracker = trackers.get(key)
+        if tracker is None:
+            tracker = trackers[key] = DetectionTracker(key[1], threshold, consecutive_detections, alert_cooldown)
+        tracker.threshold = threshold
+        transition = tracker.update(score.score, score.reason)
+        if not transition:
+            continue
+        notified = False
+        if transition.alert:
+            clip = None
+            if session_info.history and frames:
+                clip = assemble_clip(session_info.history, frames[-1].captured_at, clip_pre_roll, clip_post_roll,
+                                     clip_max_size, clip_fps)
+            notified = alert_dispatcher.notify(
+                session_id, transition, session_info.params.get("alert_email"), session_name(session_id, session_info), clip,
+            )
+        if transition.state == DETECTED:
+            logger.info(f"Detected '{transition.prompt}' in session {session_id}, confidence={transition.confidence}, "
+                        f"notified={notified}")
+        messages.append(frame_protocol.state_message(transition, key[0], frames, notified))
+    return messages
+
+def is_detecting(session_info: Session) -> bool:
+    return any(tracker.state == DETECTED for tracker in session_info.trackers.values())
+
+def session_name(session_id: str, session_info: Session) -> str:
+    return session_info.name or f"Session {session_id[:8]}"
+
+def apply_operating_level():
+    """Push the governor's frame size and JPEG quality to the engine and every wrapper around it"""
+    engine = inference_engine
+    while engine is not None:
+        engine.max_frame_size = latency_governor.current.max_frame_size
+        engine.jpeg_quality = latency_governor.current.jpeg_quality
+        engine = vars(engine).get("engine")
+
+def crop_to_regions(frames_data: List[bytes], regions: List[Region], max_size: int, quality: int) -> List[bytes]:
+    """Crop every frame to every region, grouped by region"""
+    return [util.crop_frame(frame_data, region, max_size, quality) for region in regions for frame_data in frames_data]
+
+def region_prompt_texts(watch_prompts: List[WatchPrompt], groups: List[int], frame_count: int, tiles: bool = False) -> List[str]:
+    """Tell the model which group of images, as laid out by crop_to_regions, each prompt is about"""
+    kind = "tiles" if tiles else "images"
+    return [
+        f"In {kind} {group * frame_count + 1}-{(group + 1) * frame_count} only: {prompt.text}"
+        for group, prompt in zip(groups, watch_prompts)
+    ]
+
+def start_ingest_source(request: IngestSourceRequest) -> str:
+    url = resolve_source(request.url, ingest_file_dir)
+    source_id = str(uuid.uuid4())
+    session_info = Session(
+        username="ingest",
+        created_at=datetime.now(),
+        name=request.name or f"Source {source_id[:8]}",
+        current_prompt=request.prompt,
+        language=request.language,
+        protocol_version=frame_protocol.PROTOCOL_V2,
+        regions=frame_protocol.decode_regions(request.regions),
+        params={"alert_email": request.alert_email},
+    )
+    max_dimension = inference_engine.max_frame_size
+    if session_info.regions:
+        max_dimension = util.capture_dimension_for_regions(session_info.regions, max_dimension)
+
+    def on_frame(frame_data: bytes):
+        append_frame(session_info, frame_protocol.FrameMessage(frame_protocol.PROTOCOL_V2, data=frame_data, captured_at=time.time()))
+
+    source = IngestSource(url, request.fps, max_dimension, inference_engine.jpeg_quality, on_frame)
+    ingest_sources[source_id] = source
+    if frame_histories:
+        session_info.history = frame_histories.open(source_id)
+    if session_recorder:
+        session_info.recording = session_recorder.open(source_id)
+        record_control(session_info)
+    source.start(inference_worker(source_id, session_info, lambda: source_id in ingest_sources, source.publish))
+    logger.info(f"Ingest source {source_id} started for {source.display_url}")
+    return source_id
+
+@router.get("/sources")
+async def list_sources(username: str = Depends(authenticate)):
+    """Status and latest result of every headless ingest source"""
+    return {source_id: source.status() for source_id, source in ingest_sources.items()}
+
+@router.post("/sources")
+async def add_source(request: IngestSourceRequest, username: str = Depends(authenticate_admin)):
+    """Decode a stream or video file on the server and watch it without a browser"""
+    if len(ingest_sources) >= max_ingest_sources:
+        raise HTTPException(status_code=429, detail=f"At most {max_ingest_sources} ingest sources can run")
+    try:
+        return {"source_id": start_ingest_source(request)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/sources/{source_id}")
+async def remove_source(source_id: str, username: str = Depends(authenticate_admin)):
+    """Stop decoding and watching an ingest source"""
+    source = ingest_sources.pop(source_id, None)
+    if not source:
+        raise HTTPException(status_code=404, detail="Source not found")
+    await source.stop()
+    if frame_histories:
+        frame_histories.close(source_id)
+    if session_recorder:
+        session_recorder.close(source_id)
+    return {"status": "stopped"}
+
+@router.get("/events")
+async def list_events(
+    username: str = Depends(authenticate),
+    session_id: str = Cookie(None),
+    source_id: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Stored results of the caller's session, or of an ingest source, newest first"""
+    if not event_store:
+        raise HTTPException(status_code=404, detail="Event store not enabled")
+    # only ingest source ids are accepted, other browser sessions' results stay private
+    if source_id is not None and source_id not in ingest_sources:
+        raise HTTPException(status_code=404, detail="Source not found")
+    events_session_id = source_id or session_id
+    if not events_session_id:
+        raise HTTPException(status_code=400, detail="No session")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, event_store.query, events_session_id, since, until, cursor, limit)
+
+@router.get("/governor")
+async def governor_status(username: str = Depends(authenticate)):
+    """Latency target, current operating level and recent decisions of the latency governor"""
+    return latency_governor.report()
+
+@router.get("/scheduler")
+async def scheduler_status(username: str = Depends(authenticate)):
+    """Engine rate limit, fair share and queue delay of every session waiting for the engine"""
+    return fair_scheduler.report()
+
+@router.get("/admin/profile")
+async def capture_profile(
+    username: str = Depends(authenticate_admin),
+    seconds: float = Query(10, gt=0, le=120),
+    kind: str = Query("cpu", pattern="^(cpu|torch)$"),
+):
+    """Profile the running server for a few seconds: collapsed stacks (cpu) or a Chrome trace (torch)"""
+    logger.info(f"Capturing a {seconds}s {kind} profile for {username}")
+    filename = f"sentinela-{kind}-{time.strftime('%Y%m%d-%H%M%S')}"
+    try:
+        if kind == "cpu":
+            return PlainTextResponse(
+                await profiler.capture_cpu(seconds),
+                headers={"Content-Disposition": f'attachment; filename="{filename}.collapsed"'},
+            )
+        return Response(
+            await profiler.capture_torch(seconds),
+            media_type="application/json",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.json"'},
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ImportError:
+        raise HTTPException(status_code=400, detail="torch is not installed")
+
+@router.get("/prescreen/stats")
+async def prescreen_stats(username: str = Depends(authenticate)):
+    """Escalation rate and agreement with the inference engine, per prompt"""
+    if not prescreen_stage:
+        raise HTTPException(status_code=404, detail="Pre-screen not enabled")
+    return prescreen_stage.report()
+
 @router.post("/send-email")
-async def send_email(email_request: EmailRequest, username: str = Depends(authenticate)):
-    """Send an email using SMTP"""
-    result = email_service.send_email(
+async def send_email(email_request: EmailRequest, username: str = Depends(authenticate), session_id: str = Cookie(None)):
+    """Send an email using SMTP, or queue it for the recipient's next digest"""
+    session_info = sessions.get(session_id)
+    try:
+        attachment = decode_data_url(email_request.video_attachment) if email_request.video_attachment else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await email_digest.submit(
+        email_request.to_email,
         subject=email_request.subject,
-        to_email=email_request.to_email,
         html_body=email_request.html_body,
-        video_attachment=email_request.video_attachment,
+        source=session_name(session_id, session_info) if session_info else "Sentinela",
+        attachments=[attachment] if attachment else None,
+        urgent=email_request.urgent,
     )
     
     if result["success"]:
@@ -267,8 +747,11 @@ def validate_environment():
         logger.error("Please set GUEST_PASSWORD to enable authentication")
         exit(1)
 
-    global inference_engine
-    if os.getenv("OPENROUTER_API_KEY"):
+    global inference_engine, engine_label, prescreen_stage, latency_governor
+    if os.getenv("REPLAY_RECORDING"):
+        from src.replay_inference import ReplayInference
+        inference_engine = ReplayInference()
+    elif os.getenv("OPENROUTER_API_KEY"):
         from src.openrouter_inference import OpenRouterInference
         inference_engine = OpenRouterInference()
     elif os.getenv("TOGETHER_API_KEY"):
@@ -278,14 +761,38 @@ def validate_environment():
         # not officially supported for now
         from src.google_ai_studio_inference import GoogleAIStudioInference
         inference_engine = GoogleAIStudioInference()
+    elif os.getenv("ONNX_MODEL_DIR"):
+        from src.onnx_local_inference import OnnxLocalInference
+        inference_engine = OnnxLocalInference()
     elif os.getenv("HF_TOKEN") or os.getenv("HF_HUB_OFFLINE"):
         from src.gemma_local_inference import GemmaLocalInference
         inference_engine = GemmaLocalInference()
     else:
         logger.error("No API key environment variable is set")
-        logger.error("Please set OPENROUTER_API_KEY or HF_TOKEN to use the appropriate inference engine")
+        logger.error("Please set OPENROUTER_API_KEY, ONNX_MODEL_DIR or HF_TOKEN to use the appropriate inference engine")
         exit(1)
 
+    engine_label = inference_engine.__class__.__name__
+    prescreen_model = os.getenv("PRESCREEN_MODEL")
+    if prescreen_model:
+        from src.prescreen import ClipPreScreen
+        prescreen_stage = PreScreenedInference(
+            inference_engine,
+            ClipPreScreen(prescreen_model),
+            threshold=float(os.getenv("PRESCREEN_THRESHOLD", 0.3)),
+            audit_rate=float(os.getenv("PRESCREEN_AUDIT_RATE", 0.05)),
+            detection_threshold=detection_threshold,
+        )
+        inference_engine = prescreen_stage
+
+    if coalesce_inferences:
+        inference_engine = CoalescingInference(inference_engine)
+
+    latency_governor = LatencyGovernor(
+        float(os.getenv("LATENCY_TARGET", 5)),
+        build_levels(frames_per_inference, inference_engine.max_frame_size, inference_engine.jpeg_quality),
+    )
+
 def setup_logging():
     info_handler = logging.StreamHandler(sys.stdout)
     info_handler.setLevel(logging.INFO)
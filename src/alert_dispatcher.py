@@ -0,0 +1,104 @@
+"""
+Alert dispatch for server-side detections.
+
+When a session's detection state machine raises an alert, the dispatcher
+notifies every configured channel in the background: an urgent email to the
+session's alert address, or the server-wide one, through the email digest,
+which folds alerts into a digest during bursts, and a JSON POST to a webhook.
+Both run in executor threads so a slow SMTP server or webhook never holds up
+inference. The webhook is posted right away; the email waits for the clip of
+the detection, assembled on the server from the session's frame history.
+"""
+
+from . import metrics
+from .detection_state import Transition
+from .email_digest import EmailDigest
+from .model.attachment import Attachment
+from datetime import datetime
+from html import escape
+from typing import Coroutine, Optional, Set
+import asyncio
+import json
+import logging
+import urllib.request
+
+WEBHOOK_TIMEOUT = 10
+
+logger = logging.getLogger(__name__)
+
+
+class AlertDispatcher:
+    def __init__(self, email_digest: EmailDigest, to_email: Optional[str] = None, webhook_url: Optional[str] = None):
+        self.email_digest = email_digest
+        self.to_email = to_email
+        self.webhook_url = webhook_url
+        self._tasks: Set[asyncio.Task] = set()
+
+    def notify(self, session_id: str, transition: Transition, to_email: Optional[str] = None, source: str = "Sentinela",
+               clip: Optional[Coroutine] = None) -> bool:
+        """
+        Send the alert in the background; returns whether any channel will be notified.
+        `clip` is awaited for the email attachment, and only runs if an email is sent.
+        """
+        to_email = to_email or self.to_email
+        if clip and not to_email:
+            clip.close()
+            clip = None
+        if not to_email and not self.webhook_url:
+            return False
+        task = asyncio.create_task(self._dispatch(session_id, transition, to_email, source, clip))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _dispatch(self, session_id: str, transition: Transition, to_email: Optional[str], source: str,
+                        clip: Optional[Coroutine]):
+        loop = asyncio.get_running_loop()
+        detected_at = datetime.now()
+        jobs = []
+        if self.webhook_url:
+            jobs.append(("webhook", loop.run_in_executor(None, self._post_webhook, session_id, transition, detected_at)))
+        if to_email:
+            jobs.append(("email", self._send_email(to_email, transition, detected_at, source, clip)))
+
+        for channel, job in jobs:
+            try:
+                await job
+                metrics.ALERTS_SENT.inc(channel=channel, result="success")
+            except Exception as e:
+                metrics.ALERTS_SENT.inc(channel=channel, result="failure")
+                logger.error(f"Failed to send {channel} alert for session {session_id}: {str(e)}")
+
+    async def _send_email(self, to_email: str, transition: Transition, detected_at: datetime, source: str,
+                          clip: Optional[Coroutine]):
+        attachment: Optional[Attachment] = await clip if clip else None
+        result = await self.email_digest.submit(
+            to_email,
+            subject="Sentinela Detection Alert!",
+            source=source,
+            attachments=[attachment] if attachment else None,
+            urgent=True,
+            html_body=f"""
+            <h2>Detection Alert</h2>
+            <p><strong>Time:</strong> {detected_at.strftime("%Y-%m-%d %H:%M:%S")}</p>
+            <p><strong>Prompt:</strong> {escape(transition.prompt)}</p>
+            <p><strong>Confidence:</strong> {transition.confidence}%</p>
+            <p><strong>Reason:</strong> {escape(transition.reason)}</p>
+            <br><br><i>Sentinela is watching</i>
+            """,
+        )
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+
+    def _post_webhook(self, session_id: str, transition: Transition, detected_at: datetime):
+        body = json.dumps({
+            "session_id": session_id,
+            "state": transition.state,
+            "prompt": transition.prompt,
+            "confidence": transition.confidence,
+            "reason": transition.reason,
+            "detected_at": detected_at.isoformat(),
+        }).encode()
+        request = urllib.request.Request(self.webhook_url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT):
+            pass
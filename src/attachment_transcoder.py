@@ -0,0 +1,220 @@
+"""
+Transcoding of email attachments to a size budget.
+
+Browser recordings arrive at whatever bitrate MediaRecorder picked, and a
+clip of a few seconds can weigh tens of megabytes: it slows SMTP delivery and
+can exceed the provider's message limit. Before an email goes out, each of its
+attachments goes through AttachmentTranscoder:
+
+- an attachment within the budget is sent as is;
+- a larger clip is re-encoded with ffmpeg to H.264 MP4, going down a ladder of
+  resolutions and frame rates, each step given the bitrate that spreads the
+  budget over the clip's duration;
+- when even the smallest step does not fit, the clip is replaced by a contact
+  sheet of its keyframes.
+
+Results are cached by content, so a clip sent to several recipients, or sent
+again in a digest, is processed once. Encoding runs in executor threads.
+
+Try a budget on a local file, offline:
+    python -m src.attachment_transcoder clip.webm --budget-mb 2 --output-dir out
+"""
+
+from . import metrics
+from .model.attachment import Attachment
+from collections import OrderedDict
+from PIL import Image
+from typing import Optional, Union
+import argparse
+import asyncio
+import base64
+import glob
+import hashlib
+import io
+import logging
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+DEFAULT_BUDGET_BYTES = 5 * 1024 * 1024
+# (max height, fps, lowest video bitrate in kbps worth encoding at that size)
+LADDER = ((720, 15, 500), (480, 12, 250), (360, 10, 120), (240, 8, 60))
+# share of the budget given to the video stream, the rest covers the MP4 container and rate control overshoot
+BITRATE_HEADROOM = 0.9
+CONTACT_SHEET_TILES = 9
+CONTACT_SHEET_COLUMNS = 3
+CONTACT_SHEET_TILE_WIDTH = 320
+CONTACT_SHEET_QUALITIES = (85, 70, 50, 30)
+FFMPEG_TIMEOUT = 120
+
+logger = logging.getLogger(__name__)
+
+
+def decode_data_url(data_url: str) -> Attachment:
+    """Decode a browser recording sent as a base64 data URL, so only its bytes are kept in memory."""
+    header, separator, encoded_data = data_url.partition("base64,")
+    if not data_url.startswith("data:") or not separator:
+        raise ValueError("Invalid data URL format")
+    if "video/mp4" in header:
+        return Attachment("detection_video.mp4", "video/mp4", base64.b64decode(encoded_data))
+    return Attachment("detection_video.webm", "video/webm", base64.b64decode(encoded_data))
+
+
+def _ffmpeg(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        ["ffmpeg", "-nostdin", "-y", "-loglevel", "error", *args],
+        capture_output=True, text=True, check=True, timeout=FFMPEG_TIMEOUT,
+    )
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Duration of the video stream in seconds, read from its packets without decoding them."""
+    # MediaRecorder WebM files have no duration in their header, so the demuxer has to read to the end
+    result = _ffmpeg("-progress", "pipe:1", "-i", path, "-map", "0:v:0", "-c", "copy", "-f", "null", "-")
+    durations = [
+        line.split("=", 1)[1] for line in result.stdout.splitlines() if line.startswith("out_time_us=")
+    ]
+    if not durations or not durations[-1].isdigit():
+        return None
+    duration = int(durations[-1]) / 1e6
+    return duration if duration > 0 else None
+
+
+def transcode(source: str, output: str, max_height: int, fps: int, kbps: int):
+    _ffmpeg(
+        "-i", source, "-an",
+        # never upscale, and keep the height even for yuv420p
+        "-vf", f"scale=-2:'2*trunc(min({max_height},ih)/2)',fps={fps}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-b:v", f"{kbps}k", "-maxrate", f"{kbps}k", "-bufsize", f"{2 * kbps}k",
+        "-movflags", "+faststart", output,
+    )
+
+
+def contact_sheet(source: str, directory: str, budget_bytes: int) -> Optional[bytes]:
+    """Tile up to CONTACT_SHEET_TILES evenly spaced keyframes into one JPEG within the budget."""
+    # -skip_frame nokey makes the decoder skip everything but keyframes
+    _ffmpeg("-skip_frame", "nokey", "-i", source, "-vsync", "vfr",
+            "-vf", f"scale={CONTACT_SHEET_TILE_WIDTH}:-2", "-q:v", "3",
+            os.path.join(directory, "keyframe_%04d.jpg"))
+    keyframes = sorted(glob.glob(os.path.join(directory, "keyframe_*.jpg")))
+    if not keyframes:
+        return None
+    if len(keyframes) > CONTACT_SHEET_TILES:
+        step = (len(keyframes) - 1) / (CONTACT_SHEET_TILES - 1)
+        keyframes = [keyframes[round(index * step)] for index in range(CONTACT_SHEET_TILES)]
+
+    tiles = [Image.open(path).convert("RGB") for path in keyframes]
+    tile_width, tile_height = tiles[0].size
+    columns = min(CONTACT_SHEET_COLUMNS, len(tiles))
+    sheet = Image.new("RGB", (columns * tile_width, math.ceil(len(tiles) / columns) * tile_height))
+    for index, tile in enumerate(tiles):
+        sheet.paste(tile, ((index % columns) * tile_width, (index // columns) * tile_height))
+
+    for quality in CONTACT_SHEET_QUALITIES:
+        output = io.BytesIO()
+        sheet.save(output, format="JPEG", quality=quality, optimize=True)
+        if output.tell() <= budget_bytes:
+            break
+    return output.getvalue()
+
+
+class AttachmentTranscoder:
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES, cache_size: int = 16):
+        self.budget_bytes = budget_bytes
+        self.cache_size = cache_size
+        # futures rather than results, so a clip requested again while it is encoding waits for the same job
+        self._cache: OrderedDict[str, asyncio.Future] = OrderedDict()
+
+    async def prepare(self, attachment: Union[str, Attachment]) -> Attachment:
+        """The attachment itself if it fits the budget, otherwise its re-encoded clip or contact sheet."""
+        if isinstance(attachment, str):
+            attachment = decode_data_url(attachment)
+        if len(attachment.data) <= self.budget_bytes:
+            metrics.ATTACHMENTS_PREPARED.inc(outcome="within_budget")
+            return attachment
+
+        key = hashlib.sha256(attachment.data).hexdigest()
+        future = self._cache.get(key)
+        if future is not None:
+            self._cache.move_to_end(key)
+            metrics.ATTACHMENTS_PREPARED.inc(outcome="cached")
+        else:
+            future = asyncio.get_running_loop().run_in_executor(None, self.fit, attachment)
+            self._cache[key] = future
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        # shielded so a cancelled sender does not cancel the job other recipients are waiting on
+        return await asyncio.shield(future)
+
+    def fit(self, attachment: Attachment) -> Attachment:
+        if not shutil.which("ffmpeg"):
+            logger.warning(f"ffmpeg not found, sending a {len(attachment.data) / 2**20:.1f}MB attachment as is")
+            metrics.ATTACHMENTS_PREPARED.inc(outcome="unprocessed")
+            return attachment
+
+        stem = os.path.splitext(attachment.filename)[0]
+        try:
+            with metrics.STAGE_LATENCY.time(stage="transcode"), tempfile.TemporaryDirectory() as directory:
+                source = os.path.join(directory, "source")
+                with open(source, "wb") as f:
+                    f.write(attachment.data)
+
+                duration = probe_duration(source)
+                headroom = BITRATE_HEADROOM
+                for max_height, fps, min_kbps in LADDER if duration else ():
+                    kbps = int(self.budget_bytes * 8 * headroom / duration / 1000)
+                    if kbps < min_kbps:
+                        continue
+                    output = os.path.join(directory, f"{max_height}p.mp4")
+                    transcode(source, output, max_height, fps, kbps)
+                    if os.path.getsize(output) <= self.budget_bytes:
+                        with open(output, "rb") as f:
+                            data = f.read()
+                        metrics.ATTACHMENTS_PREPARED.inc(outcome="transcoded")
+                        logger.info(f"Transcoded {attachment.filename} from {len(attachment.data) / 2**20:.1f}MB "
+                                    f"to {len(data) / 2**20:.1f}MB ({max_height}p, {fps}fps, {kbps}kbps)")
+                        return Attachment(f"{stem}.mp4", "video/mp4", data)
+                    headroom *= 0.85
+
+                sheet = contact_sheet(source, directory, self.budget_bytes)
+                if sheet:
+                    metrics.ATTACHMENTS_PREPARED.inc(outcome="contact_sheet")
+                    logger.info(f"Replaced {attachment.filename} ({len(attachment.data) / 2**20:.1f}MB) "
+                                f"with a {len(sheet) / 1024:.0f}KB contact sheet")
+                    return Attachment(f"{stem}_contact_sheet.jpg", "image/jpeg", sheet)
+
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Transcoding error: {e.stderr.strip()}")
+        except Exception as e:
+            logger.error(f"Transcoding error: {str(e)}")
+        metrics.ATTACHMENTS_PREPARED.inc(outcome="unprocessed")
+        return attachment
+
+
+def main(args: argparse.Namespace):
+    with open(args.input, "rb") as f:
+        data = f.read()
+    transcoder = AttachmentTranscoder(int(args.budget_mb * 2**20))
+    name = os.path.basename(args.input)
+    start = time.perf_counter()
+    result = transcoder.fit(Attachment(name, "video/" + name.rpartition(".")[2], data))
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output = os.path.join(args.output_dir, result.filename)
+    with open(output, "wb") as f:
+        f.write(result.data)
+    print(f"{len(data) / 2**20:.2f}MB -> {len(result.data) / 2**20:.2f}MB {result.content_type} in {elapsed:.1f}s: {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="video file to fit into the budget")
+    parser.add_argument("--budget-mb", type=float, default=DEFAULT_BUDGET_BYTES / 2**20, help="size budget in MB")
+    parser.add_argument("--output-dir", default=".", help="where the result is written")
+    logging.basicConfig(level=logging.INFO)
+    main(parser.parse_args())
@@ -0,0 +1,62 @@
+"""
+Single-flight coalescing of identical inference calls across sessions.
+
+In server mode several viewers often watch the same demo video or camera feed
+with the same prompt, so their sessions send identical windows to the engine at
+the same time. Calls are keyed on a hash of the frame bytes, the prompt(s) and
+the language: while a call for a key is in flight, identical calls wait for it
+and share its result instead of reaching the engine again.
+"""
+
+from . import metrics
+from .inference_engine import InferenceEngine
+from .model.inference_response import InferenceResponse
+from typing import Awaitable, Callable, Dict, List
+import asyncio
+import hashlib
+
+
+class CoalescingInference(InferenceEngine):
+    """Wraps an engine so concurrent identical requests share one in-flight call."""
+
+    def __init__(self, engine: InferenceEngine):
+        self.engine = engine
+        self.max_frame_size = engine.max_frame_size
+        self.jpeg_quality = engine.jpeg_quality
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    async def process_frames(self, frames_data: List[bytes], prompt: str, language: str = "en") -> InferenceResponse:
+        key = self._key(frames_data, ["single", prompt, language])
+        return await self._coalesce(key, lambda: self.engine.process_frames(frames_data, prompt, language))
+
+    async def process_frames_multi(self, frames_data: List[bytes], prompts: List[str], language: str = "en") -> InferenceResponse:
+        key = self._key(frames_data, ["multi", *prompts, language])
+        return await self._coalesce(key, lambda: self.engine.process_frames_multi(frames_data, prompts, language))
+
+    @staticmethod
+    def _key(frames_data: List[bytes], parts: List[str]) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk in [*frames_data, *(part.encode() for part in parts)]:
+            digest.update(len(chunk).to_bytes(8, "little"))
+            digest.update(chunk)
+        return digest.digest()
+
+    async def _coalesce(self, key: bytes, call: Callable[[], Awaitable[InferenceResponse]]) -> InferenceResponse:
+        inflight = self._inflight.get(key)
+        if inflight:
+            metrics.INFERENCES_COALESCED.inc()
+        else:
+            inflight = asyncio.ensure_future(call())
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # a waiter going away must not cancel the call the other sessions are waiting for
+        return await asyncio.shield(inflight)
+
+    async def summarize_watch_logs(self, events: List[str]) -> str:
+        return await self.engine.summarize_watch_logs(events)
+
+    def yourName(self) -> str:
+        return self.engine.yourName()
@@ -0,0 +1,59 @@
+"""
+Server-side detection state machine.
+
+Every watched prompt of a session goes through two states. It is WATCHING
+until its confidence reaches the threshold on enough consecutive inferences,
+then DETECTED until an inference scores below the threshold again. Only the
+transitions are pushed to clients, and a transition into DETECTED raises an
+alert unless the prompt already alerted within the cooldown period. Decisions
+no longer depend on a browser tab being in the foreground.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+import time
+
+WATCHING = "watching"
+DETECTED = "detected"
+
+
+@dataclass
+class Transition:
+    state: str
+    previous: str
+    prompt: str
+    confidence: float
+    reason: str
+    # whether this transition should notify, False while the prompt is in its alert cooldown
+    alert: bool = False
+
+
+class DetectionTracker:
+    def __init__(self, prompt: str, threshold: float = 90, consecutive_required: int = 2, cooldown: float = 60):
+        self.prompt = prompt
+        self.threshold = threshold
+        self.consecutive_required = max(1, consecutive_required)
+        self.cooldown = cooldown
+        self.state = WATCHING
+        self.hits = 0
+        self.last_alert_at: Optional[float] = None
+
+    def update(self, confidence: float, reason: str, now: Optional[float] = None) -> Optional[Transition]:
+        """Feed one inference result; returns the transition it caused, if any."""
+        now = time.monotonic() if now is None else now
+        if confidence < self.threshold:
+            self.hits = 0
+            if self.state == DETECTED:
+                self.state = WATCHING
+                return Transition(WATCHING, DETECTED, self.prompt, confidence, reason)
+            return None
+
+        self.hits += 1
+        if self.state == DETECTED or self.hits < self.consecutive_required:
+            return None
+
+        self.state = DETECTED
+        alert = self.last_alert_at is None or now - self.last_alert_at >= self.cooldown
+        if alert:
+            self.last_alert_at = now
+        return Transition(DETECTED, WATCHING, self.prompt, confidence, reason, alert)
@@ -0,0 +1,206 @@
+"""
+Per-recipient email coalescing and digests.
+
+Every alert and periodic update used to open its own SMTP session, so a burst
+of detections across cameras turned into a burst of emails and ran into
+provider rate limits. Notifications now go through EmailDigest. An urgent one
+is still sent at once, unless the recipient already got an immediate email
+within the digest window. Everything else is collected per recipient, and when
+the window closes the recipient gets a single email: the notification itself
+if it was alone, otherwise a digest with one section per camera and a bounded
+selection of the attachments. With a transcoder, attachments start being
+fitted to the size budget as soon as they are submitted, while they wait for
+the window to close.
+
+The caller of a queued notification has already been told it succeeded, so a
+digest that fails to send is queued again for the next window; notifications
+that fail a second time are dropped, logged and counted in
+sentinela_email_notifications_dropped_total.
+"""
+
+from . import metrics
+from .attachment_transcoder import AttachmentTranscoder
+from .email_service import EmailService
+from .model.attachment import Attachment
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from html import escape
+from typing import Dict, List, Optional, Set, Union
+import asyncio
+import logging
+import time
+
+# keeps digests well under the 25MB message limit of common providers
+MAX_ATTACHMENT_BYTES = 15 * 1024 * 1024
+MAX_SEND_ATTEMPTS = 2
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Notification:
+    subject: str
+    html_body: Optional[str]
+    source: str
+    # data URLs uploaded by the browser or clips built on the server
+    attachments: List[Union[str, Attachment]] = field(default_factory=list)
+    created_at: datetime = field(default_factory=datetime.now)
+    # fits the attachments to the transcoder's budget, replacing them when done
+    preparing: Optional[asyncio.Task] = None
+    attempts: int = 0
+
+
+def attachment_size(attachment: Union[str, Attachment]) -> int:
+    return len(attachment.data) if isinstance(attachment, Attachment) else len(attachment)
+
+
+def select_attachments(notifications: List[Notification], max_count: int,
+                       max_bytes: int = MAX_ATTACHMENT_BYTES) -> List[Union[str, Attachment]]:
+    """Newest attachments first, one camera at a time, so every camera gets its latest clip in before any second one."""
+    per_source: Dict[str, List[Union[str, Attachment]]] = OrderedDict()
+    for notification in reversed(notifications):
+        per_source.setdefault(notification.source, []).extend(reversed(notification.attachments))
+
+    selected, total = [], 0
+    while len(selected) < max_count and any(per_source.values()):
+        for attachments in per_source.values():
+            if not attachments or len(selected) >= max_count:
+                continue
+            attachment = attachments.pop(0)
+            size = attachment_size(attachment)
+            if total + size <= max_bytes:
+                selected.append(attachment)
+                total += size
+    return selected
+
+
+def render_digest(notifications: List[Notification]) -> str:
+    by_source: Dict[str, List[Notification]] = OrderedDict()
+    for notification in notifications:
+        by_source.setdefault(notification.source, []).append(notification)
+
+    sections = []
+    for source, items in by_source.items():
+        entries = "".join(
+            f"<div><p><strong>{item.created_at.strftime('%H:%M:%S')}</strong> - {escape(item.subject)}</p>"
+            f"{item.html_body or ''}</div><hr>"
+            for item in items
+        )
+        sections.append(f"<h2>{escape(source)} ({len(items)})</h2>{entries}")
+    return f"<h1>Sentinela digest</h1>{''.join(sections)}<br><br><i>Sentinela is watching</i>"
+
+
+class EmailDigest:
+    def __init__(self, email_service: EmailService, window: float = 60, max_attachments: int = 3,
+                 transcoder: Optional[AttachmentTranscoder] = None):
+        self.email_service = email_service
+        self.window = window
+        self.max_attachments = max_attachments
+        self.transcoder = transcoder
+        self._pending: Dict[str, List[Notification]] = {}
+        # waiting for the window to close, safe to cancel
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+        # sending a digest, the notifications already left _pending
+        self._sending: Set[asyncio.Task] = set()
+        self._last_immediate: Dict[str, float] = {}
+        self._closing = False
+
+    async def submit(
+        self,
+        to_email: str,
+        subject: str,
+        html_body: Optional[str] = None,
+        source: str = "Sentinela",
+        attachments: Optional[List[Union[str, Attachment]]] = None,
+        urgent: bool = False,
+    ) -> dict:
+        """Send now or add to the recipient's next digest; returns the send result, or queued=True."""
+        notification = Notification(subject, html_body, source, list(attachments or []))
+        if self.transcoder and notification.attachments:
+            notification.preparing = asyncio.create_task(self._prepare(notification))
+        now = time.monotonic()
+        last_immediate = self._last_immediate.get(to_email)
+        if self.window <= 0 or (urgent and (last_immediate is None or now - last_immediate >= self.window)):
+            self._last_immediate[to_email] = now
+            return await self._send(to_email, [notification])
+
+        self._pending.setdefault(to_email, []).append(notification)
+        self._schedule(to_email)
+        return {"success": True, "queued": True}
+
+    def _schedule(self, to_email: str):
+        if to_email not in self._flush_tasks and not self._closing:
+            self._flush_tasks[to_email] = asyncio.create_task(self._flush_later(to_email))
+
+    async def _flush_later(self, to_email: str):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._flush_tasks.pop(to_email, None)
+        task = asyncio.current_task()
+        self._sending.add(task)
+        try:
+            await self.flush(to_email)
+        finally:
+            self._sending.discard(task)
+
+    async def flush(self, to_email: str) -> Optional[dict]:
+        notifications = self._pending.pop(to_email, [])
+        if not notifications:
+            return None
+        result = await self._send(to_email, notifications)
+        if not result["success"]:
+            for notification in notifications:
+                notification.attempts += 1
+            retry = [notification for notification in notifications if notification.attempts < MAX_SEND_ATTEMPTS]
+            dropped = len(notifications) - len(retry)
+            if retry:
+                self._pending[to_email] = retry + self._pending.get(to_email, [])
+                self._schedule(to_email)
+            if dropped:
+                metrics.EMAIL_NOTIFICATIONS_DROPPED.inc(dropped)
+            logger.error(f"Failed to send {len(notifications)} notifications to {to_email}, {len(retry)} queued again, "
+                         f"{dropped} dropped: {result['error']}")
+        return result
+
+    async def close(self):
+        """Send everything still pending, used on shutdown."""
+        self._closing = True
+        for task in list(self._flush_tasks.values()):
+            task.cancel()
+        # digests being sent hold notifications that are no longer pending
+        await asyncio.gather(*self._sending, return_exceptions=True)
+        while self._pending:
+            for to_email in list(self._pending):
+                await self.flush(to_email)
+
+    async def _prepare(self, notification: Notification):
+        try:
+            notification.attachments = [
+                await self.transcoder.prepare(attachment) for attachment in notification.attachments
+            ]
+        except Exception as e:
+            logger.error(f"Failed to prepare attachments of '{notification.subject}': {str(e)}")
+
+    async def _send(self, to_email: str, notifications: List[Notification]) -> dict:
+        await asyncio.gather(*(notification.preparing for notification in notifications if notification.preparing))
+        if len(notifications) == 1:
+            notification = notifications[0]
+            subject, html_body = notification.subject, notification.html_body
+            attachments = notification.attachments
+        else:
+            sources = {notification.source for notification in notifications}
+            subject = f"Sentinela digest: {len(notifications)} notifications from {len(sources)} camera{'s' if len(sources) > 1 else ''}"
+            html_body = render_digest(notifications)
+            attachments = select_attachments(notifications, self.max_attachments)
+            metrics.EMAILS_COALESCED.inc(len(notifications) - 1)
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            None, lambda: self.email_service.send_email(
+                subject=subject, to_email=to_email, html_body=html_body, attachments=attachments,
+            )
+        )
+        metrics.EMAILS_SENT.inc(result="success" if result["success"] else "failure")
+        return result
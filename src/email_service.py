@@ -2,14 +2,17 @@
 Email service for sending detection notifications with video attachments.
 
 This module provides SMTP-based email functionality for the Sentinela monitoring system.
-It supports HTML email content and base64-encoded video attachments for detection alerts.
+It supports HTML email content, base64-encoded video attachments uploaded by the
+browser and clips built on the server, which are attached as raw bytes.
 The service handles various SMTP configurations and provides detailed error reporting.
 """
 
+from .model.attachment import Attachment
+from email import encoders
 from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import Optional
+from typing import List, Optional, Union
 import logging
 import os
 import smtplib
@@ -33,7 +36,8 @@ class EmailService:
         subject: str, 
         to_email: str,
         html_body: Optional[str] = None,
-        video_attachment: Optional[str] = None
+        video_attachment: Optional[str] = None,
+        attachments: Optional[List[Union[str, Attachment]]] = None
     ) -> dict:
         if not self.smtp_username or not self.smtp_password:
             return {
@@ -50,7 +54,12 @@ class EmailService:
             if html_body:
                 msg.attach(MIMEText(html_body, 'html'))
             
-            if video_attachment:
+            video_attachments = ([video_attachment] if video_attachment else []) + (attachments or [])
+            for index, video_attachment in enumerate(video_attachments):
+                if isinstance(video_attachment, Attachment):
+                    msg.attach(self._file_attachment(video_attachment, index if len(video_attachments) > 1 else None))
+                    continue
+
                 if not video_attachment.startswith('data:'):
                     return {
                         "success": False,
@@ -66,10 +75,11 @@ class EmailService:
                 try:
                     header, encoded_data = video_attachment.split('base64,', 1)
                     
+                    name = "detection_video" if len(video_attachments) == 1 else f"detection_video_{index + 1}"
                     if 'video/mp4' in header:
-                        filename = "detection_video.mp4"
+                        filename = f"{name}.mp4"
                     else:
-                        filename = "detection_video.webm"
+                        filename = f"{name}.webm"
                     
                     attachment = MIMEBase('application', 'octet-stream')
                     attachment.set_payload(encoded_data)
@@ -117,3 +127,16 @@ class EmailService:
                 "success": False,
                 "error": f"Failed to send email: {str(e)}"
             }
+
+    @staticmethod
+    def _file_attachment(attachment: Attachment, index: Optional[int]) -> MIMEBase:
+        filename = attachment.filename
+        if index is not None:
+            stem, dot, extension = filename.rpartition(".")
+            filename = f"{stem}_{index + 1}{dot}{extension}" if dot else f"{filename}_{index + 1}"
+        maintype, _, subtype = attachment.content_type.partition("/")
+        part = MIMEBase(maintype, subtype or "octet-stream")
+        part.set_payload(attachment.data)
+        encoders.encode_base64(part)
+        part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
+        return part
@@ -0,0 +1,102 @@
+"""
+LRU cache of vision-encoder outputs for the local engine.
+
+Consecutive inference windows slide over the frame buffer, so most of their
+frames were already encoded by the previous call. The cache wraps the model's
+`get_image_features` and keys every image by a hash of the JPEG bytes it was
+decoded from. Only images without a cached embedding go through the vision
+tower; the cached ones are spliced back into the batch in their original order
+before the language model sees them.
+
+The caller announces the keys of the images it is about to send with
+`frames(keys)` on the thread that runs the model. Calls without keys, or
+whose image count does not match, bypass the cache. Engines that run the
+vision encoder themselves call `encode` directly, with torch tensors or numpy
+arrays.
+
+The lookup runs in Python and encodes a different number of images on every
+call, so it has to stay outside torch.compile: compile only the language model
+of the module `install` returns. `python -m benchmarks.embedding_cache` checks
+that cached and uncached outputs match on a stub model and measures the gain.
+"""
+
+from . import metrics
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def frame_key(frame_data: bytes) -> bytes:
+    return hashlib.blake2b(frame_data, digest_size=16).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def frames(self, keys: List[bytes]):
+        """Keys of the images, in order, of the model calls made inside this block on this thread."""
+        self._local.keys = keys
+        try:
+            yield
+        finally:
+            self._local.keys = None
+
+    def install(self, model):
+        """Wrap get_image_features of the module whose forward encodes the images, and return that module."""
+        target = model.model if hasattr(getattr(model, "model", None), "get_image_features") else model
+        encode = target.get_image_features
+
+        def get_image_features(pixel_values, *args, **kwargs):
+            keys: Optional[List[bytes]] = getattr(self._local, "keys", None)
+            if not keys or len(keys) != pixel_values.shape[0] or args or kwargs:
+                return encode(pixel_values, *args, **kwargs)
+            return self.encode(encode, pixel_values, keys)
+
+        target.get_image_features = get_image_features
+        logger.info(f"Vision embedding cache installed on {target.__class__.__name__}, {self.max_entries} entries")
+        return target
+
+    def encode(self, encode, pixel_values, keys: List[bytes]):
+        """Run `encode` on the images whose embedding is not cached and return the embeddings of all of them."""
+        with self._lock:
+            cached = {key: self._entries[key] for key in keys if key in self._entries}
+            for key in cached:
+                self._entries.move_to_end(key)
+
+        missing = [index for index, key in enumerate(keys) if key not in cached]
+        metrics.EMBEDDING_CACHE_LOOKUPS.inc(len(keys) - len(missing), result="hit")
+        metrics.EMBEDDING_CACHE_LOOKUPS.inc(len(missing), result="miss")
+
+        encoded = {}
+        if missing:
+            features = encode(pixel_values[missing])
+            if len(features) != len(missing):
+                # not one embedding per image, nothing can be cached
+                return features
+            encoded = {keys[index]: features[row] for row, index in enumerate(missing)}
+            with self._lock:
+                for key, embedding in encoded.items():
+                    self._entries[key] = embedding
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return _stack([cached[key] if key in cached else encoded[key] for key in keys], pixel_values)
+
+
+def _stack(rows: list, like):
+    if type(like).__module__.startswith("torch"):
+        import torch
+        return torch.stack(rows)
+    import numpy
+    return numpy.stack(rows)
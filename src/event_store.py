@@ -0,0 +1,139 @@
+"""
+Persistent store of inference results.
+
+Every result published to a session is appended to a local SQLite database,
+indexed by session and time, so the history survives page reloads and clients
+only need to keep a recent window in memory. Appends are buffered and written
+in batches from an executor thread; queries page backwards through a session's
+events with an id cursor. Events older than the retention period are deleted
+periodically and the freed pages returned to the filesystem.
+"""
+
+from .model.inference_response import InferenceResponse
+from .model.watch_prompt import WatchPrompt
+from typing import List, Optional
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+FLUSH_INTERVAL = 1.0
+RETENTION_CHECK_INTERVAL = 3600
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    prompt TEXT,
+    confidence REAL,
+    reason TEXT,
+    seq_from INTEGER,
+    seq_to INTEGER,
+    results TEXT
+);
+CREATE INDEX IF NOT EXISTS events_session_ts ON events (session_id, ts);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+"""
+
+COLUMNS = ("id", "session_id", "ts", "prompt", "confidence", "reason", "seq_from", "seq_to", "results")
+
+
+class EventStore:
+    def __init__(self, path: str, retention_days: float = 7):
+        self.path = path
+        self.retention_days = retention_days
+        self._pending: List[tuple] = []
+        self._pending_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # auto_vacuum only takes effect on a new database, before the first table is created
+        self._connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def append(self, session_id: str, result: InferenceResponse, prompt: Optional[str], seq_from: Optional[int] = None,
+               seq_to: Optional[int] = None, watch_prompts: Optional[List[WatchPrompt]] = None):
+        """Queue a result; it is written with the next batch."""
+        results = None
+        if watch_prompts and result.prompt_scores:
+            results = json.dumps([
+                {"prompt": watch_prompt.text, "confidence": prompt_score.score, "reason": prompt_score.reason}
+                for watch_prompt, prompt_score in zip(watch_prompts, result.prompt_scores)
+            ])
+        with self._pending_lock:
+            self._pending.append((session_id, time.time(), prompt, result.score, result.reason, seq_from, seq_to, results))
+
+    def flush(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT INTO events (session_id, ts, prompt, confidence, reason, seq_from, seq_to, results) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    pending,
+                )
+
+    def query(self, session_id: str, since: Optional[float] = None, until: Optional[float] = None,
+              before_id: Optional[int] = None, limit: int = 100) -> dict:
+        """Events of a session in a time range, newest first; pass next_cursor as before_id for the next page."""
+        conditions, params = ["session_id = ?"], [session_id]
+        for condition, value in (("ts >= ?", since), ("ts < ?", until), ("id < ?", before_id)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM events WHERE {' AND '.join(conditions)} ORDER BY id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+
+        events = []
+        for row in rows:
+            event = dict(zip(COLUMNS, row))
+            event["results"] = json.loads(event["results"]) if event["results"] else None
+            events.append(event)
+        return {"events": events, "next_cursor": events[-1]["id"] if len(events) == limit else None}
+
+    def apply_retention(self) -> int:
+        """Delete events older than the retention period and give the freed pages back to the filesystem."""
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock:
+            with self._connection:
+                deleted = self._connection.execute("DELETE FROM events WHERE ts < ?", (cutoff,)).rowcount
+            if deleted:
+                self._connection.execute("PRAGMA incremental_vacuum")
+                self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    async def run(self):
+        """Flush batches and apply retention until cancelled."""
+        loop = asyncio.get_running_loop()
+        last_retention = float("-inf")
+        try:
+            while True:
+                await asyncio.sleep(FLUSH_INTERVAL)
+                try:
+                    await loop.run_in_executor(None, self.flush)
+                    if time.monotonic() - last_retention >= RETENTION_CHECK_INTERVAL:
+                        last_retention = time.monotonic()
+                        deleted = await loop.run_in_executor(None, self.apply_retention)
+                        if deleted:
+                            logger.info(f"Deleted {deleted} events older than {self.retention_days} days")
+                except Exception as e:
+                    logger.error(f"Event store error: {str(e)}")
+        finally:
+            self.flush()
+
+    def close(self):
+        self.flush()
+        self._connection.close()
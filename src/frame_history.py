@@ -0,0 +1,104 @@
+"""
+Bounded on-disk history of recent frames per session.
+
+Each session gets a fixed-size file, memory-mapped and used as a ring buffer
+of JPEG frames. An in-memory index keeps the position and capture time of the
+frames still in the ring. Recording costs one memory copy per frame; the
+kernel writes the pages back to disk on its own schedule, so minutes of
+pre-event video do not stay on the Python heap. Alert clips read their pre-roll
+and post-roll from here.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+import logging
+import mmap
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    captured_at: float
+    offset: int
+    length: int
+
+
+class FrameHistory:
+    def __init__(self, path: str, capacity: int):
+        self.path = path
+        self.capacity = capacity
+        self._index: Deque[_Entry] = deque()
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "w+b")
+        self._file.truncate(capacity)
+        self._mmap: Optional[mmap.mmap] = mmap.mmap(self._file.fileno(), capacity)
+
+    def append(self, captured_at: float, data: bytes):
+        size = len(data)
+        with self._lock:
+            if self._mmap is None or size > self.capacity:
+                return
+            if self._offset + size > self.capacity:
+                # frames of the previous lap past the write position are the oldest, the tail is dropped
+                while self._index and self._index[0].offset >= self._offset:
+                    self._index.popleft()
+                self._offset = 0
+            start, end = self._offset, self._offset + size
+            while self._index and start <= self._index[0].offset < end:
+                self._index.popleft()
+            self._mmap[start:end] = data
+            self._index.append(_Entry(captured_at, start, size))
+            self._offset = end
+
+    def frames_between(self, start: float, end: float) -> List[Tuple[float, bytes]]:
+        """Frames captured in [start, end], oldest first."""
+        with self._lock:
+            if self._mmap is None:
+                return []
+            return [
+                (entry.captured_at, bytes(self._mmap[entry.offset:entry.offset + entry.length]))
+                for entry in self._index if start <= entry.captured_at <= end
+            ]
+
+    def close(self):
+        with self._lock:
+            if self._mmap is None:
+                return
+            self._mmap.close()
+            self._mmap = None
+            self._index.clear()
+        self._file.close()
+        try:
+            os.unlink(self.path)
+        except OSError as e:
+            logger.warning(f"Could not remove frame history {self.path}: {e}")
+
+
+class FrameHistoryStore:
+    """One FrameHistory per session, all in one directory."""
+
+    def __init__(self, directory: str, capacity: int):
+        self.directory = directory
+        self.capacity = capacity
+        self._histories: Dict[str, FrameHistory] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def open(self, session_id: str) -> FrameHistory:
+        self.close(session_id)
+        history = FrameHistory(os.path.join(self.directory, f"{session_id}.frames"), self.capacity)
+        self._histories[session_id] = history
+        return history
+
+    def close(self, session_id: str):
+        history = self._histories.pop(session_id, None)
+        if history:
+            history.close()
+
+    def close_all(self):
+        for session_id in list(self._histories):
+            self.close(session_id)
@@ -0,0 +1,222 @@
+"""
+Wire protocol for the /ws/frames WebSocket.
+
+All messages are msgpack maps. Version 1 (legacy) messages carry the prompt,
+language and JPEG bytes together in every frame:
+
+    {"prompt": str, "frame": bytes, "language": str}
+
+Version 2 separates session control from frames and lets results reference
+the frames they were computed from:
+
+    control: {"v": 2, "type": "control", "prompt": str, "language": str, "params": dict}
+    frame:   {"v": 2, "type": "frame", "seq": int, "ts": capture time in ms since epoch, "frame": bytes}
+    result:  {"v": 2, "type": "result", "confidence": float, "reason": str, "seq_from": int, "seq_to": int}
+
+A version 2 control message may send `"prompts": [{"prompt": str, "threshold": float}]`
+instead of a single prompt to watch for several things at once. All prompts are
+scored in one engine call and the result then also carries one entry per prompt:
+
+    "results": [{"index": int, "prompt": str, "confidence": float, "reason": str, "detected": bool}]
+
+`confidence` and `reason` are those of the highest scoring prompt.
+
+A version 2 control message may also send regions of interest as fractions of
+the frame size, each with an optional prompt and threshold:
+
+    "regions": [{"x": float, "y": float, "w": float, "h": float, "prompt": str, "threshold": float}]
+
+Frames are then cropped to the regions before they reach the engine, so
+clients should upload them at up to `capture_dimension_for_regions` in
+`src/util.py` instead of the negotiated max dimension to keep the detail. Every
+region multiplies the images of an engine call, so at most MAX_REGIONS are
+accepted. When any region has a prompt, `results` holds one entry per region,
+followed by one per session prompt, which are scored on the whole frames; an
+empty list removes the regions.
+
+The server also tracks a detection state per watched prompt and sends version
+2 clients a message whenever one changes, after enough consecutive results
+reached the prompt's threshold or when it falls below it again:
+
+    state: {"v": 2, "type": "state", "state": "detected" | "watching", "index": int, "prompt": str,
+            "confidence": float, "reason": str, "seq_from": int, "seq_to": int, "notified": bool}
+
+`notified` tells whether the server sent an alert for the transition. Email
+alerts go to the address given with `"params": {"alert_email": str}`.
+
+Version 1 results only carry `confidence` and `reason`. Both versions are
+accepted on the same endpoint while clients migrate.
+"""
+
+from .detection_state import Transition
+from .model.frame import Frame
+from .model.inference_response import InferenceResponse
+from .model.region import Region
+from .model.watch_prompt import WatchPrompt
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
+import msgpack
+import time
+
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+MAX_REGIONS = 4
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+@dataclass
+class ControlMessage:
+    version: int
+    prompt: Optional[str] = None
+    language: Optional[str] = None
+    params: dict = field(default_factory=dict)
+    prompts: Optional[List[WatchPrompt]] = None
+    regions: Optional[List[Region]] = None
+
+
+@dataclass
+class FrameMessage:
+    version: int
+    data: bytes
+    seq: Optional[int] = None
+    captured_at: Optional[float] = None
+
+
+Message = Union[ControlMessage, FrameMessage]
+
+
+def decode(packed_data: bytes) -> List[Message]:
+    """Decode one WebSocket payload into the control and frame messages it carries."""
+    data = msgpack.unpackb(packed_data, raw=False)
+    if not isinstance(data, dict):
+        raise ProtocolError("Message must be a map")
+
+    version = data.get("v", PROTOCOL_V1)
+    if version == PROTOCOL_V1:
+        return _decode_v1(data)
+    if version == PROTOCOL_V2:
+        return [_decode_v2(data)]
+    raise ProtocolError(f"Unsupported protocol version: {version}")
+
+
+def _decode_v1(data: dict) -> List[Message]:
+    prompt = data.get("prompt", "")
+    frame_data = bytes(data.get("frame", []))
+    if not prompt or not frame_data:
+        return []
+
+    return [
+        ControlMessage(PROTOCOL_V1, prompt=prompt, language=data.get("language", "en")),
+        FrameMessage(PROTOCOL_V1, data=frame_data, captured_at=time.time()),
+    ]
+
+
+def _decode_v2(data: dict) -> Message:
+    message_type = data.get("type")
+    if message_type == "control":
+        params = data.get("params") or {}
+        if not isinstance(params, dict):
+            raise ProtocolError("Control params must be a map")
+        return ControlMessage(
+            PROTOCOL_V2,
+            prompt=data.get("prompt"),
+            language=data.get("language"),
+            params=params,
+            prompts=_decode_prompts(data["prompts"]) if "prompts" in data else None,
+            regions=decode_regions(data["regions"]) if "regions" in data else None,
+        )
+
+    if message_type == "frame":
+        frame_data = data.get("frame")
+        seq = data.get("seq")
+        if not frame_data or not isinstance(seq, int):
+            raise ProtocolError("Frame messages need a frame and an integer seq")
+        ts = data.get("ts")
+        captured_at = ts / 1000 if isinstance(ts, (int, float)) else time.time()
+        return FrameMessage(PROTOCOL_V2, data=bytes(frame_data), seq=seq, captured_at=captured_at)
+
+    raise ProtocolError(f"Unknown message type: {message_type}")
+
+
+def _decode_prompts(prompts) -> List[WatchPrompt]:
+    if not isinstance(prompts, list):
+        raise ProtocolError("Control prompts must be a list")
+
+    watch_prompts = []
+    for prompt in prompts:
+        if not isinstance(prompt, dict) or not prompt.get("prompt"):
+            raise ProtocolError("Every watch prompt needs a non-empty prompt")
+        threshold = prompt.get("threshold", WatchPrompt.threshold)
+        if not isinstance(threshold, (int, float)):
+            raise ProtocolError("Watch prompt thresholds must be numbers")
+        watch_prompts.append(WatchPrompt(text=prompt["prompt"], threshold=threshold))
+    return watch_prompts
+
+
+def decode_regions(regions) -> List[Region]:
+    if not isinstance(regions, list):
+        raise ProtocolError("Regions must be a list")
+    if len(regions) > MAX_REGIONS:
+        raise ProtocolError(f"At most {MAX_REGIONS} regions can be watched")
+
+    decoded = []
+    for region in regions:
+        if not isinstance(region, dict):
+            raise ProtocolError("Every region must be a map")
+        try:
+            x, y, width, height = (float(region[key]) for key in ("x", "y", "w", "h"))
+            threshold = float(region.get("threshold", Region.threshold))
+        except (KeyError, TypeError, ValueError):
+            raise ProtocolError("Regions need numeric x, y, w and h")
+        if not (0 <= x < 1 and 0 <= y < 1 and 0 < width <= 1 - x + 1e-6 and 0 < height <= 1 - y + 1e-6):
+            raise ProtocolError("Regions must lie within the frame, as fractions of its size")
+        decoded.append(Region(x, y, width, height, prompt=region.get("prompt") or None, threshold=threshold))
+    return decoded
+
+
+def pack(message: dict) -> bytes:
+    return msgpack.packb(message)
+
+
+def result_message(result: InferenceResponse, frames: List[Frame], version: int, prompts: List[WatchPrompt] = None) -> dict:
+    response_data = {
+        "confidence": result.score,
+        "reason": result.reason,
+    }
+    if version >= PROTOCOL_V2:
+        response_data.update({
+            "v": PROTOCOL_V2,
+            "type": "result",
+            "seq_from": frames[0].seq if frames else None,
+            "seq_to": frames[-1].seq if frames else None,
+        })
+        if prompts and result.prompt_scores:
+            response_data["results"] = [
+                {
+                    "index": index,
+                    "prompt": prompt.text,
+                    "confidence": prompt_score.score,
+                    "reason": prompt_score.reason,
+                    "detected": prompt_score.score >= prompt.threshold,
+                }
+                for index, (prompt, prompt_score) in enumerate(zip(prompts, result.prompt_scores))
+            ]
+    return response_data
+
+
+def state_message(transition: Transition, index: int, frames: List[Frame], notified: bool) -> dict:
+    return {
+        "v": PROTOCOL_V2,
+        "type": "state",
+        "state": transition.state,
+        "index": index,
+        "prompt": transition.prompt,
+        "confidence": transition.confidence,
+        "reason": transition.reason,
+        "seq_from": frames[0].seq if frames else None,
+        "seq_to": frames[-1].seq if frames else None,
+        "notified": notified,
+    }
@@ -7,21 +7,25 @@ analysis capabilities for detecting specific events or behaviors in video stream
 without requiring external API calls.
 """
 
-from . import util
+from . import metrics, profiler, util
+from .embedding_cache import EmbeddingCache, frame_key
 from .inference_engine import InferenceEngine
-from .model.inference_response import InferenceResponse
+from .model.inference_response import InferenceResponse, PromptScore
 from datetime import datetime
 from huggingface_hub import login
 from PIL import Image
 from transformers import pipeline
 from typing import List
 import asyncio
+import contextlib
 import io
 import logging
 import os
 import torch
 
 MAX_CONCURRENT_INFERENCES = 1
+# room for one |number|rate|reason| line per prompt in multi-prompt mode
+MAX_NEW_TOKENS = 300
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +35,9 @@ class GemmaLocalInference(InferenceEngine):
         self.active_inferences = 0
         self.pipe = None
         self.model_name = "google/gemma-3n-e4b-it"
+        # off until measured against the compiled model, see benchmarks/embedding_cache.py
+        cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", 0))
+        self.embedding_cache = EmbeddingCache(cache_size) if cache_size > 0 else None
         self._initialize_model()
     
     def _initialize_model(self):
@@ -50,9 +57,18 @@ class GemmaLocalInference(InferenceEngine):
             logger.error("Application cannot function without model. Exiting.")
             exit(1)
 
+        cache_target = self.embedding_cache.install(self.pipe.model) if self.embedding_cache else None
+
         if hasattr(torch, 'compile'):
-            logger.info("Compiling model...")
-            self.pipe.model = torch.compile(self.pipe.model, mode="max-autotune")
+            if cache_target is None:
+                logger.info("Compiling model...")
+                self.pipe.model = torch.compile(self.pipe.model, mode="max-autotune")
+            elif hasattr(cache_target, "language_model"):
+                # the cache lookup and its varying miss batches stay eager, only the language model is compiled
+                logger.info("Compiling language model...")
+                cache_target.language_model = torch.compile(cache_target.language_model, mode="max-autotune")
+            else:
+                logger.warning("No language model to compile apart from the embedding cache, running uncompiled")
     
     def _load_model(self, local_files_only=False):
         source = "local cache" if local_files_only else "online source"
@@ -75,13 +91,14 @@ class GemmaLocalInference(InferenceEngine):
     
     async def process_frames(self, frames_data: List[bytes], prompt: str, language: str = "en") -> InferenceResponse:
         if self.active_inferences >= MAX_CONCURRENT_INFERENCES:
-            return InferenceResponse(should_process=False)
+            return InferenceResponse(should_process=False, busy=True)
         
         self.active_inferences += 1
         
         try:
             start_time = datetime.now().timestamp()
-            ai_response = await self._analyze_frames_with_model(frames_data, prompt, language)
+            analysis_prompt = util.create_analysis_prompt(prompt, language)
+            ai_response = await self._analyze_frames_with_model(frames_data, analysis_prompt)
             if not ai_response:
                 return InferenceResponse(should_process=False)
                 
@@ -94,26 +111,52 @@ class GemmaLocalInference(InferenceEngine):
             )
         finally:
             self.active_inferences -= 1
+
+    async def process_frames_multi(self, frames_data: List[bytes], prompts: List[str], language: str = "en") -> InferenceResponse:
+        if self.active_inferences >= MAX_CONCURRENT_INFERENCES:
+            return InferenceResponse(should_process=False, busy=True)
+        
+        self.active_inferences += 1
+        
+        try:
+            start_time = datetime.now().timestamp()
+            analysis_prompt = util.create_multi_analysis_prompt(prompts, language)
+            ai_response = await self._analyze_frames_with_model(frames_data, analysis_prompt)
+            if not ai_response:
+                return InferenceResponse(should_process=False)
+
+            prompt_scores = [PromptScore(score, reason) for score, reason in util.extract_multi_scores(ai_response, len(prompts))]
+            best = max(prompt_scores, key=lambda prompt_score: prompt_score.score)
+            return InferenceResponse(
+                should_process=True,
+                score=best.score,
+                reason=best.reason,
+                start_time=start_time,
+                prompt_scores=prompt_scores
+            )
+        finally:
+            self.active_inferences -= 1
     
-    async def _analyze_frames_with_model(self, frames_data: List[bytes], prompt: str, language: str = "en") -> str:
+    async def _analyze_frames_with_model(self, frames_data: List[bytes], analysis_prompt: str) -> str:
         try:
             loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, self._run_inference, frames_data, prompt, language)
+            result = await loop.run_in_executor(None, self._run_inference, frames_data, analysis_prompt)
             return result
 
         except Exception as e:
             logger.error(f"Model analysis error: {str(e)}")
             return ""
     
-    def _run_inference(self, frames_data: list[bytes], prompt: str, language: str = "en") -> str:
+    def _run_inference(self, frames_data: list[bytes], analysis_prompt: str) -> str:
         try:
             content = []
+            frame_keys = []
             for frame_data in frames_data:
-                resized_frame_data = util.resize_frame(frame_data)
+                resized_frame_data = util.resize_frame(frame_data, self.max_frame_size, self.jpeg_quality)
                 image = Image.open(io.BytesIO(resized_frame_data))
                 content.append({"type": "image", "image": image})
+                frame_keys.append(frame_key(resized_frame_data))
             
-            analysis_prompt = util.create_analysis_prompt(prompt, language)
             content.append({"type": "text", "text": analysis_prompt})
             messages = [
                 {
@@ -122,7 +165,9 @@ class GemmaLocalInference(InferenceEngine):
                 },
             ]
             
-            output = self.pipe(text=messages, max_new_tokens=100)
+            with metrics.STAGE_LATENCY.time(stage="engine"), self._cached_frames(frame_keys), \
+                    profiler.torch_region("gemma.analyze_frames"):
+                output = self.pipe(text=messages, max_new_tokens=MAX_NEW_TOKENS)
             answer = output[0]["generated_text"][-1]["content"]
             return answer
             
@@ -130,6 +175,9 @@ class GemmaLocalInference(InferenceEngine):
             logger.error(f"Inference error: {str(e)}")
             return ""
     
+    def _cached_frames(self, frame_keys: List[bytes]):
+        return self.embedding_cache.frames(frame_keys) if self.embedding_cache else contextlib.nullcontext()
+
     async def summarize_watch_logs(self, events: list) -> str:
         """
         Summarize watching log events into a single detailed sentence.
@@ -147,7 +195,8 @@ class GemmaLocalInference(InferenceEngine):
                 },
             ]
             
-            output = self.pipe(text=messages, max_new_tokens=100)
+            with profiler.torch_region("gemma.summarize"):
+                output = self.pipe(text=messages, max_new_tokens=100)
             answer = output[0]["generated_text"][-1]["content"]
             return answer.strip()
             
@@ -1,6 +1,6 @@
-from . import util
+from . import metrics, util
 from .inference_engine import InferenceEngine
-from .model.inference_response import InferenceResponse
+from .model.inference_response import InferenceResponse, PromptScore
 from datetime import datetime
 from typing import List
 import google.generativeai as genai
@@ -35,7 +35,8 @@ class GoogleAIStudioInference(InferenceEngine):
             InferenceResponse: Response containing processing decision and metadata
         """
         start_time = datetime.now().timestamp()
-        ai_response = await self._analyze_frame_with_ai(frames_data, prompt, language)
+        analysis_prompt = util.create_analysis_prompt(prompt, language)
+        ai_response = await self._analyze_frame_with_ai(frames_data, analysis_prompt)
         if not ai_response:
             return InferenceResponse(should_process=False)
 
@@ -47,26 +48,42 @@ class GoogleAIStudioInference(InferenceEngine):
             start_time=start_time
         )
 
-    async def _analyze_frame_with_ai(self, frames: list, prompt: str, language: str = "en") -> str:
+    async def process_frames_multi(self, frames_data: List[bytes], prompts: List[str], language: str = "en") -> InferenceResponse:
+        start_time = datetime.now().timestamp()
+        analysis_prompt = util.create_multi_analysis_prompt(prompts, language)
+        ai_response = await self._analyze_frame_with_ai(frames_data, analysis_prompt)
+        if not ai_response:
+            return InferenceResponse(should_process=False)
+
+        prompt_scores = [PromptScore(score, reason) for score, reason in util.extract_multi_scores(ai_response, len(prompts))]
+        best = max(prompt_scores, key=lambda prompt_score: prompt_score.score)
+        return InferenceResponse(
+            should_process=True,
+            score=best.score,
+            reason=best.reason,
+            start_time=start_time,
+            prompt_scores=prompt_scores
+        )
+
+    async def _analyze_frame_with_ai(self, frames: list, analysis_prompt: str) -> str:
         """Internal function to analyze frames using Google AI Studio"""
         try:
             # Prepare image data for each frame
             content = []
             for frame_data in frames:
                 # Resize frame before processing
-                resized_frame_data = util.resize_frame(frame_data)
+                resized_frame_data = util.resize_frame(frame_data, self.max_frame_size, self.jpeg_quality)
                 image_data = {
                     'mime_type': 'image/jpeg',
                     'data': resized_frame_data
                 }
                 content.append(image_data)
             
-            # Create analysis prompt
-            analysis_prompt = util.create_analysis_prompt(prompt, language)
             content.append(analysis_prompt)
             
             # Generate response using async API
-            response_text = await self._run_ai_inference(content)
+            with metrics.STAGE_LATENCY.time(stage="engine"):
+                response_text = await self._run_ai_inference(content)
             
             return response_text
             
@@ -4,6 +4,11 @@ from typing import Protocol, List
 
 class InferenceEngine(Protocol):
     """Protocol for inference engines that process frames."""
+
+    # Largest frame width/height the model benefits from and the JPEG quality to
+    # encode at. Advertised to clients by /init so frames arrive already sized.
+    max_frame_size: int = 768
+    jpeg_quality: int = 90
     
     async def process_frames(self, frames_data: List[bytes], prompt: str, language: str = "en") -> InferenceResponse:
         """
@@ -19,6 +24,21 @@ class InferenceEngine(Protocol):
         """
         ...
     
+    async def process_frames_multi(self, frames_data: List[bytes], prompts: List[str], language: str = "en") -> InferenceResponse:
+        """
+        Score the same frames against several prompts in a single model call.
+        
+        Args:
+            frames_data: List of frame data as bytes
+            prompts: The prompts to score, in order
+            language: Language for the reasons (default: "en")
+            
+        Returns:
+            InferenceResponse: prompt_scores holds one score/reason per prompt, while
+            score and reason are those of the highest scoring prompt
+        """
+        ...
+    
     async def summarize_watch_logs(self, events: List[str]) -> str:
         """
         Summarize watching log events into a single detailed sentence.
@@ -0,0 +1,214 @@
+"""
+Scheduling of inference calls for watching sessions.
+
+`AdaptiveRate` decides when a session runs its next inference: it backs off
+toward a slow interval while confidence stays low and snaps back to the fast
+interval as soon as confidence rises or the scene changes. `InferenceBudget`
+is a token bucket that caps the calls per second sent to the inference engine,
+so a shared API quota is not exceeded.
+
+`FairScheduler` hands the engine's tokens to the sessions waiting for one.
+Instead of the first session to ask, it serves them by weighted fair queuing:
+every user gets an equal share, split evenly among the user's sessions, so one
+fast camera or one user with many tabs cannot starve the others. Sessions in a
+DETECTED state are served first, so an ongoing detection keeps its rate while
+idle cameras wait. The time each session waits for a token is reported.
+"""
+
+from . import metrics
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+import asyncio
+import itertools
+import time
+
+QUEUE_DELAY_WINDOW = 100
+
+
+class AdaptiveRate:
+    """Per-session inference interval driven by the latest confidence and scene changes."""
+
+    def __init__(
+        self,
+        fast_interval: float = 1.0,
+        slow_interval: float = 5.0,
+        backoff: float = 1.5,
+        low_confidence: float = 30,
+        rise_delta: float = 15,
+    ):
+        self.fast_interval = fast_interval
+        self.slow_interval = max(slow_interval, fast_interval)
+        self.backoff = backoff
+        self.low_confidence = low_confidence
+        self.rise_delta = rise_delta
+        self.interval = fast_interval
+        self.last_score = None
+        self.last_run = 0.0
+
+    def is_due(self, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return now - self.last_run >= self.interval - 0.01
+
+    def mark_run(self, now: float = None):
+        self.last_run = time.monotonic() if now is None else now
+
+    def on_result(self, score: float):
+        rising = self.last_score is not None and score - self.last_score >= self.rise_delta
+        if score >= self.low_confidence or rising:
+            self.interval = self.fast_interval
+        else:
+            self.interval = min(self.slow_interval, self.interval * self.backoff)
+        self.last_score = score
+
+    def on_scene_change(self):
+        self.interval = self.fast_interval
+
+    @property
+    def is_backed_off(self) -> bool:
+        return self.interval > self.fast_interval
+
+
+class InferenceBudget:
+    """Token bucket limiting inference calls per second across all sessions; 0 disables it."""
+
+    def __init__(self, rate_per_second: float, burst: float = None):
+        self.rate = rate_per_second
+        self.capacity = burst if burst is not None else max(1.0, rate_per_second)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self) -> bool:
+        if self.rate <= 0:
+            return True
+
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available, 0 if one is available now."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+@dataclass
+class _Request:
+    session_id: str
+    priority: bool
+    # virtual start and finish times of start-time fair queuing
+    start: float
+    finish: float
+    order: int
+    enqueued_at: float
+    future: asyncio.Future
+
+
+class FairScheduler:
+    """Grants the tokens of one engine's InferenceBudget to waiting sessions by weighted fair queuing."""
+
+    def __init__(self, budget: InferenceBudget):
+        self.budget = budget
+        self._queue: List[_Request] = []
+        self._users: Dict[str, str] = {}
+        self._last_finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._order = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._delays: Dict[str, Deque[float]] = {}
+        self._granted: Dict[str, int] = {}
+
+    def register(self, session_id: str, user: str):
+        self._users[session_id] = user
+        self._delays[session_id] = deque(maxlen=QUEUE_DELAY_WINDOW)
+        self._granted[session_id] = 0
+
+    def unregister(self, session_id: str):
+        for request in [request for request in self._queue if request.session_id == session_id]:
+            self._queue.remove(request)
+            request.future.cancel()
+        for state in (self._users, self._last_finish, self._delays, self._granted):
+            state.pop(session_id, None)
+
+    def weight(self, session_id: str) -> float:
+        user = self._users.get(session_id)
+        if user is None:
+            return 1.0
+        return 1 / sum(1 for session_user in self._users.values() if session_user == user)
+
+    async def acquire(self, session_id: str, priority: bool = False) -> float:
+        """Wait until the session may call the engine; returns how long it waited in seconds."""
+        start = max(self._virtual_time, self._last_finish.get(session_id, 0.0))
+        finish = start + 1 / self.weight(session_id)
+        self._last_finish[session_id] = finish
+        request = _Request(session_id, priority, start, finish, next(self._order), time.monotonic(),
+                           asyncio.get_running_loop().create_future())
+        self._queue.append(request)
+        self._dispatch()
+        if not request.future.done():
+            metrics.INFERENCES_DEFERRED.inc()
+
+        try:
+            await request.future
+        except asyncio.CancelledError:
+            if request in self._queue:
+                self._queue.remove(request)
+            raise
+
+        delay = time.monotonic() - request.enqueued_at
+        metrics.STAGE_LATENCY.observe(delay, stage="queue")
+        if session_id in self._delays:
+            self._delays[session_id].append(delay)
+            self._granted[session_id] += 1
+        return delay
+
+    def _dispatch(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            wait = self.budget.wait_time()
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            request = min(self._queue, key=lambda queued: (not queued.priority, queued.finish, queued.order))
+            self._queue.remove(request)
+            if request.future.done():
+                continue
+            self.budget.try_acquire()
+            self._virtual_time = max(self._virtual_time, request.start)
+            request.future.set_result(None)
+
+    def report(self) -> dict:
+        """Share and queue delay of every session, for GET /scheduler."""
+        queued = {request.session_id for request in self._queue}
+        sessions = {}
+        for session_id, user in self._users.items():
+            delays = sorted(self._delays[session_id])
+            sessions[session_id] = {
+                "user": user,
+                "weight": round(self.weight(session_id), 3),
+                "queued": session_id in queued,
+                "granted": self._granted[session_id],
+                "queue_delay_s": {
+                    "last": round(self._delays[session_id][-1], 3),
+                    "mean": round(sum(delays) / len(delays), 3),
+                    "p95": round(delays[min(len(delays) - 1, int(len(delays) * 0.95))], 3),
+                    "max": round(delays[-1], 3),
+                } if delays else None,
+            }
+        return {
+            "rate_limit": self.budget.rate,
+            "burst": self.budget.capacity,
+            "queued": len(self._queue),
+            "sessions": sessions,
+        }
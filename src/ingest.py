@@ -0,0 +1,214 @@
+"""
+Headless ingestion of camera streams and video files.
+
+An `IngestSource` runs ffmpeg to decode an RTSP/HTTP(MJPEG) stream or a local
+video file directly on the server. ffmpeg drops frames down to the target FPS
+and scales them to the engine's frame size, so every frame is decoded and
+encoded once and reaches the session buffer ready for inference, without a
+browser tab capturing a canvas. Local files are played in real time and
+looped, which makes them a stand-in for a live camera when testing.
+
+ffmpeg opens almost anything it is given, so sources are checked with
+`resolve_source` first: only RTSP and HTTP(S) URLs are accepted, and local
+files only from the configured ingest directory. ffmpeg is then restricted to
+the protocols that source needs. Stream URLs often carry camera credentials,
+so only `redact_url` versions of them are logged or reported.
+"""
+
+from typing import Awaitable, Callable, List, Optional, Tuple
+from urllib.parse import urlsplit
+import asyncio
+import ipaddress
+import logging
+import os
+import shutil
+import time
+
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = b"\xff\xd9"
+READ_CHUNK_SIZE = 64 * 1024
+MAX_RECONNECT_DELAY = 30
+STREAM_SCHEMES = ("rtsp", "rtsps", "http", "https")
+STREAM_PROTOCOLS = "rtsp,rtsps,rtp,srtp,udp,tcp,tls,http,https,httpproxy"
+
+logger = logging.getLogger(__name__)
+
+
+def split_jpeg_stream(buffer: bytes) -> Tuple[List[bytes], bytes]:
+    """Split complete JPEG images off an MJPEG byte stream, returning them and the unfinished rest."""
+    frames = []
+    start = buffer.find(JPEG_SOI)
+    while start != -1:
+        end = buffer.find(JPEG_EOI, start + 2)
+        if end == -1:
+            return frames, buffer[start:]
+        frames.append(buffer[start:end + 2])
+        start = buffer.find(JPEG_SOI, end + 2)
+    return frames, b""
+
+
+def redact_url(url: str) -> str:
+    """The URL without the user and password part, safe to log and show to guests."""
+    parts = urlsplit(url)
+    if "@" not in parts.netloc:
+        return url
+    return parts._replace(netloc=parts.netloc.rsplit("@", 1)[1]).geturl()
+
+
+def resolve_source(url: str, file_directory: Optional[str]) -> str:
+    """The stream URL, or the real path of a file inside `file_directory`; ValueError for anything else."""
+    parts = urlsplit(url)
+    if parts.scheme in STREAM_SCHEMES:
+        if not parts.hostname:
+            raise ValueError("Stream URL has no host")
+        try:
+            address = ipaddress.ip_address(parts.hostname)
+        except ValueError:
+            address = None
+        if parts.hostname == "localhost" or address and (
+            address.is_loopback or address.is_link_local or address.is_multicast or address.is_unspecified
+        ):
+            raise ValueError(f"Stream host {parts.hostname} is not allowed")
+        return url
+    if parts.scheme and len(parts.scheme) > 1:
+        raise ValueError(f"Unsupported source scheme '{parts.scheme}', use one of {', '.join(STREAM_SCHEMES)}")
+
+    if not file_directory:
+        raise ValueError("Video files are not enabled, set INGEST_FILE_DIR")
+    directory = os.path.realpath(file_directory)
+    path = os.path.realpath(os.path.join(directory, url))
+    if os.path.commonpath([directory, path]) != directory or not os.path.isfile(path):
+        raise ValueError(f"Video file not found in {file_directory}")
+    return path
+
+
+class IngestSource:
+    """Decodes one stream or file with ffmpeg and hands JPEG frames to `on_frame`, reconnecting on failure."""
+
+    def __init__(
+        self,
+        url: str,
+        fps: float,
+        max_dimension: int,
+        jpeg_quality: int,
+        on_frame: Callable[[bytes], None],
+    ):
+        self.url = url
+        self.display_url = redact_url(url)
+        self.fps = fps
+        self.max_dimension = max_dimension
+        self.jpeg_quality = jpeg_quality
+        self.on_frame = on_frame
+        self.frames_decoded = 0
+        self.restarts = 0
+        self.last_frame_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_result: Optional[dict] = None
+        self.last_state: Optional[dict] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks) and not all(task.done() for task in self._tasks)
+
+    def start(self, worker: Awaitable):
+        """Start decoding along with the inference worker that consumes the frames."""
+        self._tasks = [asyncio.create_task(self._decode_loop()), asyncio.create_task(worker)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def publish(self, message: dict):
+        if message.get("type") == "state":
+            self.last_state = message
+            logger.info(f"ingest {self.display_url}: {message['prompt']} is now {message['state']}")
+            return
+        self.last_result = message
+        logger.info(f"ingest {self.display_url}: confidence={message.get('confidence')}, reason={message.get('reason')}")
+
+    def status(self) -> dict:
+        return {
+            "url": self.display_url,
+            "fps": self.fps,
+            "running": self.running,
+            "frames_decoded": self.frames_decoded,
+            "restarts": self.restarts,
+            "last_frame_at": self.last_frame_at,
+            "last_error": self.last_error,
+            "last_result": self.last_result,
+            "last_state": self.last_state,
+        }
+
+    def _command(self) -> List[str]:
+        # ffmpeg's JPEG qscale runs from 2 (best) to 31 (worst)
+        qscale = max(2, min(31, round((100 - self.jpeg_quality) / 5) + 1))
+        size = self.max_dimension
+        cmd = ["ffmpeg", "-loglevel", "error", "-nostdin"]
+        url = self.url
+        if os.path.isfile(url):
+            cmd += ["-re", "-stream_loop", "-1", "-protocol_whitelist", "file"]
+            # a path with a colon would otherwise be taken for a protocol
+            url = f"file:{url}"
+        else:
+            cmd += ["-protocol_whitelist", STREAM_PROTOCOLS]
+            if url.startswith(("rtsp://", "rtsps://")):
+                cmd += ["-rtsp_transport", "tcp"]
+        return cmd + [
+            "-i", url,
+            "-vf", f"fps={self.fps},scale=w='min(iw,{size})':h='min(ih,{size})':force_original_aspect_ratio=decrease",
+            "-q:v", str(qscale), "-f", "image2pipe", "-vcodec", "mjpeg", "-",
+        ]
+
+    async def _decode_loop(self):
+        if not shutil.which("ffmpeg"):
+            self.last_error = "ffmpeg not found"
+            logger.error(f"Cannot ingest {self.display_url}: ffmpeg not found")
+            return
+
+        failures = 0
+        while True:
+            decoded_before = self.frames_decoded
+            try:
+                await self._decode()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e).replace(self.url, self.display_url)
+                logger.error(f"Ingest error for {self.display_url}: {str(e)}")
+
+            failures = 0 if self.frames_decoded > decoded_before else failures + 1
+            delay = min(MAX_RECONNECT_DELAY, 2 ** failures)
+            logger.warning(f"Ingest of {self.display_url} stopped, reconnecting in {delay}s")
+            self.restarts += 1
+            await asyncio.sleep(delay)
+
+    async def _decode(self):
+        process = await asyncio.create_subprocess_exec(
+            *self._command(), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        # drained concurrently so a chatty ffmpeg cannot block on a full stderr pipe
+        stderr_task = asyncio.create_task(process.stderr.read())
+        try:
+            buffer = b""
+            while True:
+                chunk = await process.stdout.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                frames, buffer = split_jpeg_stream(buffer + chunk)
+                for frame in frames:
+                    self.frames_decoded += 1
+                    self.last_frame_at = time.time()
+                    self.on_frame(frame)
+
+            await process.wait()
+            stderr = (await stderr_task).decode(errors="replace").strip()
+            if process.returncode:
+                # ffmpeg names the input in its errors, credentials included
+                self.last_error = stderr.replace(self.url, self.display_url) or f"ffmpeg exited with code {process.returncode}"
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            stderr_task.cancel()
@@ -0,0 +1,123 @@
+"""
+Latency SLO governor for the inference pipeline.
+
+Frames per inference, the frame size sent to the engine and its JPEG quality
+form a ladder of operating levels, from the configured settings down to the
+cheapest ones. The governor keeps the latest inference latencies and, once
+enough new samples arrived since its last decision, steps one level down when
+their p90 misses the target and one level up when it stays well below it.
+Timed-out and failed inferences count as misses. This way slow machines,
+overloaded servers and slow APIs settle on their own operating point.
+Every decision is logged and kept for the /governor endpoint.
+"""
+
+from . import metrics
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import List
+import logging
+import time
+
+FRAME_SIZES = (768, 640, 512, 384)
+MIN_JPEG_QUALITY = 60
+# a failed or timed-out inference counts as this much slower than the target, however fast it failed
+FAILURE_PENALTY = 1.5
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OperatingLevel:
+    frames_per_inference: int
+    max_frame_size: int
+    jpeg_quality: int
+
+
+def build_levels(frames_per_inference: int, max_frame_size: int, jpeg_quality: int) -> List[OperatingLevel]:
+    """Operating levels from the configured settings down, alternating smaller frames and fewer frames."""
+    sizes = [max_frame_size] + [size for size in FRAME_SIZES if size < max_frame_size]
+    levels = [OperatingLevel(frames_per_inference, max_frame_size, jpeg_quality)]
+    size_index, frames, quality = 0, frames_per_inference, jpeg_quality
+    shrink_size = True
+    while size_index < len(sizes) - 1 or frames > 1:
+        if (shrink_size or frames == 1) and size_index < len(sizes) - 1:
+            size_index += 1
+            quality = max(MIN_JPEG_QUALITY, quality - 5)
+        else:
+            frames -= 1
+        shrink_size = not shrink_size
+        levels.append(OperatingLevel(frames, sizes[size_index], quality))
+    return levels
+
+
+class LatencyGovernor:
+    def __init__(
+        self,
+        target_latency: float,
+        levels: List[OperatingLevel],
+        window: int = 20,
+        min_samples: int = 5,
+        headroom: float = 0.6,
+    ):
+        self.target_latency = target_latency
+        self.levels = levels
+        self.level = 0
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.samples_since_change = 0
+        self.decisions = deque(maxlen=50)
+        metrics.GOVERNOR_LEVEL.set(0)
+
+    @property
+    def current(self) -> OperatingLevel:
+        return self.levels[self.level]
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_latency > 0 and len(self.levels) > 1
+
+    def p90(self) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))] if ordered else 0.0
+
+    def observe(self, latency: float) -> bool:
+        """Record one inference latency; returns True when the operating level changed."""
+        self.latencies.append(latency)
+        self.samples_since_change += 1
+        if not self.enabled or self.samples_since_change < self.min_samples:
+            return False
+
+        p90 = self.p90()
+        if p90 > self.target_latency and self.level < len(self.levels) - 1:
+            return self._change(self.level + 1, p90)
+        if p90 < self.target_latency * self.headroom and self.level > 0:
+            return self._change(self.level - 1, p90)
+        return False
+
+    def observe_failure(self, latency: float) -> bool:
+        """Record an inference that timed out or failed as a miss of the target."""
+        return self.observe(max(latency, self.target_latency * FAILURE_PENALTY))
+
+    def _change(self, level: int, p90: float) -> bool:
+        direction = "down" if level > self.level else "up"
+        self.level = level
+        # samples taken at the old level no longer describe the new one
+        self.latencies.clear()
+        self.samples_since_change = 0
+        metrics.GOVERNOR_LEVEL.set(level)
+        self.decisions.append({"time": time.time(), "direction": direction, "p90": round(p90, 3), **asdict(self.current)})
+        logger.info(f"Latency governor stepped {direction} to level {level} ({self.current}), "
+                    f"p90={p90:.2f}s, target={self.target_latency}s")
+        return True
+
+    def report(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "target_latency": self.target_latency,
+            "level": self.level,
+            "current": asdict(self.current),
+            "levels": [asdict(level) for level in self.levels],
+            "p90": round(self.p90(), 3),
+            "decisions": list(self.decisions),
+        }
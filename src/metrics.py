@@ -0,0 +1,278 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+This module keeps lightweight counters, gauges and histograms for the frame
+processing pipeline (ingest, decode, resize, JPEG encode, base64, engine calls
+and response parsing) and renders them in the Prometheus text format for the /metrics
+endpoint. It has no external dependencies and is safe to use from the event
+loop and from executor threads.
+"""
+
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]):
+        """Compute the (unlabelled) gauge value lazily at scrape time."""
+        self._function = function
+
+    def value(self, **labels) -> float:
+        if self._function:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self) -> List[str]:
+        if self._function:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] = self._sums.get(key, 0) + value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the wrapped block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Record how late the event loop wakes up from a sleep, a direct measure of saturation."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+STAGE_LATENCY = Histogram(
+    "sentinela_stage_latency_seconds",
+    "Latency of each frame pipeline stage in seconds",
+    labelnames=("stage",),
+)
+INFERENCES_DROPPED = Counter(
+    "sentinela_inferences_dropped_total",
+    "Inferences that finished without a usable result (should_process=False)",
+)
+INFERENCE_TIMEOUTS = Counter(
+    "sentinela_inference_timeouts_total",
+    "Engine calls that timed out",
+    labelnames=("engine",),
+)
+PARSE_FAILURES = Counter(
+    "sentinela_parse_failures_total",
+    "Model responses that could not be parsed into a score and reason",
+)
+FRAMES_RESIZED = Counter(
+    "sentinela_frames_resized_total",
+    "Frames checked by resize_frame, by whether they had to be resized or already fit",
+    labelnames=("outcome",),
+)
+PRESCREEN_DECISIONS = Counter(
+    "sentinela_prescreen_decisions_total",
+    "Pre-screen outcomes: escalated to the engine, skipped, or audited despite a low score",
+    labelnames=("decision",),
+)
+INFERENCES_DEFERRED = Counter(
+    "sentinela_inferences_deferred_total",
+    "Due inferences postponed because the engine budget was exhausted",
+)
+SCENE_CHANGES = Counter(
+    "sentinela_scene_changes_total",
+    "Scene changes that brought a backed-off session back to the fast inference rate",
+)
+INFERENCES_COALESCED = Counter(
+    "sentinela_inferences_coalesced_total",
+    "Inference calls answered by an identical call already in flight instead of the engine",
+)
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "sentinela_embedding_cache_lookups_total",
+    "Images looked up in the local engine's vision embedding cache, by hit or miss",
+    labelnames=("result",),
+)
+GOVERNOR_LEVEL = Gauge(
+    "sentinela_governor_level",
+    "Operating level chosen by the latency governor, 0 being the configured settings",
+)
+ALERTS_SENT = Counter(
+    "sentinela_alerts_sent_total",
+    "Detection alerts sent by the server, by channel and outcome",
+    labelnames=("channel", "result"),
+)
+EMAILS_COALESCED = Counter(
+    "sentinela_emails_coalesced_total",
+    "Notifications merged into a digest email instead of sent on their own",
+)
+EMAIL_NOTIFICATIONS_DROPPED = Counter(
+    "sentinela_email_notifications_dropped_total",
+    "Queued notifications given up on after their digest failed to send twice",
+)
+CLIPS_ASSEMBLED = Counter(
+    "sentinela_clips_assembled_total",
+    "Alert clips built from the frame history, by outcome",
+    labelnames=("result",),
+)
+ATTACHMENTS_PREPARED = Counter(
+    "sentinela_attachments_prepared_total",
+    "Email attachments checked against the size budget, by what was sent",
+    labelnames=("outcome",),
+)
+EMAILS_SENT = Counter(
+    "sentinela_emails_sent_total",
+    "Email send attempts by outcome",
+    labelnames=("result",),
+)
+ACTIVE_SESSIONS = Gauge(
+    "sentinela_active_sessions",
+    "WebSocket sessions currently streaming frames",
+)
+BUFFERED_FRAME_BYTES = Gauge(
+    "sentinela_buffered_frame_bytes",
+    "Total bytes of frames held in session buffers",
+)
+INFLIGHT_REQUESTS = Gauge(
+    "sentinela_inflight_requests",
+    "Inference requests currently in flight per engine",
+    labelnames=("engine",),
+)
+EVENT_LOOP_LAG = Histogram(
+    "sentinela_event_loop_lag_seconds",
+    "Delay between a scheduled event loop wake-up and when it actually ran",
+)
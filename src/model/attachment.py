@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class Attachment:
+    """A file built on the server, attached to an email as is"""
+    filename: str
+    content_type: str
+    data: bytes
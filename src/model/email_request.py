@@ -6,3 +6,5 @@ class EmailRequest(BaseModel):
     html_body: Optional[str] = None
     to_email: str
     video_attachment: Optional[str] = None
+    # urgent emails skip the digest unless the recipient just got one
+    urgent: bool = False
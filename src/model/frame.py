@@ -0,0 +1,8 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class Frame:
+    data: bytes
+    seq: int
+    captured_at: float
@@ -1,5 +1,11 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional
+
+
+@dataclass
+class PromptScore:
+    score: float
+    reason: str
 
 
 @dataclass
@@ -7,4 +13,7 @@ class InferenceResponse:
     should_process: bool
     score: Optional[float] = None
     reason: Optional[str] = None
-    start_time: Optional[float] = None
\ No newline at end of file
+    start_time: Optional[float] = None
+    prompt_scores: Optional[List[PromptScore]] = None
+    # dropped without calling the model because it was already working on another window
+    busy: bool = False
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class IngestSourceRequest(BaseModel):
+    url: str
+    name: Optional[str] = None
+    prompt: str
+    language: str = "en"
+    fps: float = Field(1.5, gt=0, le=30)
+    regions: List[dict] = []
+    alert_email: Optional[str] = None
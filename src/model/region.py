@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class Region:
+    """Area of the frame to watch, in fractions (0-1) of the frame width and height."""
+    x: float
+    y: float
+    width: float
+    height: float
+    prompt: Optional[str] = None
+    threshold: float = 90
@@ -1,12 +1,31 @@
+from ..detection_state import DetectionTracker
+from ..frame_history import FrameHistory
+from ..session_recorder import SessionRecording
+from .frame import Frame
+from .region import Region
+from .watch_prompt import WatchPrompt
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 
 @dataclass
 class Session:
     username: str
     created_at: datetime
-    frame_buffer: List[bytes] = field(default_factory=list)
+    # camera name in alerts and email digests
+    name: Optional[str] = None
+    frame_buffer: List[Frame] = field(default_factory=list)
     current_prompt: Optional[str] = None
-    language: str = "en"
\ No newline at end of file
+    prompts: List[WatchPrompt] = field(default_factory=list)
+    regions: List[Region] = field(default_factory=list)
+    language: str = "en"
+    protocol_version: int = 1
+    params: dict = field(default_factory=dict)
+    last_seq: int = -1
+    # detection state per watched prompt, keyed by its index and text
+    trackers: Dict[Tuple[int, str], DetectionTracker] = field(default_factory=dict)
+    # recent frames on disk, the pre-roll and post-roll of alert clips
+    history: Optional[FrameHistory] = None
+    # opt-in recording of frames, control changes and engine responses for replay
+    recording: Optional[SessionRecording] = None
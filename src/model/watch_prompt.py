@@ -0,0 +1,7 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class WatchPrompt:
+    text: str
+    threshold: float = 90
@@ -0,0 +1,125 @@
+"""
+Prepare an ONNX model directory for OnnxLocalInference.
+
+Gemma 3n cannot be exported with `torch.onnx` or `optimum` as-is: the vision
+encoder, the token embeddings and the decoder with its key/value cache have to
+be exported as separate graphs. This script takes such an export, by default
+the community export of Gemma 3n E2B on the Hugging Face Hub, or a local
+directory with an `onnx/` folder. It picks the precision variant of every
+graph, and falls back to full precision when a graph has no such variant. Each
+graph is then optimized once with ONNX Runtime and saved next to the
+tokenizer, processor and config files. A manifest records which files the
+engine loads.
+
+Offline optimization stops at the extended level, whose result is portable
+across CPUs; the engine applies the hardware specific layout optimizations
+when it loads the graphs.
+
+Usage:
+    python -m src.onnx_export --output models/gemma-3n-onnx --variant q4
+    ONNX_MODEL_DIR=models/gemma-3n-onnx python main.py
+"""
+
+from .onnx_local_inference import MANIFEST_FILE
+from huggingface_hub import list_repo_files, snapshot_download
+from typing import List
+import argparse
+import json
+import logging
+import onnxruntime as ort
+import os
+import shutil
+
+DEFAULT_SOURCE = "onnx-community/gemma-3n-E2B-it-ONNX"
+GRAPHS = {
+    "vision_encoder": "vision_encoder",
+    "embed_tokens": "embed_tokens",
+    "decoder": "decoder_model_merged",
+}
+VARIANTS = {"fp32": "", "fp16": "_fp16", "int8": "_quantized", "q4": "_q4", "q4f16": "_q4f16"}
+MODEL_FILE_PATTERNS = ["*.json", "*.model", "*.jinja", "tokenizer*"]
+
+logger = logging.getLogger(__name__)
+
+
+def pick_graph_file(files: List[str], graph: str, variant: str) -> str:
+    for suffix in (VARIANTS[variant], ""):
+        name = f"onnx/{graph}{suffix}.onnx"
+        if name in files:
+            return name
+    raise FileNotFoundError(f"No onnx/{graph}*.onnx in the source")
+
+
+def list_source_files(source: str) -> List[str]:
+    if os.path.isdir(source):
+        return [
+            os.path.relpath(os.path.join(root, name), source).replace(os.sep, "/")
+            for root, _, names in os.walk(source) for name in names
+        ]
+    return list_repo_files(source)
+
+
+def fetch(source: str, graph_files: List[str]) -> str:
+    """Local directory holding the model files and the chosen graphs with their external data."""
+    if os.path.isdir(source):
+        return source
+    patterns = MODEL_FILE_PATTERNS + [f"{graph_file}*" for graph_file in graph_files]
+    return snapshot_download(source, allow_patterns=patterns, token=os.getenv("HF_TOKEN"))
+
+
+def optimize(graph_path: str, output_path: str):
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = output_path
+    # decoders are larger than the 2GB protobuf limit, weights always go to a side file
+    options.add_session_config_entry(
+        "session.optimized_model_external_initializers_file_name", os.path.basename(output_path) + "_data"
+    )
+    options.add_session_config_entry("session.optimized_model_external_initializers_min_size_in_bytes", "1024")
+    ort.InferenceSession(graph_path, options, providers=["CPUExecutionProvider"])
+
+
+def export(source: str, output: str, variant: str, skip_optimization: bool = False):
+    files = list_source_files(source)
+    graph_files = {name: pick_graph_file(files, graph, variant) for name, graph in GRAPHS.items()}
+    for name, graph_file in graph_files.items():
+        if not graph_file.endswith(f"{VARIANTS[variant]}.onnx"):
+            logger.warning(f"No {variant} variant of {name}, using {graph_file}")
+
+    logger.info(f"Fetching {', '.join(graph_files.values())} from {source}...")
+    source_dir = fetch(source, list(graph_files.values()))
+    os.makedirs(output, exist_ok=True)
+    for name in os.listdir(source_dir):
+        path = os.path.join(source_dir, name)
+        if os.path.isfile(path) and not name.endswith((".onnx", ".onnx_data", ".md")):
+            shutil.copy(path, os.path.join(output, name))
+
+    graphs = {}
+    for name, graph_file in graph_files.items():
+        source_path = os.path.join(source_dir, graph_file)
+        if skip_optimization:
+            # graphs reference their external data files by name, so both keep the original names
+            graphs[name] = os.path.basename(graph_file)
+            for file_name in os.listdir(os.path.dirname(source_path)):
+                if file_name.startswith(graphs[name]):
+                    shutil.copy(os.path.join(os.path.dirname(source_path), file_name), os.path.join(output, file_name))
+            continue
+        graphs[name] = f"{name}.onnx"
+        logger.info(f"Optimizing {graph_file}...")
+        optimize(source_path, os.path.join(output, graphs[name]))
+
+    manifest = {"model": source, "variant": variant, "optimized": not skip_optimization, "graphs": graphs}
+    with open(os.path.join(output, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"ONNX model ready in {output}, start the server with ONNX_MODEL_DIR={output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="Hub repository or local directory of the ONNX export")
+    parser.add_argument("--output", required=True, help="directory to write the prepared model to")
+    parser.add_argument("--variant", choices=sorted(VARIANTS), default="q4", help="precision of the graphs")
+    parser.add_argument("--skip-optimization", action="store_true", help="copy the graphs without optimizing them")
+    logging.basicConfig(level=logging.INFO)
+    args = parser.parse_args()
+    export(args.source, args.output, args.variant, args.skip_optimization)
@@ -0,0 +1,263 @@
+"""
+Local Gemma inference on CPU with ONNX Runtime.
+
+This engine runs an ONNX export of the Gemma vision-language model, prepared
+with `python -m src.onnx_export`, without torch. The model is split into three
+graphs: the vision encoder turns images into soft tokens, the embedding graph
+turns token ids into embeddings, and the decoder generates the answer one token
+at a time with a key/value cache. Only the tokenizer and image processor come
+from `transformers`. Sessions use every ONNX Runtime graph optimization and
+ONNX_THREADS intra-op threads.
+"""
+
+from . import metrics, util
+from .embedding_cache import EmbeddingCache, frame_key
+from .inference_engine import InferenceEngine
+from .model.inference_response import InferenceResponse, PromptScore
+from datetime import datetime
+from PIL import Image
+from typing import Dict, List
+import asyncio
+import io
+import json
+import logging
+import numpy as np
+import onnxruntime as ort
+import os
+
+MAX_CONCURRENT_INFERENCES = 1
+# room for one |number|rate|reason| line per prompt in multi-prompt mode
+MAX_NEW_TOKENS = 300
+MANIFEST_FILE = "sentinela_onnx.json"
+# fp16 and q4f16 exports take half precision activations
+ONNX_FLOAT_TYPES = {"tensor(float)": np.float32, "tensor(float16)": np.float16}
+
+logger = logging.getLogger(__name__)
+
+
+def session_options(threads: int) -> ort.SessionOptions:
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    # 0 lets ONNX Runtime use one thread per physical core
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    # spinning threads keep cores busy between inferences, which starves ffmpeg and the event loop
+    options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    return options
+
+
+def float_input_types(session: ort.InferenceSession) -> Dict[str, type]:
+    """The numpy dtype of every floating point input of a graph."""
+    return {
+        graph_input.name: ONNX_FLOAT_TYPES[graph_input.type]
+        for graph_input in session.get_inputs() if graph_input.type in ONNX_FLOAT_TYPES
+    }
+
+
+class OnnxLocalInference(InferenceEngine):
+    def __init__(self):
+        self.active_inferences = 0
+        self.model_dir = os.getenv("ONNX_MODEL_DIR")
+        self.threads = int(os.getenv("ONNX_THREADS", 0))
+        cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", 64))
+        self.embedding_cache = EmbeddingCache(cache_size) if cache_size > 0 else None
+        self._initialize_model()
+
+    def _initialize_model(self):
+        from transformers import AutoConfig, AutoProcessor, GenerationConfig
+
+        manifest_path = os.path.join(self.model_dir, MANIFEST_FILE)
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            logger.error(f"No {MANIFEST_FILE} in {self.model_dir}, run `python -m src.onnx_export` first. Exiting.")
+            exit(1)
+
+        self.model_name = manifest["model"]
+        logger.info(f"Loading {self.model_name} ONNX graphs ({manifest['variant']}) from {self.model_dir}...")
+        options = session_options(self.threads)
+        self.sessions = {
+            name: ort.InferenceSession(os.path.join(self.model_dir, path), options, providers=["CPUExecutionProvider"])
+            for name, path in manifest["graphs"].items()
+        }
+        self.processor = AutoProcessor.from_pretrained(self.model_dir, use_fast=False)
+        config = AutoConfig.from_pretrained(self.model_dir)
+        self.image_token_id = config.image_token_id
+
+        try:
+            eos_token_id = GenerationConfig.from_pretrained(self.model_dir).eos_token_id
+        except OSError:
+            eos_token_id = self.processor.tokenizer.eos_token_id
+        self.eos_token_ids = set(eos_token_id if isinstance(eos_token_id, list) else [eos_token_id])
+
+        decoder = self.sessions["decoder"]
+        self.decoder_inputs = {graph_input.name for graph_input in decoder.get_inputs()}
+        self.decoder_types = float_input_types(decoder)
+        self.pixel_values_type = float_input_types(self.sessions["vision_encoder"]).get("pixel_values", np.float32)
+        # cache tensors are [batch, heads, sequence, head_dim], heads and head_dim are fixed by the export
+        self.empty_cache = {
+            graph_input.name: np.zeros(
+                [1, graph_input.shape[1], 0, graph_input.shape[3]], dtype=self.decoder_types.get(graph_input.name, np.float32),
+            )
+            for graph_input in decoder.get_inputs() if graph_input.name.startswith("past_key_values.")
+        }
+        self.decoder_outputs = ["logits"] + [name.replace("past_key_values.", "present.") for name in self.empty_cache]
+        logger.info(f"ONNX Runtime {ort.__version__} ready, {self.threads or 'default'} threads")
+
+    async def process_frames(self, frames_data: List[bytes], prompt: str, language: str = "en") -> InferenceResponse:
+        if self.active_inferences >= MAX_CONCURRENT_INFERENCES:
+            return InferenceResponse(should_process=False, busy=True)
+
+        self.active_inferences += 1
+
+        try:
+            start_time = datetime.now().timestamp()
+            analysis_prompt = util.create_analysis_prompt(prompt, language)
+            ai_response = await self._analyze_frames_with_model(frames_data, analysis_prompt)
+            if not ai_response:
+                return InferenceResponse(should_process=False)
+
+            score, reason = util.extract_score_and_reason(ai_response)
+            return InferenceResponse(
+                should_process=True,
+                score=score,
+                reason=reason,
+                start_time=start_time
+            )
+        finally:
+            self.active_inferences -= 1
+
+    async def process_frames_multi(self, frames_data: List[bytes], prompts: List[str], language: str = "en") -> InferenceResponse:
+        if self.active_inferences >= MAX_CONCURRENT_INFERENCES:
+            return InferenceResponse(should_process=False, busy=True)
+
+        self.active_inferences += 1
+
+        try:
+            start_time = datetime.now().timestamp()
+            analysis_prompt = util.create_multi_analysis_prompt(prompts, language)
+            ai_response = await self._analyze_frames_with_model(frames_data, analysis_prompt)
+            if not ai_response:
+                return InferenceResponse(should_process=False)
+
+            prompt_scores = [PromptScore(score, reason) for score, reason in util.extract_multi_scores(ai_response, len(prompts))]
+            best = max(prompt_scores, key=lambda prompt_score: prompt_score.score)
+            return InferenceResponse(
+                should_process=True,
+                score=best.score,
+                reason=best.reason,
+                start_time=start_time,
+                prompt_scores=prompt_scores
+            )
+        finally:
+            self.active_inferences -= 1
+
+    async def _analyze_frames_with_model(self, frames_data: List[bytes], analysis_prompt: str) -> str:
+        try:
+            loop = asyncio.get_event_loop()
+            result = await loop.run_in_executor(None, self._run_inference, frames_data, analysis_prompt)
+            return result
+
+        except Exception as e:
+            logger.error(f"Model analysis error: {str(e)}")
+            return ""
+
+    def _run_inference(self, frames_data: List[bytes], analysis_prompt: str) -> str:
+        try:
+            content = []
+            frame_keys = []
+            for frame_data in frames_data:
+                resized_frame_data = util.resize_frame(frame_data, self.max_frame_size, self.jpeg_quality)
+                content.append({"type": "image", "image": Image.open(io.BytesIO(resized_frame_data))})
+                frame_keys.append(frame_key(resized_frame_data))
+            content.append({"type": "text", "text": analysis_prompt})
+
+            with metrics.STAGE_LATENCY.time(stage="engine"):
+                return self._generate([{"role": "user", "content": content}], MAX_NEW_TOKENS, frame_keys)
+
+        except Exception as e:
+            logger.error(f"Inference error: {str(e)}")
+            return ""
+
+    def _generate(self, messages: list, max_new_tokens: int, frame_keys: List[bytes] = None) -> str:
+        inputs = self.processor.apply_chat_template(
+            messages, add_generation_prompt=True, tokenize=True, return_dict=True, return_tensors="np",
+        )
+        input_ids = inputs["input_ids"].astype(np.int64)
+        attention_mask = inputs["attention_mask"].astype(np.int64)
+        position_ids = np.cumsum(attention_mask, axis=-1) - 1
+        image_features = None
+        if "pixel_values" in inputs:
+            image_features = self._encode_images(inputs["pixel_values"].astype(self.pixel_values_type), frame_keys)
+
+        cache = dict(self.empty_cache)
+        generated = []
+        for _ in range(max_new_tokens):
+            inputs_embeds, *extra = self.sessions["embed_tokens"].run(None, {"input_ids": input_ids})
+            if image_features is not None:
+                # the prompt holds one image token per soft token, replaced by the vision encoder output
+                mask = (input_ids == self.image_token_id).reshape(-1)
+                flat_embeds = inputs_embeds.reshape(-1, inputs_embeds.shape[-1])
+                flat_embeds[mask] = image_features.reshape(-1, image_features.shape[-1])
+                inputs_embeds = flat_embeds.reshape(inputs_embeds.shape)
+                image_features = None
+
+            feed = {"inputs_embeds": self._cast("inputs_embeds", inputs_embeds), "position_ids": position_ids, **cache}
+            if "per_layer_inputs" in self.decoder_inputs:
+                feed["per_layer_inputs"] = self._cast("per_layer_inputs", extra[0])
+            if "attention_mask" in self.decoder_inputs:
+                feed["attention_mask"] = attention_mask
+            logits, *present = self.sessions["decoder"].run(self.decoder_outputs, feed)
+
+            next_token = int(logits[0, -1].argmax())
+            if next_token in self.eos_token_ids:
+                break
+            generated.append(next_token)
+            cache = dict(zip(self.empty_cache, present))
+            input_ids = np.array([[next_token]], dtype=np.int64)
+            attention_mask = np.concatenate([attention_mask, np.ones((1, 1), dtype=np.int64)], axis=-1)
+            position_ids = position_ids[:, -1:] + 1
+
+        return self.processor.tokenizer.decode(generated, skip_special_tokens=True)
+
+    def _cast(self, name: str, value: np.ndarray) -> np.ndarray:
+        return value.astype(self.decoder_types.get(name, value.dtype), copy=False)
+
+    def _encode_images(self, pixel_values: np.ndarray, frame_keys: List[bytes]) -> np.ndarray:
+        vision_encoder = self.sessions["vision_encoder"]
+
+        def encode(batch):
+            return vision_encoder.run(None, {"pixel_values": batch})[0]
+
+        if self.embedding_cache and frame_keys and len(frame_keys) == len(pixel_values):
+            return self.embedding_cache.encode(encode, pixel_values, frame_keys)
+        return encode(pixel_values)
+
+    async def summarize_watch_logs(self, events: list) -> str:
+        """
+        Summarize watching log events into a single detailed sentence.
+        """
+        if not events:
+            return "No events to summarize"
+
+        try:
+            prompt = util.create_summarization_prompt(events)
+            messages = [
+                {
+                    "role": "user",
+                    "content": [{"type": "text", "text": prompt}],
+                },
+            ]
+
+            loop = asyncio.get_event_loop()
+            answer = await loop.run_in_executor(None, self._generate, messages, 100)
+            return answer.strip()
+
+        except Exception as e:
+            logger.error(f"Summarization error: {str(e)}")
+            raise Exception(f"Summarization failed: {str(e)}")
+
+    def yourName(self) -> str:
+        return f"{self.__class__.__name__} - {self.model_name}"
@@ -6,9 +6,9 @@ models for computer vision analysis. It handles image encoding, API communicatio
 response parsing, and includes caching for translations to optimize performance.
 """
 
-from . import util
+from . import metrics, util
 from .inference_engine import InferenceEngine
-from .model.inference_response import InferenceResponse
+from .model.inference_response import InferenceResponse, PromptScore
 from datetime import datetime
 from openai import AsyncOpenAI
 from typing import List
@@ -56,7 +56,8 @@ class OpenRouterInference(InferenceEngine):
             InferenceResponse: Response containing processing decision and metadata
         """
         start_time = datetime.now().timestamp()
-        ai_response = await self._analyze_frame_with_ai(frames_data, prompt, language)
+        analysis_prompt = util.create_analysis_prompt(prompt, language)
+        ai_response = await self._analyze_frame_with_ai(frames_data, analysis_prompt)
         if not ai_response:
             return InferenceResponse(should_process=False)
 
@@ -68,13 +69,31 @@ class OpenRouterInference(InferenceEngine):
             start_time=start_time
         )
 
-    async def _analyze_frame_with_ai(self, frames: list, prompt: str, language: str = "en") -> str:
+    async def process_frames_multi(self, frames_data: List[bytes], prompts: List[str], language: str = "en") -> InferenceResponse:
+        start_time = datetime.now().timestamp()
+        analysis_prompt = util.create_multi_analysis_prompt(prompts, language)
+        ai_response = await self._analyze_frame_with_ai(frames_data, analysis_prompt)
+        if not ai_response:
+            return InferenceResponse(should_process=False)
+
+        prompt_scores = [PromptScore(score, reason) for score, reason in util.extract_multi_scores(ai_response, len(prompts))]
+        best = max(prompt_scores, key=lambda prompt_score: prompt_score.score)
+        return InferenceResponse(
+            should_process=True,
+            score=best.score,
+            reason=best.reason,
+            start_time=start_time,
+            prompt_scores=prompt_scores
+        )
+
+    async def _analyze_frame_with_ai(self, frames: list, analysis_prompt: str) -> str:
         """Internal function to analyze frames using OpenRouter"""
         try:
             content = []
             for frame_data in frames:
-                resized_frame_data = util.resize_frame(frame_data)
-                base64_image = base64.b64encode(resized_frame_data).decode('utf-8')                
+                resized_frame_data = util.resize_frame(frame_data, self.max_frame_size, self.jpeg_quality)
+                with metrics.STAGE_LATENCY.time(stage="base64"):
+                    base64_image = base64.b64encode(resized_frame_data).decode('utf-8')
                 content.append({
                     "type": "image_url",
                     "image_url": {
@@ -82,7 +101,6 @@ class OpenRouterInference(InferenceEngine):
                     }
                 })
 
-            analysis_prompt = util.create_analysis_prompt(prompt, language)
             content.append({
                 "type": "text",
                 "text": analysis_prompt
@@ -92,7 +110,8 @@ class OpenRouterInference(InferenceEngine):
                 "content": content
             }]
             
-            response_text = await self._run_ai_inference(messages, timeout=5)
+            with metrics.STAGE_LATENCY.time(stage="engine"):
+                response_text = await self._run_ai_inference(messages, timeout=5)
             return response_text
             
         except Exception as e:
@@ -110,7 +129,9 @@ class OpenRouterInference(InferenceEngine):
             )
             return response.choices[0].message.content
         except Exception as e:
-            if "timed out" not in str(e).lower():
+            if "timed out" in str(e).lower():
+                metrics.INFERENCE_TIMEOUTS.inc(engine=self.__class__.__name__)
+            else:
                 logger.error(f"AI inference error: {str(e)}")
             return ""
     
@@ -0,0 +1,244 @@
+"""
+Cheap local pre-screen stage in front of the multimodal inference engine.
+
+A small CPU model scores every inference window against the user's prompt and
+the expensive engine is only called when that score reaches the configured
+threshold, i.e. when the pre-screen sees a possible match or is unsure. A
+fraction of the skipped windows is still sent to the engine ("audits") so the
+agreement between both stages can be measured and thresholds tuned per prompt.
+A window counts as a detection when the engine's score reaches the detection
+threshold of its prompt, announced with `detection_thresholds` by the code that
+starts the inference task.
+"""
+
+from . import metrics
+from .inference_engine import InferenceEngine
+from .model.inference_response import InferenceResponse, PromptScore
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from PIL import Image
+from typing import Dict, List, Optional, Protocol
+import asyncio
+import io
+import logging
+import random
+import threading
+
+MAX_TEXT_EMBEDS = 256
+
+logger = logging.getLogger(__name__)
+
+# tasks copy the context they are created in, so every inference sees the thresholds of its own session
+_detection_thresholds: ContextVar[Optional[Dict[str, float]]] = ContextVar("detection_thresholds", default=None)
+
+
+@contextmanager
+def detection_thresholds(thresholds: Dict[str, float]):
+    """Detection threshold of each prompt, for the inference tasks created inside this block."""
+    token = _detection_thresholds.set(thresholds)
+    try:
+        yield
+    finally:
+        _detection_thresholds.reset(token)
+
+
+class PreScreen(Protocol):
+    """A fast scorer that estimates how likely the frames match the prompt."""
+
+    def score(self, frames_data: List[bytes], prompt: str) -> float:
+        """
+        Score frames against the prompt. Runs on an executor thread.
+
+        Returns:
+            float: 0 (certainly no match) to 1 (certain match)
+        """
+        ...
+
+
+class ClipPreScreen(PreScreen):
+    """Zero-shot image-text similarity with a CLIP-style model on CPU."""
+
+    NEGATIVE_LABEL = "an ordinary scene where nothing notable happens"
+
+    def __init__(self, model_name: str):
+        from transformers import AutoModel, AutoProcessor
+        import torch
+
+        self.torch = torch
+        self.model_name = model_name
+        self.processor = AutoProcessor.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        self._text_embeds: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        logger.info(f"Pre-screen model {model_name} loaded")
+
+    def _encode_text(self, prompt: str):
+        if prompt in self._text_embeds:
+            self._text_embeds.move_to_end(prompt)
+            return self._text_embeds[prompt]
+        inputs = self.processor(text=[prompt, self.NEGATIVE_LABEL], return_tensors="pt", padding=True)
+        embeds = self.model.get_text_features(**inputs)
+        self._text_embeds[prompt] = embeds / embeds.norm(dim=-1, keepdim=True)
+        while len(self._text_embeds) > MAX_TEXT_EMBEDS:
+            self._text_embeds.popitem(last=False)
+        return self._text_embeds[prompt]
+
+    def score(self, frames_data: List[bytes], prompt: str) -> float:
+        images = []
+        for frame_data in frames_data:
+            image = Image.open(io.BytesIO(frame_data))
+            image.draft("RGB", (336, 336))
+            images.append(image.convert("RGB"))
+
+        with self._lock, self.torch.inference_mode():
+            text_embeds = self._encode_text(prompt)
+            inputs = self.processor(images=images, return_tensors="pt")
+            image_embeds = self.model.get_image_features(**inputs)
+            image_embeds = image_embeds / image_embeds.norm(dim=-1, keepdim=True)
+            logits = self.model.logit_scale.exp() * image_embeds @ text_embeds.T
+            probabilities = logits.softmax(dim=-1)[:, 0]
+        return float(probabilities.max())
+
+
+@dataclass
+class PromptStats:
+    windows: int = 0
+    escalated: int = 0
+    audited: int = 0
+    compared: int = 0
+    agreed: int = 0
+    missed_detections: int = 0
+    scores_when_detected: List[float] = field(default_factory=list)
+    scores_when_clear: List[float] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        def mean(values):
+            return round(sum(values) / len(values), 3) if values else None
+
+        return {
+            "windows": self.windows,
+            "escalation_rate": round(self.escalated / self.windows, 3) if self.windows else None,
+            "audited": self.audited,
+            "agreement_rate": round(self.agreed / self.compared, 3) if self.compared else None,
+            "missed_detections": self.missed_detections,
+            "mean_score_when_detected": mean(self.scores_when_detected),
+            "mean_score_when_clear": mean(self.scores_when_clear),
+        }
+
+
+class PreScreenedInference(InferenceEngine):
+    """Wraps an engine so it is only called when the pre-screen cannot rule a match out."""
+
+    MAX_SCORE_SAMPLES = 1000
+
+    def __init__(self, engine: InferenceEngine, prescreen: PreScreen, threshold: float, audit_rate: float = 0.05,
+                 detection_threshold: float = 90):
+        self.engine = engine
+        self.prescreen = prescreen
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.detection_threshold = detection_threshold
+        self.max_frame_size = engine.max_frame_size
+        self.jpeg_quality = engine.jpeg_quality
+        self.stats: Dict[str, PromptStats] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    async def process_frames(self, frames_data: List[bytes], prompt: str, language: str = "en") -> InferenceResponse:
+        if not frames_data:
+            return await self.engine.process_frames(frames_data, prompt, language)
+
+        start_time = datetime.now().timestamp()
+        prescreen_scores = await self._score(frames_data, [prompt])
+        if prescreen_scores is None or self._decide([prompt], prescreen_scores):
+            result = await self.engine.process_frames(frames_data, prompt, language)
+        else:
+            # a low score without reason: clients reset their detection streak but show nothing
+            return InferenceResponse(should_process=True, score=0, reason="", start_time=start_time)
+
+        if prescreen_scores and result.should_process:
+            self._record_agreement(self.stats[prompt], prescreen_scores[0], result.score >= self._detection_threshold(prompt))
+        return result
+
+    async def process_frames_multi(self, frames_data: List[bytes], prompts: List[str], language: str = "en") -> InferenceResponse:
+        if not frames_data:
+            return await self.engine.process_frames_multi(frames_data, prompts, language)
+
+        start_time = datetime.now().timestamp()
+        prescreen_scores = await self._score(frames_data, prompts)
+        if prescreen_scores is None or self._decide(prompts, prescreen_scores):
+            result = await self.engine.process_frames_multi(frames_data, prompts, language)
+        else:
+            return InferenceResponse(
+                should_process=True,
+                score=0,
+                reason="",
+                start_time=start_time,
+                prompt_scores=[PromptScore(0, "") for _ in prompts],
+            )
+
+        if prescreen_scores and result.should_process and result.prompt_scores:
+            for prompt, prescreen_score, prompt_score in zip(prompts, prescreen_scores, result.prompt_scores):
+                detected = prompt_score.score >= self._detection_threshold(prompt)
+                self._record_agreement(self.stats[prompt], prescreen_score, detected)
+        return result
+
+    async def _score(self, frames_data: List[bytes], prompts: List[str]) -> Optional[List[float]]:
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.STAGE_LATENCY.time(stage="prescreen"):
+                return await loop.run_in_executor(None, lambda: [self.prescreen.score(frames_data, prompt) for prompt in prompts])
+        except Exception as e:
+            logger.error(f"Pre-screen error, escalating: {str(e)}")
+            return None
+
+    def _detection_threshold(self, prompt: str) -> float:
+        return (_detection_thresholds.get() or {}).get(prompt, self.detection_threshold)
+
+    def _decide(self, prompts: List[str], prescreen_scores: List[float]) -> bool:
+        """Count the window for every prompt and return whether the engine should see it."""
+        escalate = any(score >= self.threshold for score in prescreen_scores)
+        audit = not escalate and random.random() < self.audit_rate
+        for prompt, score in zip(prompts, prescreen_scores):
+            stats = self.stats.setdefault(prompt, PromptStats())
+            stats.windows += 1
+            stats.escalated += score >= self.threshold
+            stats.audited += audit
+
+        if escalate:
+            metrics.PRESCREEN_DECISIONS.inc(decision="escalated")
+        elif audit:
+            metrics.PRESCREEN_DECISIONS.inc(decision="audited")
+        else:
+            metrics.PRESCREEN_DECISIONS.inc(decision="skipped")
+        return escalate or audit
+
+    def _record_agreement(self, stats: PromptStats, prescreen_score: float, detected: bool):
+        escalated = prescreen_score >= self.threshold
+        stats.compared += 1
+        stats.agreed += escalated == detected
+        if not escalated and detected:
+            stats.missed_detections += 1
+            logger.warning(f"Pre-screen skipped a detection, score={prescreen_score:.3f}, threshold={self.threshold}")
+
+        samples = stats.scores_when_detected if detected else stats.scores_when_clear
+        samples.append(prescreen_score)
+        del samples[:-self.MAX_SCORE_SAMPLES]
+
+    def report(self) -> dict:
+        return {
+            "model": getattr(self.prescreen, "model_name", self.prescreen.__class__.__name__),
+            "threshold": self.threshold,
+            "audit_rate": self.audit_rate,
+            "prompts": {prompt: stats.as_dict() for prompt, stats in self.stats.items()},
+        }
+
+    async def summarize_watch_logs(self, events: List[str]) -> str:
+        return await self.engine.summarize_watch_logs(events)
+
+    def yourName(self) -> str:
+        return f"{self.engine.yourName()} (pre-screened)"
@@ -0,0 +1,142 @@
+"""
+On-demand profiling of a live server.
+
+Two kinds of profile can be captured for a few seconds at a time:
+
+- `cpu`: a sampling profiler thread reads the stack of every other thread of
+  the process at a fixed rate, covering the event loop, executor threads
+  (resizing, cropping, msgpack) and engine calls. The samples are returned as
+  collapsed stacks, one `thread;outer;...;inner count` line per distinct stack,
+  the input format of flamegraph.pl, speedscope and most flame graph tools.
+- `torch`: the torch profiler records the operators of the local Gemma engine,
+  whose forward passes are labelled, and returns a Chrome trace (open it in
+  chrome://tracing or Perfetto).
+
+Nothing is installed while no profile runs: the sampler thread only exists
+during a capture and the engine only labels its calls while a torch trace is
+being recorded.
+"""
+
+from collections import Counter
+from typing import Dict
+import asyncio
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+logger = logging.getLogger(__name__)
+
+_torch_tracing = False
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def torch_region(name: str):
+    """Label the torch operators run inside this block, only while a torch trace is recorded."""
+    if not _torch_tracing:
+        return contextlib.nullcontext()
+    import torch
+    return torch.profiler.record_function(name)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = os.path.relpath(code.co_filename) if code.co_filename.startswith(os.getcwd()) else os.path.basename(code.co_filename)
+    # ';' separates frames in the collapsed format
+    return f"{code.co_qualname} ({path}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names: Dict[int, str] = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)).replace(";", ":"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profiler:
+    """Runs at most one capture at a time."""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    async def capture_cpu(self, seconds: float, interval: float = DEFAULT_SAMPLE_INTERVAL) -> str:
+        async with self._acquire():
+            sampler = StackSampler(interval)
+            started = time.perf_counter()
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                await asyncio.get_running_loop().run_in_executor(None, sampler.stop)
+            logger.info(f"CPU profile captured: {sampler.samples} samples in {time.perf_counter() - started:.1f}s, "
+                        f"{len(sampler.stacks)} distinct stacks")
+            return sampler.collapsed()
+
+    async def capture_torch(self, seconds: float) -> bytes:
+        import torch
+
+        global _torch_tracing
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+        async with self._acquire():
+            profile = torch.profiler.profile(activities=activities)
+            profile.start()
+            _torch_tracing = True
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                _torch_tracing = False
+                profile.stop()
+            return await asyncio.get_running_loop().run_in_executor(None, _chrome_trace, profile)
+
+    @contextlib.asynccontextmanager
+    async def _acquire(self):
+        if self._lock.locked():
+            raise ProfilerBusy("A profile is already being captured")
+        async with self._lock:
+            yield
+
+
+def _chrome_trace(profile) -> bytes:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "trace.json")
+        profile.export_chrome_trace(path)
+        with open(path, "rb") as f:
+            return f.read()
@@ -0,0 +1,94 @@
+"""
+Inference engine answering from a session recording.
+
+Set REPLAY_RECORDING to a directory written by the session recorder and the
+server answers every inference with the engine response recorded for the same
+frames, after the recorded latency divided by REPLAY_SPEED. Frames are matched
+by content: the newest frame of a call is looked up among the recorded frames,
+and the response is the one recorded for that frame, or the latest one
+recorded before it. Calls whose frames were cropped to regions or tiled into a
+mosaic cannot be matched and get the recorded responses in order. Replaying a
+recording gives the same scores on every run, without an API key or a model.
+"""
+
+from .inference_engine import InferenceEngine
+from .model.inference_response import InferenceResponse, PromptScore
+from .session_recorder import read_recording
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, List
+import asyncio
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_hash(frame_data: bytes) -> bytes:
+    return hashlib.blake2b(frame_data, digest_size=16).digest()
+
+
+class ReplayInference(InferenceEngine):
+    def __init__(self):
+        self.recording = os.getenv("REPLAY_RECORDING")
+        self.speed = float(os.getenv("REPLAY_SPEED", 1))
+        self.seq_by_frame: Dict[bytes, int] = {}
+        self.responses: List[dict] = []
+        for record in read_recording(self.recording):
+            if record["type"] == "frame":
+                self.seq_by_frame[_frame_hash(record["frame"])] = record["seq"]
+            elif record["type"] == "response" and record["seq_to"] is not None:
+                self.responses.append(record)
+        self.responses.sort(key=lambda response: response["seq_to"])
+        self.response_seqs = [response["seq_to"] for response in self.responses]
+        self.next_unmatched = 0
+        self.matched = 0
+        self.unmatched = 0
+        logger.info(f"Replaying {len(self.responses)} responses for {len(self.seq_by_frame)} frames from {self.recording}")
+
+    async def process_frames(self, frames_data: List[bytes], prompt: str, language: str = "en") -> InferenceResponse:
+        return await self._replay(frames_data)
+
+    async def process_frames_multi(self, frames_data: List[bytes], prompts: List[str], language: str = "en") -> InferenceResponse:
+        return await self._replay(frames_data)
+
+    async def _replay(self, frames_data: List[bytes]) -> InferenceResponse:
+        start_time = datetime.now().timestamp()
+        response = self._find_response(frames_data[-1] if frames_data else b"")
+        if response is None:
+            return InferenceResponse(should_process=False)
+
+        await asyncio.sleep(response["latency"] / self.speed)
+        if not response["should_process"]:
+            return InferenceResponse(should_process=False, busy=response.get("busy", False))
+        return InferenceResponse(
+            should_process=True,
+            score=response["score"],
+            reason=response["reason"],
+            start_time=start_time,
+            prompt_scores=[PromptScore(score, reason) for score, reason in response["prompt_scores"]]
+            if response["prompt_scores"] else None,
+        )
+
+    def _find_response(self, frame_data: bytes):
+        if not self.responses:
+            return None
+        seq = self.seq_by_frame.get(_frame_hash(frame_data))
+        if seq is not None:
+            self.matched += 1
+            index = bisect_right(self.response_seqs, seq) - 1
+            return self.responses[max(0, index)]
+
+        self.unmatched += 1
+        response = self.responses[self.next_unmatched % len(self.responses)]
+        self.next_unmatched += 1
+        return response
+
+    async def summarize_watch_logs(self, events: list) -> str:
+        if not events:
+            return "No events to summarize"
+        return f"Replayed {len(events)} events from {os.path.basename(self.recording.rstrip('/'))}"
+
+    def yourName(self) -> str:
+        return f"{self.__class__.__name__} - {self.recording}"
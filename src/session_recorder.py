@@ -0,0 +1,216 @@
+"""
+Opt-in recording of session traffic for offline replay.
+
+Frames only live in a session's buffer for a few seconds, so production load
+and detection behaviour could not be reproduced offline. With RECORDING_DIR
+set, every session writes what the pipeline saw to a directory of segment
+files: each frame with its sequence number and capture time, every change of
+prompts, regions, language or params, and every engine response with its
+latency. Records are msgpack maps with the frame bytes stored raw, appended to
+segments of RECORDING_SEGMENT_MB. Every reconnect and ingest source starts a
+new recording, so RECORDING_MAX_MB caps all recordings under RECORDING_DIR
+together: the oldest segments are deleted first, whichever recording they
+belong to, and recordings left empty are removed. Every segment starts with
+the session's control state at that point, so a recording stays replayable
+after its head is dropped.
+
+Records are packed on the event loop, which is cheap, and written in batches
+from an executor thread. `benchmarks/replay.py` feeds recordings back through
+/ws/frames or straight into the inference pipeline, with `ReplayInference`
+answering from the recorded responses.
+
+Record types, all with `t`, the wall clock time at which they were recorded:
+    {"type": "control", "prompt": str, "prompts": [{"prompt", "threshold"}],
+     "regions": [{"x", "y", "w", "h", "prompt", "threshold"}], "language": str, "params": {}}
+    {"type": "frame", "seq": int, "ts": capture time in seconds, "frame": bytes}
+    {"type": "response", "seq_from": int, "seq_to": int, "latency": seconds, "should_process": bool, "busy": bool,
+     "score": float, "reason": str, "prompt_scores": [[score, reason]] or None}
+"""
+
+from .model.frame import Frame
+from .model.inference_response import InferenceResponse
+from .model.region import Region
+from .model.watch_prompt import WatchPrompt
+from typing import Dict, Iterator, List, Optional, Tuple
+import asyncio
+import glob
+import logging
+import msgpack
+import os
+import threading
+import time
+
+FLUSH_INTERVAL = 1.0
+SEGMENT_SUFFIX = ".seg"
+
+logger = logging.getLogger(__name__)
+
+
+class SessionRecording:
+    def __init__(self, directory: str, segment_bytes: int):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        # packed records and whether they are control records
+        self._pending: List[Tuple[bytes, bool]] = []
+        self._pending_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._segment_count = 0
+        self._segment_path: Optional[str] = None
+        self._file = None
+        self._written_control: Optional[bytes] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def control(self, prompt: Optional[str], prompts: List[WatchPrompt], regions: List[Region], language: str, params: dict):
+        """Record the session's control state after a change."""
+        self._append({
+            "type": "control",
+            "prompt": prompt,
+            "prompts": [{"prompt": watch_prompt.text, "threshold": watch_prompt.threshold} for watch_prompt in prompts],
+            "regions": [
+                {"x": region.x, "y": region.y, "w": region.width, "h": region.height,
+                 "prompt": region.prompt, "threshold": region.threshold}
+                for region in regions
+            ],
+            "language": language,
+            "params": params,
+        }, is_control=True)
+
+    def frame(self, frame: Frame):
+        self._append({"type": "frame", "seq": frame.seq, "ts": frame.captured_at, "frame": frame.data})
+
+    def response(self, result: InferenceResponse, frames: List[Frame], latency: float):
+        self._append({
+            "type": "response",
+            "seq_from": frames[0].seq if frames else None,
+            "seq_to": frames[-1].seq if frames else None,
+            "latency": latency,
+            "should_process": result.should_process,
+            "busy": result.busy,
+            "score": result.score,
+            "reason": result.reason,
+            "prompt_scores": [[prompt_score.score, prompt_score.reason] for prompt_score in result.prompt_scores]
+            if result.prompt_scores else None,
+        })
+
+    def _append(self, record: dict, is_control: bool = False):
+        record["t"] = time.time()
+        packed = msgpack.packb(record)
+        with self._pending_lock:
+            self._pending.append((packed, is_control))
+
+    @property
+    def open_segment(self) -> Optional[str]:
+        """Path of the segment being written, which must not be deleted."""
+        return self._segment_path if self._file else None
+
+    def flush(self) -> int:
+        """Write the pending records, returning how many bytes were written."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        with self._lock:
+            for packed, is_control in pending:
+                if self._file is None or self._file.tell() + len(packed) > self.segment_bytes:
+                    self._rotate(is_control)
+                self._file.write(packed)
+                if is_control:
+                    self._written_control = packed
+            self._file.flush()
+        return sum(len(packed) for packed, _ in pending)
+
+    def _rotate(self, next_is_control: bool):
+        if self._file:
+            self._file.close()
+        self._segment_count += 1
+        self._segment_path = os.path.join(self.directory, f"{self._segment_count:06d}{SEGMENT_SUFFIX}")
+        self._file = open(self._segment_path, "wb")
+        # a segment must replay on its own once the ones before it are deleted
+        if self._written_control and not next_is_control:
+            self._file.write(self._written_control)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+class SessionRecorder:
+    """One SessionRecording per connection or ingest source, all under one directory of at most max_bytes."""
+
+    def __init__(self, directory: str, segment_bytes: int, max_bytes: int):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self._recordings: Dict[str, SessionRecording] = {}
+
+    def open(self, session_id: str) -> SessionRecording:
+        self.close(session_id)
+        directory = os.path.join(self.directory, f"{session_id}-{time.strftime('%Y%m%d-%H%M%S')}")
+        recording = SessionRecording(directory, self.segment_bytes)
+        self._recordings[session_id] = recording
+        logger.info(f"Recording session {session_id} to {directory}")
+        return recording
+
+    def close(self, session_id: str):
+        recording = self._recordings.pop(session_id, None)
+        if recording:
+            recording.close()
+
+    def flush(self):
+        written = sum(recording.flush() for recording in list(self._recordings.values()))
+        if written:
+            self._enforce_limit()
+
+    def _enforce_limit(self):
+        """Delete the oldest segments of any recording, finished or not, until the directory fits max_bytes."""
+        open_segments = {recording.open_segment for recording in list(self._recordings.values())}
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, "*", f"*{SEGMENT_SUFFIX}")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            segments.append((stat.st_mtime, path, stat.st_size))
+
+        total = sum(size for _, _, size in segments)
+        for _, path, size in sorted(segments):
+            if total <= self.max_bytes:
+                break
+            if path in open_segments:
+                continue
+            try:
+                os.unlink(path)
+            except OSError as e:
+                logger.warning(f"Could not delete recording segment {path}: {e}")
+                continue
+            total -= size
+            directory = os.path.dirname(path)
+            if not glob.glob(os.path.join(directory, f"*{SEGMENT_SUFFIX}")):
+                try:
+                    os.rmdir(directory)
+                except OSError as e:
+                    logger.warning(f"Could not delete recording {directory}: {e}")
+
+    async def run(self):
+        """Write pending records every FLUSH_INTERVAL until cancelled."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await asyncio.sleep(FLUSH_INTERVAL)
+                try:
+                    await loop.run_in_executor(None, self.flush)
+                except Exception as e:
+                    logger.error(f"Session recorder error: {str(e)}")
+        finally:
+            for session_id in list(self._recordings):
+                self.close(session_id)
+
+
+def read_recording(directory: str) -> Iterator[dict]:
+    """Records of a recording in the order they were written."""
+    for path in sorted(glob.glob(os.path.join(directory, f"*{SEGMENT_SUFFIX}"))):
+        with open(path, "rb") as f:
+            yield from msgpack.Unpacker(f, raw=False)
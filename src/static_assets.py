@@ -0,0 +1,151 @@
+"""
+Static asset serving with precompression, fingerprinting and caching.
+
+At startup every file under the static directory is hashed. Text assets are
+compressed once with gzip, and with brotli when the optional `brotli` package
+is installed. Each asset is also reachable under a fingerprinted name
+(`app.js` -> `app.<hash>.js`) that is served with an immutable, year-long
+Cache-Control. index.html is rendered with an import map that points every
+module at its fingerprinted URL. Modules keep importing each other by their
+plain names, so only the files that changed get new URLs. Plain names and
+index.html are served with ETags and `no-cache`, so browsers revalidate them
+with a cheap 304.
+"""
+
+from dataclasses import dataclass, field
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+from typing import Dict, Optional
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import textwrap
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {".js", ".html", ".json", ".css", ".txt", ".svg", ".ico"}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# compressed variants that do not save at least this much are not worth a Vary lookup
+MIN_COMPRESSION_RATIO = 0.9
+IMPORT_MAP_PATTERN = re.compile(r'(<script type="importmap">)(.*?)(</script>)', re.DOTALL)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Asset:
+    path: str
+    etag: str
+    # only text assets are kept in memory, media files are streamed from disk
+    content: Optional[bytes] = None
+    media_type: Optional[str] = None
+    encodings: Dict[str, bytes] = field(default_factory=dict)
+
+
+def fingerprinted_name(path: str, etag: str) -> str:
+    root, extension = os.path.splitext(path)
+    return f"{root}.{etag[:12]}{extension}"
+
+
+def compress(content: bytes) -> Dict[str, bytes]:
+    encodings = {}
+    if brotli:
+        encodings["br"] = brotli.compress(content, quality=11)
+    encodings["gzip"] = gzip.compress(content, compresslevel=9, mtime=0)
+    return {encoding: data for encoding, data in encodings.items() if len(data) < len(content) * MIN_COMPRESSION_RATIO}
+
+
+class StaticAssets(StaticFiles):
+    """StaticFiles that also serves fingerprinted names and precompressed text assets."""
+
+    def __init__(self, directory: str):
+        super().__init__(directory=directory)
+        self.assets: Dict[str, Asset] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self._load(directory)
+        encodings = ["br", "gzip"] if brotli else ["gzip"]
+        logger.info(f"Prepared {len(self.assets)} static assets, encodings: {', '.join(encodings)}")
+
+    def _load(self, directory: str):
+        for root, _, files in os.walk(directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                path = os.path.relpath(full_path, directory).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    etag = hashlib.file_digest(f, "sha256").hexdigest()
+                asset = Asset(path=path, etag=etag)
+                if os.path.splitext(name)[1] in COMPRESSIBLE_EXTENSIONS:
+                    with open(full_path, "rb") as f:
+                        asset.content = f.read()
+                    asset.encodings = compress(asset.content)
+                self.assets[path] = asset
+                self.fingerprints[fingerprinted_name(path, etag)] = path
+
+    def url_for(self, path: str) -> str:
+        """Fingerprinted URL of an asset, relative to the app page like the original index.html uses."""
+        asset = self.assets.get(path)
+        return f"static/{fingerprinted_name(path, asset.etag) if asset else path}"
+
+    def render_index(self) -> Asset:
+        """index.html with the app script and every module pointed at their fingerprinted URLs."""
+        html = self.assets["index.html"].content.decode()
+        html = html.replace('src="static/app.js"', f'src="{self.url_for("app.js")}"')
+
+        match = IMPORT_MAP_PATTERN.search(html)
+        import_map = json.loads(match.group(2)) if match else {"imports": {}}
+        for path in sorted(self.assets):
+            if path.endswith(".js"):
+                import_map["imports"][f"./static/{path}"] = f"./{self.url_for(path)}"
+        rendered_map = "\n" + textwrap.indent(json.dumps(import_map, indent=4), "    ") + "\n    "
+        if match:
+            html = html[:match.start(2)] + rendered_map + html[match.end(2):]
+        else:
+            html = html.replace("</head>", f'<script type="importmap">{rendered_map}</script>\n</head>')
+
+        content = html.encode()
+        return Asset("index.html", hashlib.sha256(content).hexdigest(), content, "text/html", compress(content))
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        path = path.replace(os.sep, "/")
+        immutable = path in self.fingerprints
+        cache_control = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        asset = self.assets.get(self.fingerprints.get(path, path))
+        if not asset or asset.content is None or scope["method"] not in ("GET", "HEAD"):
+            response = await super().get_response(asset.path if asset else path, scope)
+            response.headers["Cache-Control"] = cache_control
+            return response
+        return asset_response(asset, scope, cache_control)
+
+
+def asset_response(asset: Asset, scope: Scope, cache_control: str) -> Response:
+    """Serve an asset from memory, picking the best encoding the client accepts."""
+    request_headers = Headers(scope=scope)
+    accepted = {part.split(";")[0].strip() for part in request_headers.get("accept-encoding", "").split(",")}
+    encoding = next((name for name in ("br", "gzip") if name in asset.encodings and name in accepted), None)
+
+    etag = f'"{asset.etag[:32]}{"-" + encoding if encoding else ""}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if asset.encodings:
+        headers["Vary"] = "Accept-Encoding"
+    if etag in [tag.strip() for tag in request_headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    media_type = asset.media_type or mimetypes.guess_type(asset.path)[0] or "application/octet-stream"
+    body = asset.encodings[encoding] if encoding else asset.content
+    if scope["method"] == "HEAD":
+        headers["Content-Length"] = str(len(body))
+        body = b""
+    return Response(body, media_type=media_type, headers=headers)
+
@@ -1,6 +1,6 @@
-from . import util
+from . import metrics, util
 from .inference_engine import InferenceEngine
-from .model.inference_response import InferenceResponse
+from .model.inference_response import InferenceResponse, PromptScore
 from datetime import datetime
 from together import AsyncTogether
 from typing import List
@@ -31,7 +31,8 @@ class TogetherInference(InferenceEngine):
 
     async def process_frames(self, frames_data: List[bytes], prompt: str, language: str = "en") -> InferenceResponse:
         start_time = datetime.now().timestamp()
-        ai_response = await self._analyze_frame_with_ai(frames_data, prompt, language)
+        analysis_prompt = util.create_analysis_prompt(prompt, language)
+        ai_response = await self._analyze_frame_with_ai(frames_data, analysis_prompt)
         if not ai_response:
             return InferenceResponse(should_process=False)
 
@@ -43,12 +44,30 @@ class TogetherInference(InferenceEngine):
             start_time=start_time
         )
 
-    async def _analyze_frame_with_ai(self, frames: list, prompt: str, language: str = "en") -> str:
+    async def process_frames_multi(self, frames_data: List[bytes], prompts: List[str], language: str = "en") -> InferenceResponse:
+        start_time = datetime.now().timestamp()
+        analysis_prompt = util.create_multi_analysis_prompt(prompts, language)
+        ai_response = await self._analyze_frame_with_ai(frames_data, analysis_prompt)
+        if not ai_response:
+            return InferenceResponse(should_process=False)
+
+        prompt_scores = [PromptScore(score, reason) for score, reason in util.extract_multi_scores(ai_response, len(prompts))]
+        best = max(prompt_scores, key=lambda prompt_score: prompt_score.score)
+        return InferenceResponse(
+            should_process=True,
+            score=best.score,
+            reason=best.reason,
+            start_time=start_time,
+            prompt_scores=prompt_scores
+        )
+
+    async def _analyze_frame_with_ai(self, frames: list, analysis_prompt: str) -> str:
         try:
             content = []
             for frame_data in frames:
-                resized_frame_data = util.resize_frame(frame_data)
-                base64_image = base64.b64encode(resized_frame_data).decode('utf-8')                
+                resized_frame_data = util.resize_frame(frame_data, self.max_frame_size, self.jpeg_quality)
+                with metrics.STAGE_LATENCY.time(stage="base64"):
+                    base64_image = base64.b64encode(resized_frame_data).decode('utf-8')
                 content.append({
                     "type": "image_url",
                     "image_url": {
@@ -56,7 +75,6 @@ class TogetherInference(InferenceEngine):
                     }
                 })
 
-            analysis_prompt = util.create_analysis_prompt(prompt, language)
             content.append({
                 "type": "text",
                 "text": analysis_prompt
@@ -66,7 +84,8 @@ class TogetherInference(InferenceEngine):
                 "content": content
             }]
             
-            response_text = await self._run_ai_inference(messages)
+            with metrics.STAGE_LATENCY.time(stage="engine"):
+                response_text = await self._run_ai_inference(messages)
             return response_text
             
         except Exception as e:
@@ -82,6 +101,8 @@ class TogetherInference(InferenceEngine):
             )
             return response.choices[0].message.content
         except Exception as e:
+            if "timed out" in str(e).lower():
+                metrics.INFERENCE_TIMEOUTS.inc(engine=self.__class__.__name__)
             logger.error(f"AI inference error: {str(e)}")
             return ""
     
@@ -1,8 +1,15 @@
-from PIL import Image
+from . import metrics
+from .model.region import Region
+from datetime import datetime
+from PIL import Image, ImageDraw, ImageFont
+from typing import List
 import io
 import logging
+import math
 import re
 
+MAX_CAPTURE_DIMENSION = 3072
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,6 +40,11 @@ def extract_score_and_reason(response: str) -> tuple[int, str]:
     """
     Extract confidence score and reason from AI model response.
     """
+    with metrics.STAGE_LATENCY.time(stage="parse"):
+        return _extract_score_and_reason(response)
+
+
+def _extract_score_and_reason(response: str) -> tuple[int, str]:
     try:
         match = re.search(r'\|(\d+)\|([^|]+)\|', response)
         if match:
@@ -41,12 +53,60 @@ def extract_score_and_reason(response: str) -> tuple[int, str]:
             return score, reason
         
         logger.warning(f"weird ai response={response}")
+        metrics.PARSE_FAILURES.inc()
         return 0, ""
         
     except Exception as e:
         logger.error(f"Error extracting score: {e}")
+        metrics.PARSE_FAILURES.inc()
         return 0, ""
 
+def create_multi_analysis_prompt(prompts: List[str], language: str = "en") -> str:
+    """
+    Create an analysis prompt that scores the same frames against several user descriptions.
+    """
+    descriptions = "\n".join(f"{number}. {prompt}" for number, prompt in enumerate(prompts, start=1))
+    analysis_prompt = f"""
+        Analyze the video frames against each of the user's numbered descriptions.
+
+        Respond ONLY with one line per description in this format: |number|rate|reason|
+        - number: the number of the description
+        - rate: 0-100 confidence score (0=no match, 100=perfect match)
+        - reason: one concise sentence explaining the match
+
+        Examples:
+        |1|100|Clear orange cat sitting on the couch|
+        |2|0|No people visible in the frame|
+
+        Always reply in the language indicated by the two-letter ISO 639-1 code `{language}`
+
+        User Descriptions:
+    """
+    return re.sub(r'\n\s+', '\n', analysis_prompt) + descriptions
+
+
+def extract_multi_scores(response: str, count: int) -> List[tuple[int, str]]:
+    """
+    Extract one confidence score and reason per description from a multi-prompt response.
+    Descriptions the model did not answer get a score of 0 and an empty reason.
+    """
+    with metrics.STAGE_LATENCY.time(stage="parse"):
+        scores = [(0, "")] * count
+        try:
+            matches = re.findall(r'\|(\d+)\|(\d+)\|([^|\n]+)\|', response)
+            for number, score, reason in matches:
+                index = int(number) - 1
+                if 0 <= index < count:
+                    scores[index] = (int(score), reason.strip())
+            if len(matches) < count:
+                logger.warning(f"incomplete ai response for {count} prompts={response}")
+                metrics.PARSE_FAILURES.inc()
+        except Exception as e:
+            logger.error(f"Error extracting scores: {e}")
+            metrics.PARSE_FAILURES.inc()
+        return scores
+
+
 def create_translation_prompt(texts: str, locale: str) -> str:
     """
     Create a standardized translation prompt for AI models.
@@ -79,26 +139,144 @@ def create_summarization_prompt(events: list) -> str:
     """
     return re.sub(r'\n\s+', '\n', summarization_prompt)
 
-def resize_frame(frame_data: bytes, max_size: int = 768) -> bytes:
+def resize_frame(frame_data: bytes, max_size: int = 768, quality: int = 90) -> bytes:
     """Resize frame so max width or height is max_size while maintaining aspect ratio"""
     try:
-        image = Image.open(io.BytesIO(frame_data))
-        original_width, original_height = image.size
-        if original_width <= max_size and original_height <= max_size:
-            return frame_data
-        
-        if original_width > original_height:
-            new_width = max_size
-            new_height = int(original_height * (max_size / original_width))
-        else:
-            new_height = max_size
-            new_width = int(original_width * (max_size / original_height))
-        
-        resized_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        with metrics.STAGE_LATENCY.time(stage="resize"):
+            # Image.open only parses the header, so frames the client already sized are never decoded
+            image = Image.open(io.BytesIO(frame_data))
+            original_width, original_height = image.size
+            if original_width <= max_size and original_height <= max_size:
+                metrics.FRAMES_RESIZED.inc(outcome="skipped")
+                return frame_data
+
+            if original_width > original_height:
+                new_width = max_size
+                new_height = int(original_height * (max_size / original_width))
+            else:
+                new_height = max_size
+                new_width = int(original_width * (max_size / original_height))
+
+            resized_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
         output_buffer = io.BytesIO()
-        resized_image.save(output_buffer, format='JPEG', quality=90)
+        with metrics.STAGE_LATENCY.time(stage="encode"):
+            resized_image.save(output_buffer, format='JPEG', quality=quality)
+        metrics.FRAMES_RESIZED.inc(outcome="resized")
         return output_buffer.getvalue()
         
     except Exception as e:
         logger.error(f"Error resizing frame: {e}")
         return frame_data
+
+
+def crop_frame(frame_data: bytes, region: Region, max_size: int = 768, quality: int = 90) -> bytes:
+    """Crop frame to a region and scale the crop so its max width or height is at most max_size"""
+    with metrics.STAGE_LATENCY.time(stage="crop"):
+        return _crop_frame(frame_data, region, max_size, quality)
+
+
+def _crop_frame(frame_data: bytes, region: Region, max_size: int, quality: int) -> bytes:
+    try:
+        image = Image.open(io.BytesIO(frame_data))
+        width, height = image.size
+        crop_width, crop_height = region.width * width, region.height * height
+        # let the JPEG decoder skip resolution the crop would throw away anyway
+        scale = min(1.0, max_size / max(crop_width, crop_height, 1))
+        image.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+
+        scale_x, scale_y = image.size[0] / width, image.size[1] / height
+        box = (
+            round(region.x * width * scale_x),
+            round(region.y * height * scale_y),
+            round((region.x + region.width) * width * scale_x),
+            round((region.y + region.height) * height * scale_y),
+        )
+        cropped = image.convert("RGB").crop(box)
+        cropped.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        output_buffer = io.BytesIO()
+        cropped.save(output_buffer, format='JPEG', quality=quality)
+        return output_buffer.getvalue()
+
+    except Exception as e:
+        logger.error(f"Error cropping frame: {e}")
+        return frame_data
+
+
+def capture_dimension_for_regions(regions: List[Region], max_size: int = 768) -> int:
+    """Frame size at which the smallest region still fills max_size pixels, capped at MAX_CAPTURE_DIMENSION"""
+    smallest = min(max(region.width, region.height) for region in regions)
+    return min(MAX_CAPTURE_DIMENSION, math.ceil(max_size / max(smallest, 0.01)))
+
+
+def parse_mosaic_grid(grid: str, frame_count: int) -> tuple[int, int]:
+    """
+    Parse a "COLSxROWS" grid spec; "auto" picks the squarest grid that fits frame_count tiles.
+    A fixed grid with fewer tiles than frames (e.g. once regions multiply the images) falls
+    back to "auto", so every frame the prompt refers to is in the mosaic.
+    """
+    if grid != "auto":
+        cols, rows = (int(part) for part in grid.lower().split("x"))
+        if cols < 1 or rows < 1:
+            raise ValueError(f"Invalid mosaic grid: {grid}")
+        if cols * rows >= frame_count:
+            return cols, rows
+
+    cols = math.ceil(math.sqrt(frame_count))
+    return cols, math.ceil(frame_count / cols)
+
+
+def mosaic_layout_text(grid: str, frame_count: int, groups: int = 1) -> str:
+    """Tell the model how create_mosaic laid the frames out, for prompts about motion or order"""
+    cols, rows = parse_mosaic_grid(grid, frame_count)
+    order = "in time order" if groups <= 1 else f"in {groups} groups of {frame_count // groups}, each in time order"
+    return (f"The image is a {cols}x{rows} grid of {frame_count} video frames {order}, read left to right "
+            f"and top to bottom, each tile labelled with its capture time.")
+
+
+def create_mosaic(frames_data: List[bytes], timestamps: List[float], grid: str = "auto", max_size: int = 768, quality: int = 90) -> bytes:
+    """
+    Tile frames into a single JPEG no larger than max_size, oldest first, left to
+    right and top to bottom, with each frame's capture time burned into its tile.
+    """
+    with metrics.STAGE_LATENCY.time(stage="mosaic"):
+        cols, rows = parse_mosaic_grid(grid, len(frames_data))
+
+        images = [Image.open(io.BytesIO(frame_data)) for frame_data in frames_data]
+        aspect = images[0].width / images[0].height
+        tile_width = max_size // cols
+        tile_height = int(tile_width / aspect)
+        if tile_height * rows > max_size:
+            tile_height = max_size // rows
+            tile_width = int(tile_height * aspect)
+
+        mosaic = Image.new("RGB", (tile_width * cols, tile_height * rows))
+        draw = ImageDraw.Draw(mosaic)
+        font = ImageFont.load_default(size=max(10, tile_height // 12))
+        for i, (image, timestamp) in enumerate(zip(images, timestamps)):
+            image.draft("RGB", (tile_width, tile_height))
+            tile = image.convert("RGB").resize((tile_width, tile_height), Image.Resampling.BILINEAR)
+            x, y = (i % cols) * tile_width, (i // cols) * tile_height
+            mosaic.paste(tile, (x, y))
+
+            label = datetime.fromtimestamp(timestamp).strftime("%H:%M:%S.%f")[:-5]
+            left, top, right, bottom = draw.textbbox((x + 4, y + 4), label, font=font)
+            draw.rectangle((left - 2, top - 2, right + 2, bottom + 2), fill=(0, 0, 0))
+            draw.text((x + 4, y + 4), label, fill=(255, 255, 255), font=font)
+
+        output_buffer = io.BytesIO()
+        mosaic.save(output_buffer, format="JPEG", quality=quality)
+        return output_buffer.getvalue()
+
+
+def frame_signature(frame_data: bytes, size: int = 16) -> bytes:
+    """Tiny grayscale thumbnail of a frame, cheap enough to compute on every tick for scene change detection"""
+    image = Image.open(io.BytesIO(frame_data))
+    image.draft("L", (size * 8, size * 8))
+    return image.convert("L").resize((size, size), Image.Resampling.BILINEAR).tobytes()
+
+
+def signature_distance(signature_a: bytes, signature_b: bytes) -> float:
+    """Mean absolute pixel difference (0-255) between two frame signatures"""
+    if len(signature_a) != len(signature_b):
+        return 255.0
+    return sum(abs(a - b) for a, b in zip(signature_a, signature_b)) / len(signature_a)
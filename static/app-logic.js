@@ -5,15 +5,14 @@
  * with Immer for immutable state updates. The architecture uses:
  * - Event-driven state management with action dispatching
  * - Immer draft pattern for safe state mutations
- * - Real-time detection pipeline with confidence thresholds
+ * - Real-time detection pipeline driven by server-side detection states
  * - Comprehensive logging system for monitoring
  */
 
 import {
-  CONFIDENCE_THRESHOLD,
-  CONSECUTIVE_DETECTIONS_REQUIRED,
   DetectionState,
   Events,
+  MAX_WATCHING_LOGS,
   WatchLogEventType,
 } from "./constants.js";
 import { generateLogId } from "./utils.js";
@@ -32,6 +31,7 @@ export function appReducer(draft, action) {
       if (wasWatching) {
         draft.detectionState = DetectionState.IDLE;
         draft.confidence = 0;
+        draft.serverDetections = {};
       }
       break;
 
@@ -42,8 +42,8 @@ export function appReducer(draft, action) {
       draft.prompt = action.payload.demo.prompt;
       draft.detectionState = DetectionState.WATCHING;
       draft.confidence = 0;
-      draft.consecutiveDetections = 0;
       draft.reason = "";
+      draft.serverDetections = {};
       draft.watchingStartTime = Date.now();
       draft.watchingLogs = [
         {
@@ -65,14 +65,42 @@ export function appReducer(draft, action) {
       if (draft.detectionState === DetectionState.DETECTED) {
         draft.detectionState = DetectionState.WATCHING;
         draft.confidence = 0;
-        draft.consecutiveDetections = 0;
       }
       break;
 
+    // Triggered when the server reports a detection state transition
+    case Events.onDetectionStateChange:
+      const detectionKey = `${action.payload.index}:${action.payload.prompt}`;
+      if (action.payload.state === DetectionState.DETECTED) {
+        draft.serverDetections[detectionKey] = action.payload.prompt;
+      } else {
+        delete draft.serverDetections[detectionKey];
+      }
+      if (
+        action.payload.state !== DetectionState.DETECTED ||
+        draft.detectionState !== DetectionState.WATCHING
+      )
+        break;
+
+      markDetected(draft, action.payload);
+      break;
+
     // Triggered when getting AI inference results
     case Events.onDetectionUpdate:
-      if (draft.detectionState !== DetectionState.WATCHING) break;
-      if (!action.payload.reason) break;
+      // results screened out by the server carry no reason
+      if (
+        draft.detectionState !== DetectionState.WATCHING ||
+        !action.payload.reason
+      )
+        break;
+
+      // the server only reports the start of a detection, so one still going
+      // on after the reset is detected again, like a new event
+      const ongoingPrompt = Object.values(draft.serverDetections)[0];
+      if (ongoingPrompt !== undefined) {
+        markDetected(draft, { ...action.payload, prompt: ongoingPrompt });
+        break;
+      }
 
       draft.confidence = action.payload.confidence;
 
@@ -84,54 +112,30 @@ export function appReducer(draft, action) {
         draft.lastReasonUpdateTime = currentTime;
       }
 
-      if (action.payload.confidence < CONFIDENCE_THRESHOLD) {
-        draft.consecutiveDetections = 0;
-      } else {
-        draft.consecutiveDetections++;
-      }
-
-      if (draft.consecutiveDetections < CONSECUTIVE_DETECTIONS_REQUIRED) {
-        draft.watchingLogs.unshift({
-          id: generateLogId(),
-          timestamp: new Date(),
-          type: WatchLogEventType.UPDATE,
-          confidence: action.payload.confidence,
-          reason: action.payload.reason,
-          prompt: draft.prompt,
-        });
-        break;
-      }
-
-      draft.detectionState = DetectionState.DETECTED;
-      draft.reason = action.payload.reason;
-      draft.lastReasonUpdateTime = currentTime;
       draft.watchingLogs.unshift({
         id: generateLogId(),
         timestamp: new Date(),
-        type: WatchLogEventType.DETECTION,
+        type: WatchLogEventType.UPDATE,
         confidence: action.payload.confidence,
         reason: action.payload.reason,
         prompt: draft.prompt,
       });
+      trimWatchingLogs(draft);
       break;
 
     // Triggered when a video clip is generated and ready after a detection event
     case Events.onDetectionVideoClip:
       const detectionLog = draft.watchingLogs.find(
-        (log) => log.type === WatchLogEventType.DETECTION && !log.videoUrl,
+        (log) =>
+          log.type === WatchLogEventType.DETECTION &&
+          !log.videoUrl &&
+          !log.videoExpired,
       );
       if (detectionLog) {
         detectionLog.videoUrl = action.payload.videoUrl;
-      }
-      break;
-
-    // Triggered when an email notification has been successfully sent for a detection
-    case Events.onEmailNotificationSent:
-      const logToUpdate = draft.watchingLogs.find(
-        (log) => log.id === action.payload.logId,
-      );
-      if (logToUpdate) {
-        logToUpdate.emailNotificationSent = true;
+      } else {
+        // finished after watching stopped, nothing will link to it
+        URL.revokeObjectURL(action.payload.videoUrl);
       }
       break;
 
@@ -153,6 +157,10 @@ export function appReducer(draft, action) {
     // Triggered when the application initializes and loads initial configuration
     case Events.onInitLoad:
       draft.toEmailAddress = action.payload.toEmailAddress;
+      if (action.payload.capture) {
+        draft.captureMaxDimension = action.payload.capture.max_dimension;
+        draft.imageQuality = action.payload.capture.jpeg_quality / 100;
+      }
       break;
 
     // Triggered when user selects a different language
@@ -206,6 +214,9 @@ export function appReducer(draft, action) {
         break;
 
       const idsToRemove = new Set(action.payload.logIds);
+      draft.watchingLogs
+        .filter((log) => idsToRemove.has(log.id))
+        .forEach(releaseVideoClip);
       draft.watchingLogs = [
         {
           id: generateLogId(),
@@ -249,8 +260,8 @@ export function appReducer(draft, action) {
     case Events.onWatchingStart:
       draft.detectionState = DetectionState.WATCHING;
       draft.confidence = 0;
-      draft.consecutiveDetections = 0;
       draft.reason = "";
+      draft.serverDetections = {};
       draft.lastVideoFrame = null;
       draft.watchingStartTime = Date.now();
       draft.watchingLogs = [
@@ -267,6 +278,11 @@ export function appReducer(draft, action) {
     case Events.onWatchingStop:
       draft.detectionState = DetectionState.IDLE;
       draft.confidence = 0;
+      draft.serverDetections = {};
+      // clips are blobs held in memory, they are released with the session
+      draft.watchingLogs
+        .filter((log) => log.type === WatchLogEventType.DETECTION)
+        .forEach(releaseVideoClip);
       draft.watchingLogs.unshift({
         id: generateLogId(),
         timestamp: new Date(),
@@ -276,3 +292,39 @@ export function appReducer(draft, action) {
       break;
   }
 }
+
+function markDetected(draft, payload) {
+  draft.detectionState = DetectionState.DETECTED;
+  draft.confidence = payload.confidence;
+  draft.reason = payload.reason;
+  draft.lastReasonUpdateTime = Date.now();
+  draft.watchingLogs.unshift({
+    id: generateLogId(),
+    timestamp: new Date(),
+    type: WatchLogEventType.DETECTION,
+    confidence: payload.confidence,
+    reason: payload.reason,
+    prompt: payload.prompt,
+    emailNotificationSent: Boolean(payload.notified),
+  });
+  trimWatchingLogs(draft);
+}
+
+// Drops the oldest update once the log is full; detections, summaries and start/stop
+// entries are kept, and all results remain available from the server (GET /events)
+function trimWatchingLogs(draft) {
+  if (draft.watchingLogs.length <= MAX_WATCHING_LOGS) return;
+  const oldestUpdateIndex = draft.watchingLogs.findLastIndex(
+    (log) => log.type === WatchLogEventType.UPDATE,
+  );
+  if (oldestUpdateIndex !== -1) {
+    draft.watchingLogs.splice(oldestUpdateIndex, 1).forEach(releaseVideoClip);
+  }
+}
+
+// Frees the object URL of a log entry's detection clip
+function releaseVideoClip(log) {
+  if (log.videoUrl) URL.revokeObjectURL(log.videoUrl);
+  log.videoUrl = null;
+  log.videoExpired = true;
+}
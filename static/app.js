@@ -27,7 +27,6 @@ import { useAutoSummarization } from "./static/useAutoSummarization.js";
 import { useCloseWarning } from "./static/useCloseWarning.js";
 import { useDetectionReset } from "./static/useDetectionReset.js";
 import { useDetectionSound } from "./static/useDetectionSound.js";
-import { useEmailNotification } from "./static/useEmailNotification.js";
 import { useInitLoader } from "./static/useInitLoader.js";
 import { useLanguageLoader } from "./static/useLanguageLoader.js";
 import { useLoadDemos } from "./static/useLoadDemos.js";
@@ -45,6 +44,7 @@ function App() {
 
   const [state, dispatch] = useImmerReducer(appReducer, initialState);
   const {
+    captureMaxDimension,
     confidence,
     currentLanguage,
     demoMode,
@@ -69,7 +69,6 @@ function App() {
   useCloseWarning(state);
   useDetectionReset(state, dispatch);
   useDetectionSound(state, dispatch);
-  useEmailNotification(state, dispatch);
   useInitLoader(state, dispatch);
   useLanguageLoader(state, dispatch);
   useLoadDemos(state, dispatch);
@@ -83,6 +82,7 @@ function App() {
 
   return (
     <MainUI
+      captureMaxDimension={captureMaxDimension}
       confidence={confidence}
       currentLanguage={currentLanguage}
       demoMode={demoMode}
@@ -150,6 +150,7 @@ function App() {
 }
 
 function MainUI({
+  captureMaxDimension,
   confidence,
   currentLanguage,
   demoMode,
@@ -275,6 +276,7 @@ function MainUI({
             )}
             <div className="aspect-[16/9] sm:aspect-[16/8] md:aspect-[16/7] bg-black/50 rounded-2xl flex items-center justify-center relative overflow-hidden">
               <VideoCamera
+                captureMaxDimension={captureMaxDimension}
                 className="w-full h-full object-cover"
                 fps={fps}
                 imageQuality={imageQuality}
@@ -602,7 +604,8 @@ function MainUI({
                                   <span>⬇️</span>
                                 </a>
                               ) : (
-                                !demoMode && (
+                                !demoMode &&
+                                !entry.videoExpired && (
                                   <div className="inline-flex items-center space-x-1 px-3 py-1 bg-yellow-500/20 rounded-lg border border-yellow-400/30 text-xs text-yellow-200">
                                     <span className="animate-spin">⚙️</span>
                                   </div>
@@ -832,6 +835,7 @@ function TranslationLoadingModal({ isLoading, texts }) {
 }
 
 function VideoCamera({
+  captureMaxDimension,
   className,
   fps,
   imageQuality,
@@ -867,9 +871,15 @@ function VideoCamera({
       const canvas = canvasRef.current;
       const context = canvas.getContext("2d");
 
-      canvas.width = imageBitmap.width;
-      canvas.height = imageBitmap.height;
-      context.drawImage(imageBitmap, 0, 0);
+      // downscale to the engine's preferred size so the server never resizes
+      const longestSide = Math.max(imageBitmap.width, imageBitmap.height);
+      const scale = captureMaxDimension
+        ? Math.min(1, captureMaxDimension / longestSide)
+        : 1;
+      canvas.width = Math.floor(imageBitmap.width * scale);
+      canvas.height = Math.floor(imageBitmap.height * scale);
+      context.imageSmoothingQuality = "high";
+      context.drawImage(imageBitmap, 0, 0, canvas.width, canvas.height);
 
       canvas.toBlob(
         async (blob) => {
@@ -885,7 +895,7 @@ function VideoCamera({
     } catch (err) {
       console.error("Error capturing frame:", err);
     }
-  }, [imageQuality, onFrame]);
+  }, [captureMaxDimension, imageQuality, onFrame]);
 
   useEffect(() => {
     if (isRecording) {
@@ -1,8 +1,5 @@
-// Minimum confidence level required for a detection to be valid
-export const CONFIDENCE_THRESHOLD = 90;
-
-// Number of consecutive detections needed before triggering an alert
-export const CONSECUTIVE_DETECTIONS_REQUIRED = 2;
+// Max entries kept in watchingLogs, older updates stay in the server event store
+export const MAX_WATCHING_LOGS = 500;
 
 // Interval in milliseconds for rotating video recordings
 export const RECORDING_ROTATION_INTERVAL = 5000;
@@ -10,9 +7,6 @@ export const RECORDING_ROTATION_INTERVAL = 5000;
 // Duration in milliseconds to continue recording after detection
 export const POST_DETECTION_RECORDING_DURATION = 4000;
 
-// Delay in milliseconds before sending email notification without video attachment
-export const EMAIL_WITHOUT_VIDEO_DELAY = 5000;
-
 // Event constants for the application's event system.
 // for more details on the events: check the app-logic reducer
 export const Events = Object.fromEntries(
@@ -21,9 +15,9 @@ export const Events = Object.fromEntries(
     "onDemosLoad",
     "onDemoStart",
     "onDetectionReset",
+    "onDetectionStateChange",
     "onDetectionUpdate",
     "onDetectionVideoClip",
-    "onEmailNotificationSent",
     "onEmailUpdateIntervalChange",
     "onFpsChange",
     "onImageQualityChange",
@@ -82,8 +76,8 @@ export const SUMMARY_TIME_WINDOWS = {
 
 // Initial state object for the application's global state management
 export const initialState = {
+  captureMaxDimension: null,
   confidence: 0,
-  consecutiveDetections: 0,
   currentDemo: null,
   currentLanguage: "en",
   previousLanguage: "en",
@@ -103,6 +97,8 @@ export const initialState = {
   placeholderIndex: 0,
   prompt: "",
   reason: "",
+  // prompts the server reports as detected, keyed by "index:prompt"
+  serverDetections: {},
   texts: {},
   toEmailAddress: null,
   watchingLogs: [],
@@ -2,7 +2,8 @@
  * Detection Reset Hook - Automatically resets detection state after timeout
  *
  * This hook automatically transitions the detection state from DETECTED back to WATCHING
- * after a 5-second delay. This allows the system to continue monitoring for new detections
+ * after a 5-second delay. This allows the system to continue monitoring for new detections;
+ * a detection the server still reports as ongoing is detected again on the next result
  */
 
 import { useEffect } from "react";
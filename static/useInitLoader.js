@@ -3,8 +3,10 @@
  *
  * This hook fetches initial configuration data when the application starts,
  * including the default email address for notifications and information about
- * the currently configured AI inference engine. It ensures the app has the
- * necessary configuration data before users begin watching sessions.
+ * the currently configured AI inference engine. It also receives the engine's
+ * preferred capture size and JPEG quality, so frames are downscaled in the
+ * browser before upload and the server never has to resize them. It ensures the
+ * app has the necessary configuration data before users begin watching sessions.
  */
 
 import { useEffect } from "react";
@@ -25,7 +27,10 @@ export function useInitLoader(state, dispatch) {
 
         dispatch({
           type: Events.onInitLoad,
-          payload: { toEmailAddress: data.email_address },
+          payload: {
+            toEmailAddress: data.email_address,
+            capture: data.capture,
+          },
         });
       } catch (error) {
         console.error("Error loading init data:", error);
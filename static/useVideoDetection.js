@@ -5,18 +5,37 @@
  * to the AI inference engine, then receives back confidence scores and detection reasons.
  * It handles the core detection pipeline: capturing frames → sending to AI → processing results.
  * Uses MessagePack for efficient binary data transmission.
+ *
+ * Speaks protocol v2: the prompt and language are sent once in a control message
+ * (and again on reconnect or change), while frame messages only carry a sequence
+ * number, the capture timestamp and the JPEG bytes. Results echo the sequence
+ * range they were computed from.
+ *
+ * Detections are decided on the server, which also sends the email alerts to the
+ * address passed in the control params; this hook only follows the state
+ * transitions it pushes.
  */
 
 import * as MessagePack from "@msgpack/msgpack";
-import { useEffect } from "react";
+import { useEffect, useRef } from "react";
 import ruw from "react-use-websocket";
 import { DetectionState, Events } from "./constants.js";
 import { getPathPrefix } from "./utils.js";
 
 const { default: useWebSocket } = ruw;
 
+const PROTOCOL_VERSION = 2;
+
 export function useVideoDetection(state, dispatch) {
-  const { detectionState, lastVideoFrame, prompt, currentLanguage } = state;
+  const {
+    detectionState,
+    lastVideoFrame,
+    prompt,
+    currentLanguage,
+    enabledNotifications,
+    toEmailAddress,
+  } = state;
+  const alertEmail = enabledNotifications.email ? toEmailAddress : null;
 
   const isWatching =
     detectionState === DetectionState.WATCHING ||
@@ -34,6 +53,24 @@ export function useVideoDetection(state, dispatch) {
   });
 
   const isReadyWatching = isWatching && readyState === WebSocket.OPEN;
+  const frameSeqRef = useRef(0);
+  const frameSentAtRef = useRef(new Map());
+
+  useEffect(
+    function sendControlMessage() {
+      if (!isReadyWatching) return;
+
+      const packed = MessagePack.encode({
+        v: PROTOCOL_VERSION,
+        type: "control",
+        prompt: prompt,
+        language: currentLanguage,
+        params: { alert_email: alertEmail },
+      });
+      sendMessage(packed);
+    },
+    [isReadyWatching, prompt, currentLanguage, alertEmail, sendMessage],
+  );
 
   useEffect(
     function watchForWebSocketMessages() {
@@ -43,9 +80,31 @@ export function useVideoDetection(state, dispatch) {
         try {
           const arrayBuffer = await lastMessage.data.arrayBuffer();
           const decodedData = MessagePack.decode(new Uint8Array(arrayBuffer));
+          if (decodedData.type === "state") {
+            dispatch({
+              type: Events.onDetectionStateChange,
+              payload: {
+                state: decodedData.state,
+                index: decodedData.index,
+                prompt: decodedData.prompt,
+                confidence: parseFloat(decodedData.confidence),
+                reason: decodedData.reason,
+                notified: decodedData.notified,
+              },
+            });
+            return;
+          }
+
           const newConfidence = parseFloat(decodedData.confidence);
           const newReason = decodedData.reason;
 
+          const sentAt = frameSentAtRef.current.get(decodedData.seq_to);
+          if (sentAt) {
+            console.debug(
+              `Result for frames ${decodedData.seq_from}-${decodedData.seq_to} after ${Date.now() - sentAt}ms`,
+            );
+          }
+
           dispatch({
             type: Events.onDetectionUpdate,
             payload: {
@@ -69,18 +128,26 @@ export function useVideoDetection(state, dispatch) {
         if (lastVideoFrame && isReadyWatching) {
           const arrayBuffer = await lastVideoFrame.arrayBuffer();
           const uint8Array = new Uint8Array(arrayBuffer);
+          const seq = frameSeqRef.current++;
+          const capturedAt = Date.now();
           const packed = MessagePack.encode({
-            prompt: prompt,
+            v: PROTOCOL_VERSION,
+            type: "frame",
+            seq: seq,
+            ts: capturedAt,
             frame: uint8Array,
-            language: currentLanguage,
           });
           sendMessage(packed);
+
+          const sentAt = frameSentAtRef.current;
+          sentAt.set(seq, capturedAt);
+          sentAt.delete(seq - 100);
         }
       };
 
       processFrame();
     },
-    [isReadyWatching, lastVideoFrame, prompt, currentLanguage, sendMessage],
+    [isReadyWatching, lastVideoFrame, sendMessage],
   );
 
   return {};
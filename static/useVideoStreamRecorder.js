@@ -125,18 +125,14 @@ export function useVideoStreamRecorder(state, dispatch) {
         if (!recorderFinishingTheClip) return;
 
         recorderFinishingTheClip.onBlobReady = (blob) => {
-          const reader = new FileReader();
-          reader.onload = () => {
-            const dataUrl = reader.result;
-            dispatch({
-              type: Events.onDetectionVideoClip,
-              payload: {
-                videoUrl: dataUrl,
-              },
-            });
-            detectionRecorderRef.current = null;
-          };
-          reader.readAsDataURL(blob);
+          // the clip only backs the watch log link, alert emails get theirs from the server
+          dispatch({
+            type: Events.onDetectionVideoClip,
+            payload: {
+              videoUrl: URL.createObjectURL(blob),
+            },
+          });
+          detectionRecorderRef.current = null;
         };
 
         stopRecorder(recorderFinishingTheClip);